@@ -0,0 +1,536 @@
+"""Load and latency benchmark for WellnessMCPServer
+
+Runs the real server in-process with stub Gemini, emotion and BigQuery
+backends whose latency is configurable, replays a seeded mix of tool calls
+at a fixed concurrency and reports latency percentiles, throughput and
+memory. Results are saved as JSON so runs can be compared across commits::
+
+    python benchmark.py --requests 2000 --concurrency 32 --output before.json
+    python benchmark.py --requests 2000 --concurrency 32 --compare before.json
+
+Server settings come from the usual environment variables (see the README's
+Performance Tuning table) and are recorded in the results.
+"""
+
+import argparse
+import asyncio
+import base64
+import json
+import math
+import os
+import platform
+import random
+import re
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import datetime, timezone
+from types import SimpleNamespace
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+from mcp.types import CallToolRequest, CallToolRequestParams
+
+import bigquery_provisioning
+import storage_backends
+import wellness_mcp_server
+from emotion_backends import EmotionBackend, emotion_result
+from emotion_cache import CachedEmotionAnalyzer
+from gemini_client import GeminiClient
+from wellness_mcp_server import WellnessMCPServer
+
+RESULTS_VERSION = 1
+
+# Relative frequency of each tool in the default workload
+DEFAULT_MIX = {
+    'mood_check_in': 35,
+    'provide_mindfulness': 20,
+    'stress_monitoring': 15,
+    'set_wellness_goal': 10,
+    'crisis_support_check': 10,
+    'mood_check_in_bulk': 5,
+    'stress_monitoring_session': 3,
+    'list_at_risk_users': 2,
+}
+
+# Environment variables that change server behaviour, recorded with each run
+_SETTING_PREFIXES = ('WELLNESS_', 'GEMINI_', 'BIGQUERY_', 'EMOTION_', 'TOOL_', 'CRISIS_', 'MOOD_', 'STRESS_')
+_SECRET_SETTINGS = ('GEMINI_API_KEY',)
+
+_MOOD_TEXTS = [
+    "Feeling calm after a walk", "Stressed about deadlines", "Tired but okay",
+    "Anxious before the presentation", "Pretty good day overall", "Lonely this evening",
+    "Overwhelmed with work", "Relaxed and rested", "",
+]
+_EXERCISES = ['breathing', 'meditation', 'body_scan', 'gratitude']
+_GOALS = [('meditation', 'Meditate every morning'), ('exercise', 'Walk 8000 steps a day'),
+          ('sleep', 'In bed by 11pm on weeknights')]
+
+
+@dataclass
+class BenchmarkConfig:
+    requests: int = 500
+    concurrency: int = 16
+    warmup: int = 20
+    users: int = 50
+    seed: int = 1
+    gemini_latency_ms: float = 400.0
+    emotion_latency_ms: float = 150.0
+    bigquery_latency_ms: float = 80.0
+    jitter: float = 0.25
+    storage: str = 'bigquery'
+    mix: Dict[str, float] = field(default_factory=lambda: dict(DEFAULT_MIX))
+    trace_memory: bool = False
+
+
+class _Latency:
+    """Seeded latency samples, ``base * uniform(1 - jitter, 1 + jitter)``"""
+
+    def __init__(self, milliseconds: float, jitter: float, seed: int):
+        self.seconds = milliseconds / 1000
+        self.jitter = jitter
+        self._rng = random.Random(seed)
+        self._lock = threading.Lock()
+
+    def sample(self) -> float:
+        with self._lock:
+            return self.seconds * self._rng.uniform(1 - self.jitter, 1 + self.jitter)
+
+
+class StubGeminiModel:
+    """Answers ``generate_content_async`` after a simulated model latency"""
+
+    class _Response:
+        def __init__(self, text: str):
+            self.text = text
+
+        def __aiter__(self):
+            return self._chunks()
+
+        async def _chunks(self):
+            for word in self.text.split(' '):
+                yield StubGeminiModel._Response(word + ' ')
+
+    def __init__(self, latency: _Latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def generate_content_async(self, prompt: str, stream: bool = False):
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        return self._Response(f"Stub guidance for a {len(prompt)}-character prompt. Breathe slowly and rest.")
+
+
+class StubEmotionBackend(EmotionBackend):
+    """Frame-dependent emotion scores after a simulated Hume latency"""
+
+    name = 'stub'
+
+    def __init__(self, latency: _Latency):
+        self.latency = latency
+        self.calls = 0
+
+    async def analyze_facial_emotions(self, image_data) -> Dict[str, Any]:
+        self.calls += 1
+        await asyncio.sleep(self.latency.sample())
+        rng = random.Random(bytes(image_data[:16]))
+        return emotion_result({name: rng.random() for name in ('joy', 'sadness', 'anger', 'fear', 'calmness')},
+                              self.name)
+
+
+class StubBigQueryClient:
+    """Keeps inserted rows in memory; every call blocks for the simulated latency"""
+
+    def __init__(self, latency: _Latency):
+        self.latency = latency
+        self.tables: Dict[str, List[Dict[str, Any]]] = {}
+        self._lock = threading.Lock()
+
+    def create_table(self, table: Any, exists_ok: bool = False):
+        time.sleep(self.latency.sample())
+        return table
+
+    def insert_rows(self, table_id: str, rows: List[Dict[str, Any]], selected_fields: Any = None) -> List[Any]:
+        if selected_fields is None:
+            raise ValueError(f"Could not determine schema for table '{table_id}'")
+        time.sleep(self.latency.sample())
+        with self._lock:
+            self.tables.setdefault(table_id, []).extend(rows)
+        return []
+
+    def query(self, sql: str, job_config: Any = None):
+        time.sleep(self.latency.sample())
+        table_id = re.search(r'`([^`]+)`', sql).group(1)
+        user_id = next(param.value for param in job_config.query_parameters if param.name == 'user_id')
+        with self._lock:
+            rows = [row for row in self.tables.get(table_id, []) if row.get('user_id') == user_id]
+        return _StubQueryJob(rows)
+
+
+class _StubQueryJob:
+    def __init__(self, rows: List[Dict[str, Any]]):
+        self.rows = rows
+
+    def result(self) -> List[Dict[str, Any]]:
+        return self.rows
+
+
+class _StubParameter:
+    def __init__(self, name: str, kind: str, value: Any):
+        self.name, self.kind, self.value = name, kind, value
+
+
+class _StubBigQueryModule:
+    """The parts of ``google.cloud.bigquery`` the server uses"""
+
+    def __init__(self, client: StubBigQueryClient):
+        self.Client = lambda project=None: client
+        self.SchemaField = lambda name, kind: (name, kind)
+        self.Table = lambda table_id, schema=None: table_id
+        self.ScalarQueryParameter = _StubParameter
+        self.QueryJobConfig = lambda query_parameters=None: SimpleNamespace(query_parameters=query_parameters)
+
+
+@contextmanager
+def _patched(settings: Dict[str, str], bigquery: _StubBigQueryModule) -> Iterator[None]:
+    """Temporarily set environment variables and swap in the BigQuery stub"""
+    saved_env = {name: os.environ.get(name) for name in settings}
+    modules = (wellness_mcp_server, storage_backends, bigquery_provisioning)
+    saved_loaders = [module.load_bigquery for module in modules]
+    os.environ.update(settings)
+    for module in modules:
+        module.load_bigquery = lambda: bigquery
+    try:
+        yield
+    finally:
+        for module, loader in zip(modules, saved_loaders):
+            module.load_bigquery = loader
+        for name, value in saved_env.items():
+            if value is None:
+                os.environ.pop(name, None)
+            else:
+                os.environ[name] = value
+
+
+def _frame(rng: random.Random) -> str:
+    return base64.b64encode(rng.randbytes(2048)).decode('ascii')
+
+
+def _ppg(rng: random.Random, seconds: int = 30, sampling_rate: int = 50) -> Dict[str, Any]:
+    """A clean pulse train at a random resting heart rate"""
+    period = 60 / rng.uniform(60, 95)
+    samples = [round(math.exp(-(((i / sampling_rate) % period - 0.2) / 0.08) ** 2), 4)
+               for i in range(seconds * sampling_rate)]
+    return {'samples': samples, 'sampling_rate': sampling_rate}
+
+
+def _arguments(tool: str, rng: random.Random, user_id: str) -> Dict[str, Any]:
+    if tool == 'mood_check_in':
+        return {'mood_score': rng.randint(1, 10), 'text_description': rng.choice(_MOOD_TEXTS), 'user_id': user_id}
+    if tool == 'mood_check_in_bulk':
+        return {'user_id': user_id, 'max_concurrency': 4, 'entries': [
+            {'mood_score': rng.randint(1, 10), 'text_description': rng.choice(_MOOD_TEXTS),
+             'analyze': rng.random() < 0.25} for _ in range(rng.randint(5, 20))]}
+    if tool == 'stress_monitoring':
+        args = {'image_data': _frame(rng), 'user_id': user_id}
+        if rng.random() < 0.3:
+            args['ppg_data'] = _ppg(rng)
+        return args
+    if tool == 'stress_monitoring_session':
+        return {'frames': [{'image_data': _frame(rng)} for _ in range(rng.randint(5, 15))],
+                'max_concurrency': 4, 'user_id': user_id}
+    if tool == 'set_wellness_goal':
+        goal_type, description = rng.choice(_GOALS)
+        return {'goal_type': goal_type, 'description': description, 'user_id': user_id}
+    if tool == 'provide_mindfulness':
+        return {'exercise_type': rng.choice(_EXERCISES), 'duration_minutes': rng.choice([5, 10, 15]),
+                'current_emotions': {'stress': rng.choice(['low', 'medium', 'high'])}, 'user_id': user_id}
+    if tool == 'crisis_support_check':
+        return {'user_id': user_id, 'timeframe_days': 7}
+    if tool == 'list_at_risk_users':
+        return {'limit': 20}
+    raise ValueError(f"No workload generator for tool: {tool}")
+
+
+def build_workload(config: BenchmarkConfig, count: int, seed: int) -> List[Tuple[str, Dict[str, Any]]]:
+    """``count`` (tool, arguments) pairs drawn from ``config.mix``; identical for identical seeds"""
+    rng = random.Random(seed)
+    tools = [tool for tool, weight in config.mix.items() if weight > 0]
+    weights = [config.mix[tool] for tool in tools]
+    users = [f"user_{index:04d}" for index in range(config.users)]
+    return [(tool, _arguments(tool, rng, rng.choice(users))) for tool in rng.choices(tools, weights, k=count)]
+
+
+def percentiles(samples: List[float]) -> Dict[str, float]:
+    """Nearest-rank latency percentiles of ``samples`` (seconds) in milliseconds"""
+    if not samples:
+        return {'p50_ms': 0.0, 'p95_ms': 0.0, 'p99_ms': 0.0, 'mean_ms': 0.0, 'max_ms': 0.0}
+    ordered = sorted(samples)
+
+    def rank(q: float) -> float:
+        return ordered[max(0, math.ceil(q * len(ordered)) - 1)] * 1000
+
+    return {
+        'p50_ms': round(rank(0.50), 2),
+        'p95_ms': round(rank(0.95), 2),
+        'p99_ms': round(rank(0.99), 2),
+        'mean_ms': round(sum(ordered) / len(ordered) * 1000, 2),
+        'max_ms': round(ordered[-1] * 1000, 2),
+    }
+
+
+def _is_failure(text: str) -> bool:
+    return text.startswith(('❌', 'Error executing', '⏱️', '🚫'))
+
+
+def _rss_mb() -> Optional[float]:
+    """Current resident set size, where /proc is available"""
+    try:
+        with open('/proc/self/statm') as f:
+            return int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE') / 2 ** 20
+    except (OSError, ValueError, AttributeError):
+        return None
+
+
+def _peak_rss_mb() -> Optional[float]:
+    try:
+        import resource
+    except ImportError:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Kilobytes on Linux, bytes on macOS
+    return peak / 2 ** 20 if sys.platform == 'darwin' else peak / 2 ** 10
+
+
+async def _replay(server: WellnessMCPServer, workload: List[Tuple[str, Dict[str, Any]]],
+                  concurrency: int) -> List[Tuple[str, float, bool]]:
+    """Closed-loop replay: ``concurrency`` clients each send their next call when the last returns"""
+    samples: List[Tuple[str, float, bool]] = []
+    calls = iter(workload)
+
+    async def client():
+        for tool, arguments in calls:
+            request = CallToolRequest(method="tools/call", params=CallToolRequestParams(name=tool, arguments=arguments))
+            started = time.perf_counter()
+            result = await server.call_tool(request)
+            samples.append((tool, time.perf_counter() - started, not _is_failure(result[0].text if result else '')))
+
+    await asyncio.gather(*(client() for _ in range(max(1, concurrency))))
+    return samples
+
+
+async def run_benchmark(config: BenchmarkConfig, workdir: str) -> Dict[str, Any]:
+    """Run one benchmark in ``workdir`` (local database, table cache) and return the results"""
+    gemini_latency = _Latency(config.gemini_latency_ms, config.jitter, config.seed)
+    emotion_latency = _Latency(config.emotion_latency_ms, config.jitter, config.seed + 1)
+    bigquery_latency = _Latency(config.bigquery_latency_ms, config.jitter, config.seed + 2)
+    bigquery_client = StubBigQueryClient(bigquery_latency)
+
+    settings = {
+        'WELLNESS_LOCAL_DB': os.path.join(workdir, 'wellness.db'),
+        'WELLNESS_STORAGE_BACKEND': config.storage,
+        'BIGQUERY_PROJECT_ID': os.getenv('BIGQUERY_PROJECT_ID', 'benchmark'),
+        'WELLNESS_REPLAY_INTERVAL': '0',
+    }
+    with _patched(settings, _StubBigQueryModule(bigquery_client)):
+        server = WellnessMCPServer()
+        server_settings = {name: value for name, value in os.environ.items()
+                           if name.startswith(_SETTING_PREFIXES) and name not in _SECRET_SETTINGS}
+        # The stub stays installed while the server runs; queries load the module lazily
+        results = await _measure(server, config, gemini_latency, emotion_latency)
+
+    results['server_settings'] = server_settings
+    results['upstream_calls']['bigquery_rows'] = sum(len(rows) for rows in bigquery_client.tables.values())
+    return results
+
+
+async def _measure(server: WellnessMCPServer, config: BenchmarkConfig, gemini_latency: _Latency,
+                   emotion_latency: _Latency) -> Dict[str, Any]:
+
+    gemini_model = StubGeminiModel(gemini_latency)
+    server.gemini_model = gemini_model
+    server.gemini_client = GeminiClient(
+        gemini_model,
+        max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')),
+        timeout=float(os.getenv('GEMINI_TIMEOUT', '30'))
+    )
+    emotion_backend = StubEmotionBackend(emotion_latency)
+    emotion_cache_entries = int(os.getenv('EMOTION_CACHE_MAX_ENTRIES', '256'))
+    server.emotion_analyzer = CachedEmotionAnalyzer(emotion_backend, max_entries=emotion_cache_entries) \
+        if emotion_cache_entries > 0 else emotion_backend
+
+    workload = build_workload(config, config.requests, config.seed)
+    # Every tool runs at least once before measuring, so worker processes are already started
+    warmup_rng = random.Random(config.seed + 1000)
+    warmup = [(tool, _arguments(tool, warmup_rng, 'warmup_user')) for tool, weight in config.mix.items() if weight > 0]
+    warmup += build_workload(config, config.warmup, config.seed + 1000)
+
+    await server.memory_saver.start()
+    server.start()
+    try:
+        await _replay(server, warmup, config.concurrency)
+        rss_before = _rss_mb()
+        if config.trace_memory:
+            tracemalloc.start()
+        started = time.perf_counter()
+        samples = await _replay(server, workload, config.concurrency)
+        duration = time.perf_counter() - started
+        traced_peak = None
+        if config.trace_memory:
+            traced_peak = tracemalloc.get_traced_memory()[1] / 2 ** 20
+            tracemalloc.stop()
+        rss_after = _rss_mb()
+        server_metrics = server.metrics.snapshot()
+    finally:
+        await server.aclose()
+
+    tools: Dict[str, Dict[str, Any]] = {}
+    for tool in sorted({tool for tool, _, _ in samples}):
+        latencies = [seconds for name, seconds, _ in samples if name == tool]
+        tools[tool] = {
+            'requests': len(latencies),
+            'errors': sum(1 for name, _, ok in samples if name == tool and not ok),
+            'latency': percentiles(latencies),
+        }
+
+    def mb(value: Optional[float]) -> Optional[float]:
+        return round(value, 1) if value is not None else None
+
+    return {
+        'version': RESULTS_VERSION,
+        'timestamp': datetime.now(timezone.utc).isoformat(),
+        'git_commit': _git_commit(),
+        'python': platform.python_version(),
+        'platform': platform.platform(),
+        'config': asdict(config),
+        'totals': {
+            'requests': len(samples),
+            'errors': sum(1 for _, _, ok in samples if not ok),
+            'duration_seconds': round(duration, 3),
+            'throughput_rps': round(len(samples) / duration, 2) if duration else 0.0,
+            'latency': percentiles([seconds for _, seconds, _ in samples]),
+        },
+        'tools': tools,
+        'memory': {
+            'rss_mb': mb(rss_after),
+            'rss_growth_mb': mb(rss_after - rss_before) if rss_before is not None and rss_after is not None else None,
+            'peak_rss_mb': mb(_peak_rss_mb()),
+            'traced_peak_mb': mb(traced_peak),
+        },
+        'upstream_calls': {
+            'gemini': gemini_model.calls,
+            'emotion': emotion_backend.calls,
+        },
+        'server_metrics': server_metrics,
+    }
+
+
+def _git_commit() -> Optional[str]:
+    try:
+        return subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__)), timeout=5).stdout.strip() or None
+    except (OSError, subprocess.SubprocessError):
+        return None
+
+
+def compare_results(baseline: Dict[str, Any], current: Dict[str, Any], tolerance: float = 0.1,
+                    min_delta_ms: float = 5.0) -> List[str]:
+    """Regressions of ``current`` against ``baseline`` beyond ``tolerance`` (a fraction)
+
+    Latency percentiles regress when they grow by more than ``tolerance``
+    and at least ``min_delta_ms``, throughput when it drops.
+    """
+    regressions = []
+
+    def check_latency(label: str, before: Dict[str, float], after: Dict[str, float]):
+        for key in ('p50_ms', 'p95_ms', 'p99_ms'):
+            grew = after[key] - before.get(key, 0)
+            if before.get(key) and after[key] > before[key] * (1 + tolerance) and grew >= min_delta_ms:
+                regressions.append(f"{label} {key}: {before[key]} -> {after[key]}")
+
+    check_latency('total', baseline['totals']['latency'], current['totals']['latency'])
+    before_rps, after_rps = baseline['totals']['throughput_rps'], current['totals']['throughput_rps']
+    if after_rps < before_rps * (1 - tolerance):
+        regressions.append(f"throughput_rps: {before_rps} -> {after_rps}")
+    for tool, result in current['tools'].items():
+        if tool in baseline['tools']:
+            check_latency(tool, baseline['tools'][tool]['latency'], result['latency'])
+    return regressions
+
+
+def format_report(results: Dict[str, Any]) -> str:
+    totals = results['totals']
+    lines = [
+        f"{totals['requests']} requests in {totals['duration_seconds']}s "
+        f"({totals['throughput_rps']} req/s, {totals['errors']} errors, "
+        f"concurrency {results['config']['concurrency']})",
+        f"{'tool':<28}{'n':>6}{'err':>5}{'p50 ms':>10}{'p95 ms':>10}{'p99 ms':>10}",
+    ]
+    for tool, result in [('all', {**totals, 'latency': totals['latency']})] + list(results['tools'].items()):
+        latency = result['latency']
+        lines.append(f"{tool:<28}{result['requests']:>6}{result['errors']:>5}"
+                     f"{latency['p50_ms']:>10}{latency['p95_ms']:>10}{latency['p99_ms']:>10}")
+    memory = results['memory']
+    lines.append(f"memory: rss {memory['rss_mb']} MB (growth {memory['rss_growth_mb']} MB), "
+                 f"peak rss {memory['peak_rss_mb']} MB, traced peak {memory['traced_peak_mb']} MB")
+    return '\n'.join(lines)
+
+
+def _parse_mix(text: str) -> Dict[str, float]:
+    mix = {}
+    for item in text.split(','):
+        tool, _, weight = item.partition('=')
+        mix[tool.strip()] = float(weight or 1)
+    return mix
+
+
+def main(argv: Optional[List[str]] = None) -> int:
+    defaults = BenchmarkConfig()
+    parser = argparse.ArgumentParser(description=__doc__.split('\n')[0])
+    parser.add_argument('--requests', type=int, default=defaults.requests, help="Measured tool calls")
+    parser.add_argument('--concurrency', type=int, default=defaults.concurrency, help="Simulated clients")
+    parser.add_argument('--warmup', type=int, default=defaults.warmup, help="Unmeasured calls sent first")
+    parser.add_argument('--users', type=int, default=defaults.users, help="Distinct user ids in the workload")
+    parser.add_argument('--seed', type=int, default=defaults.seed)
+    parser.add_argument('--gemini-latency-ms', type=float, default=defaults.gemini_latency_ms)
+    parser.add_argument('--emotion-latency-ms', type=float, default=defaults.emotion_latency_ms)
+    parser.add_argument('--bigquery-latency-ms', type=float, default=defaults.bigquery_latency_ms)
+    parser.add_argument('--jitter', type=float, default=defaults.jitter, help="Relative spread of stub latencies")
+    parser.add_argument('--storage', choices=['bigquery', 'sqlite', 'memory'], default=defaults.storage)
+    parser.add_argument('--mix', type=_parse_mix, default=None,
+                        help="Tool weights, e.g. mood_check_in=5,provide_mindfulness=2")
+    parser.add_argument('--trace-memory', action='store_true', help="Record the Python heap peak (slower)")
+    parser.add_argument('--output', help="Write the results JSON here")
+    parser.add_argument('--compare', help="Baseline results JSON; exit 1 on regressions")
+    parser.add_argument('--tolerance', type=float, default=0.1, help="Allowed relative regression")
+    parser.add_argument('--min-delta-ms', type=float, default=5.0, help="Latency changes smaller than this are noise")
+    args = parser.parse_args(argv)
+
+    config = BenchmarkConfig(
+        requests=args.requests, concurrency=args.concurrency, warmup=args.warmup, users=args.users,
+        seed=args.seed, gemini_latency_ms=args.gemini_latency_ms, emotion_latency_ms=args.emotion_latency_ms,
+        bigquery_latency_ms=args.bigquery_latency_ms, jitter=args.jitter, storage=args.storage,
+        mix=args.mix or dict(DEFAULT_MIX), trace_memory=args.trace_memory
+    )
+    with tempfile.TemporaryDirectory(prefix='wellness-bench-') as workdir:
+        results = asyncio.run(run_benchmark(config, workdir))
+
+    print(format_report(results))
+    if args.output:
+        with open(args.output, 'w', encoding='utf-8') as f:
+            json.dump(results, f, indent=2)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f:
+            regressions = compare_results(json.load(f), results, args.tolerance, args.min_delta_ms)
+        for regression in regressions:
+            print(f"REGRESSION {regression}")
+        return 1 if regressions else 0
+    return 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
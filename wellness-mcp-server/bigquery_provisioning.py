@@ -0,0 +1,143 @@
+"""Lazy BigQuery client and cached, concurrent table provisioning"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import threading
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from lazy_imports import load_bigquery
+from wellness_tables import TABLE_SCHEMAS, table_name
+
+logger = logging.getLogger(__name__)
+
+
+def bigquery_schema(table: str) -> List[Any]:
+    """``SchemaField`` list for a wellness table, given its name or full table id
+
+    ``Client.insert_rows`` needs the schema to serialize rows when it is
+    given a table id rather than a ``Table``.
+    """
+    bigquery = load_bigquery()
+    return [bigquery.SchemaField(name, kind) for name, kind in TABLE_SCHEMAS[table_name(table)]]
+
+
+class LazyBigQueryClient:
+    """Builds the BigQuery client on first use
+
+    Constructing ``bigquery.Client`` resolves credentials and can take a
+    while, so it is deferred until a call actually needs it. Every method
+    of the real client is available through attribute access; the first
+    such access (normally from an executor thread) creates it. A failed
+    construction is not cached, so later calls retry.
+    """
+
+    def __init__(self, factory: Callable[[], Any]):
+        self._factory = factory
+        self._client = None
+        self._lock = threading.Lock()
+
+    @property
+    def created(self) -> bool:
+        return self._client is not None
+
+    def get(self) -> Any:
+        if self._client is None:
+            with self._lock:
+                if self._client is None:
+                    self._client = self._factory()
+        return self._client
+
+    def __getattr__(self, name: str) -> Any:
+        if name.startswith('_'):
+            raise AttributeError(name)
+        return getattr(self.get(), name)
+
+
+def schema_hash(table_id: str, columns: List[Tuple[str, str]]) -> str:
+    payload = json.dumps([table_id, columns], sort_keys=True).encode('utf-8')
+    return hashlib.sha256(payload).hexdigest()[:16]
+
+
+class TableProvisioner:
+    """Creates missing BigQuery tables concurrently, once per schema version
+
+    Provisioned tables are recorded in ``cache_path`` keyed by a hash of
+    their id and schema, so later startups skip BigQuery entirely unless
+    the schema changes. ``create_table`` runs with ``exists_ok=True`` so
+    existing tables are not treated as errors.
+    """
+
+    def __init__(self, client: Any, project_id: str, dataset_id: str, cache_path: Optional[str] = None,
+                 schemas: Optional[Dict[str, List[Tuple[str, str]]]] = None):
+        self.client = client
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.cache_path = cache_path
+        self.schemas = schemas or TABLE_SCHEMAS
+
+    def _load_cache(self) -> Dict[str, str]:
+        if not self.cache_path:
+            return {}
+        try:
+            with open(self.cache_path, 'r', encoding='utf-8') as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return {}
+
+    def _save_cache(self, cache: Dict[str, str]):
+        if not self.cache_path:
+            return
+        tmp_path = f"{self.cache_path}.tmp"
+        try:
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump(cache, f, indent=2)
+            os.replace(tmp_path, self.cache_path)
+        except OSError as e:
+            logger.warning("Could not write table cache: %s", e)
+
+    def pending_tables(self) -> Dict[str, str]:
+        """Table ids whose schema is not recorded as provisioned, with their hash"""
+        cache = self._load_cache()
+        pending = {}
+        for table, columns in self.schemas.items():
+            table_id = f"{self.project_id}.{self.dataset_id}.{table}"
+            digest = schema_hash(table_id, columns)
+            if cache.get(table_id) != digest:
+                pending[table_id] = digest
+        return pending
+
+    def _create_table(self, table_id: str):
+        bigquery = load_bigquery()
+
+        columns = self.schemas[table_id.rsplit('.', 1)[-1]]
+        schema = [bigquery.SchemaField(name, kind) for name, kind in columns]
+        self.client.create_table(bigquery.Table(table_id, schema=schema), exists_ok=True)
+
+    async def provision(self) -> List[str]:
+        """Create every pending table concurrently; returns the ids provisioned"""
+        pending = await asyncio.to_thread(self.pending_tables)
+        if not pending:
+            return []
+
+        results = await asyncio.gather(
+            *(asyncio.to_thread(self._create_table, table_id) for table_id in pending),
+            return_exceptions=True
+        )
+
+        cache = self._load_cache()
+        provisioned = []
+        for (table_id, digest), result in zip(pending.items(), results):
+            if isinstance(result, Exception):
+                logger.error("Could not provision table %s: %s", table_id, result)
+                continue
+            cache[table_id] = digest
+            provisioned.append(table_id)
+        self._save_cache(cache)
+
+        failures = [result for result in results if isinstance(result, Exception)]
+        if failures:
+            raise failures[0]
+        return provisioned
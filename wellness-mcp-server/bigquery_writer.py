@@ -0,0 +1,187 @@
+"""Background, batched BigQuery writer for the wellness MCP server"""
+
+import asyncio
+import logging
+import time
+from contextlib import nullcontext
+from functools import partial
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Set, Union
+
+from metrics import MetricsRegistry
+
+logger = logging.getLogger(__name__)
+
+
+class _FlushRequest:
+    """Queue marker asking the worker to flush everything buffered so far"""
+
+    def __init__(self, stop: bool = False):
+        self.stop = stop
+        self.done = asyncio.get_running_loop().create_future()
+
+
+class BatchedBigQueryWriter:
+    """Coalesces rows per table and inserts them in bulk off the event loop
+
+    Rows are queued through ``enqueue`` and written by a single worker task
+    once a table has ``max_batch_size`` rows pending or ``flush_interval``
+    seconds have passed. The queue is bounded by ``max_buffered_rows`` so
+    producers wait (backpressure) instead of growing memory without limit.
+    ``client.insert_rows`` is blocking, so it always runs in an executor.
+    ``selected_fields(table_id)``, when given, supplies the schema passed to
+    ``insert_rows``; BigQuery cannot serialize rows for a bare table id
+    without it. Rows from failed batches are passed to ``on_error`` (sync or
+    async).
+    Inserts are timed as ``bigquery_insert`` spans when ``metrics`` is given.
+    """
+
+    def __init__(self, client: Any, max_batch_size: int = 500, flush_interval: float = 1.0,
+                 max_buffered_rows: int = 10000,
+                 on_error: Optional[Callable[[str, List[Dict[str, Any]], Exception],
+                                             Union[None, Awaitable[None]]]] = None,
+                 metrics: Optional[MetricsRegistry] = None,
+                 selected_fields: Optional[Callable[[str], List[Any]]] = None):
+        self.client = client
+        self.selected_fields = selected_fields
+        self.max_batch_size = max(1, max_batch_size)
+        self.flush_interval = flush_interval
+        self.max_buffered_rows = max(1, max_buffered_rows)
+        self.on_error = on_error
+        self.metrics = metrics
+
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._pending: Dict[str, List[Dict[str, Any]]] = {}
+        self._flush_requests: Set[_FlushRequest] = set()
+        self._closed = False
+
+        self.stats = {
+            'rows_enqueued': 0,
+            'rows_written': 0,
+            'batches_written': 0,
+            'rows_failed': 0,
+        }
+
+    @property
+    def pending_rows(self) -> int:
+        """Rows accepted but not yet handed to BigQuery"""
+        queued = self._queue.qsize() if self._queue else 0
+        return queued + sum(len(rows) for rows in self._pending.values())
+
+    def start(self):
+        """Start the worker task on the running loop (idempotent)"""
+        if self._worker is None or self._worker.done():
+            if self._queue is None:
+                self._queue = asyncio.Queue(maxsize=self.max_buffered_rows)
+            self._worker = asyncio.get_running_loop().create_task(self._run())
+
+    async def enqueue(self, table_id: str, rows: List[Dict[str, Any]]):
+        """Queue rows for ``table_id``; waits while the buffer is full"""
+        if self._closed:
+            raise RuntimeError("BigQuery writer is closed")
+        self.start()
+        for row in rows:
+            await self._queue.put((table_id, row))
+            self.stats['rows_enqueued'] += 1
+
+    async def flush(self):
+        """Write everything queued so far and wait for it to complete"""
+        if self._queue is None:
+            return
+        self.start()
+        await self._submit(_FlushRequest())
+
+    async def close(self):
+        """Flush remaining rows and stop the worker"""
+        if self._closed:
+            return
+        self._closed = True
+        if self._queue is None or self._worker is None or self._worker.done():
+            return
+        await self._submit(_FlushRequest(stop=True))
+        await self._worker
+
+    async def _submit(self, request: _FlushRequest):
+        self._flush_requests.add(request)
+        try:
+            await self._queue.put(request)
+            await request.done
+        finally:
+            self._flush_requests.discard(request)
+
+    async def _run(self):
+        try:
+            await self._process()
+        finally:
+            # Never leave flush() or close() waiting on a worker that is gone
+            for request in self._flush_requests:
+                if not request.done.done():
+                    request.done.set_exception(RuntimeError("BigQuery writer stopped before flushing"))
+
+    async def _process(self):
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + self.flush_interval
+
+        while True:
+            timeout = max(0.0, deadline - loop.time())
+            try:
+                item = await asyncio.wait_for(self._queue.get(), timeout=timeout)
+            except asyncio.TimeoutError:
+                # wait_for can turn a cancellation that lands as the timeout
+                # fires into TimeoutError; honour it instead of looping on
+                task = asyncio.current_task()
+                if getattr(task, 'cancelling', lambda: 0)():
+                    raise asyncio.CancelledError() from None
+                await self._flush_all()
+                deadline = loop.time() + self.flush_interval
+                continue
+
+            if isinstance(item, _FlushRequest):
+                await self._flush_all()
+                deadline = loop.time() + self.flush_interval
+                if not item.done.done():
+                    item.done.set_result(None)
+                if item.stop:
+                    return
+                continue
+
+            table_id, row = item
+            batch = self._pending.setdefault(table_id, [])
+            batch.append(row)
+            if len(batch) >= self.max_batch_size:
+                await self._flush_table(table_id)
+
+    async def _flush_all(self):
+        for table_id in list(self._pending):
+            await self._flush_table(table_id)
+
+    async def _flush_table(self, table_id: str):
+        rows = self._pending.pop(table_id, None)
+        if not rows:
+            return
+
+        started = time.perf_counter()
+        try:
+            loop = asyncio.get_running_loop()
+            with self.metrics.span('bigquery_insert', tool='background') if self.metrics else nullcontext():
+                insert = self.client.insert_rows
+                if self.selected_fields:
+                    insert = partial(insert, selected_fields=self.selected_fields(table_id))
+                errors = await loop.run_in_executor(None, insert, table_id, rows)
+                if errors:
+                    raise RuntimeError(f"insert_rows reported errors: {errors}")
+        except Exception as e:
+            self.stats['rows_failed'] += len(rows)
+            logger.error("Error writing %d rows to %s: %s", len(rows), table_id, e)
+            if self.on_error:
+                try:
+                    result = self.on_error(table_id, rows, e)
+                    if asyncio.iscoroutine(result):
+                        await result
+                except Exception:
+                    logger.exception("Error handler failed; dropping %d rows for %s", len(rows), table_id)
+            return
+
+        self.stats['rows_written'] += len(rows)
+        self.stats['batches_written'] += 1
+        self.stats['last_flush_seconds'] = time.perf_counter() - started
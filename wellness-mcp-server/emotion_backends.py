@@ -0,0 +1,267 @@
+"""Interchangeable facial emotion analysis backends
+
+- ``HumeAPIBackend``: Hume's streaming face model over the network
+- ``LocalModelBackend``: a CPU model run in the CPU process pool, with
+  concurrent frames grouped into micro-batches
+- ``MockEmotionBackend``: fixed scores for tests and demos
+"""
+
+import asyncio
+import importlib
+import importlib.util
+import threading
+from abc import ABC, abstractmethod
+from typing import Any, Callable, Dict, List, Optional, Set, Tuple, Union
+
+from lazy_imports import optional_module
+from worker_pools import WorkerPools
+
+# Emotion scores produced for one frame, or None when no face was found
+FrameScores = Optional[Dict[str, float]]
+
+# Models loaded in this process, by spec; the CPU pool's workers keep theirs
+# for every batch
+_worker_models: Dict[str, Callable[[List[bytes]], List[FrameScores]]] = {}
+_worker_models_lock = threading.Lock()
+
+
+def emotion_result(scores: FrameScores, backend: str) -> Dict[str, Any]:
+    """Result dict in the shape the tool handlers expect"""
+    if not scores:
+        return {'success': False, 'error': 'No face detected', 'backend': backend}
+    emotions = {name: round(float(score), 4) for name, score in scores.items()}
+    dominant = max(emotions, key=emotions.get)
+    return {
+        'success': True,
+        'emotions': emotions,
+        'dominant_emotion': dominant,
+        'confidence_score': emotions[dominant],
+        'backend': backend,
+    }
+
+
+class EmotionBackend(ABC):
+    """Analyzes one facial frame into emotion scores between 0 and 1"""
+
+    name = 'abstract'
+
+    @abstractmethod
+    async def analyze_facial_emotions(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        """Result with ``success``, ``emotions`` and ``dominant_emotion`` (or ``error``)"""
+
+    async def close(self):
+        """Release workers and connections"""
+
+
+class MockEmotionBackend(EmotionBackend):
+    """Fixed scores; no network or model needed"""
+
+    name = 'mock'
+
+    async def analyze_facial_emotions(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        result = emotion_result({
+            'joy': 0.7,
+            'sadness': 0.1,
+            'anger': 0.05,
+            'fear': 0.03,
+            'surprise': 0.12
+        }, self.name)
+        result['note'] = 'This is mock data - set EMOTION_BACKEND to hume or local for real analysis'
+        return result
+
+
+def parse_hume_face_result(result: Dict[str, Any]) -> FrameScores:
+    """Emotion scores of the first face in a Hume streaming response
+
+    Hume names emotions like ``"Surprise (negative)"``; names are lowercased
+    and the two surprise variants are also combined into ``surprise``.
+    """
+    if 'error' in result:
+        raise RuntimeError(result['error'])
+    predictions = result.get('face', {}).get('predictions') or []
+    if not predictions:
+        return None
+    scores = {item['name'].lower(): item['score'] for item in predictions[0].get('emotions', [])}
+    surprise = [score for name, score in scores.items() if name.startswith('surprise')]
+    if surprise:
+        scores['surprise'] = max(surprise)
+    return scores
+
+
+def load_hume_stream_api() -> Tuple[Any, Any]:
+    """``HumeStreamClient`` and ``FaceConfig`` from the hume SDK
+
+    hume 0.7.0 exports the streaming API at the top level; 0.7.1 to 0.8.x
+    keep it under ``hume.legacy``. Later releases dropped it.
+    """
+    legacy = optional_module('hume.legacy')
+    if legacy is not None:
+        from hume.legacy.models.config import FaceConfig
+        return legacy.HumeStreamClient, FaceConfig
+    hume = optional_module('hume')
+    if hume is None:
+        raise ImportError("The hume package is not installed")
+    from hume.models.config import FaceConfig
+    return hume.HumeStreamClient, FaceConfig
+
+
+class HumeAPIBackend(EmotionBackend):
+    """Hume's streaming face model; the SDK is imported on first use"""
+
+    name = 'hume'
+
+    def __init__(self, api_key: str):
+        self.api_key = api_key
+        self._client = None
+        self._face_config = None
+
+    async def analyze_facial_emotions(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        try:
+            if self._client is None:
+                stream_client, self._face_config = load_hume_stream_api()
+                self._client = stream_client(self.api_key)
+        except Exception as e:
+            return {'success': False, 'error': f"Hume SDK unavailable: {str(e)}", 'backend': self.name}
+        try:
+            async with self._client.connect([self._face_config()]) as socket:
+                result = await socket.send_bytes(bytes(image_data))
+            return emotion_result(parse_hume_face_result(result), self.name)
+        except Exception as e:
+            return {'success': False, 'error': f"Hume API error: {str(e)}", 'backend': self.name}
+
+
+def _split_model_spec(spec: str) -> Tuple[str, str]:
+    module_name, _, attribute = spec.partition(':')
+    if not module_name or not attribute:
+        raise ValueError(f"Local emotion model must be given as module:factory, got {spec!r}")
+    return module_name, attribute
+
+
+def check_model_spec(spec: str):
+    """Validate a ``package.module:factory`` spec without importing the model"""
+    module_name, _ = _split_model_spec(spec)
+    try:
+        found = importlib.util.find_spec(module_name)
+    except (ImportError, ValueError):
+        found = None
+    if found is None:
+        raise ValueError(f"Local emotion model module {module_name!r} not found")
+
+
+def load_model_factory(spec: str) -> Callable[[], Callable[[List[bytes]], List[FrameScores]]]:
+    """Resolve a ``package.module:factory`` spec"""
+    module_name, attribute = _split_model_spec(spec)
+    return getattr(importlib.import_module(module_name), attribute)
+
+
+def _predict_batch(spec: str, frames: List[bytes]) -> List[FrameScores]:
+    model = _worker_models.get(spec)
+    if model is None:
+        with _worker_models_lock:
+            model = _worker_models.get(spec)
+            if model is None:
+                model = _worker_models[spec] = load_model_factory(spec)()
+    predictions = list(model(frames))
+    if len(predictions) != len(frames):
+        raise RuntimeError(f"Local model returned {len(predictions)} results for {len(frames)} frames")
+    return predictions
+
+
+class LocalModelBackend(EmotionBackend):
+    """Runs a CPU emotion model in the CPU process pool
+
+    ``model_spec`` names a factory (``module:function``) that each worker
+    process calls once, on its first batch; the returned predictor maps a
+    list of encoded frames to one score dict (or None) per frame. Only the
+    spec is checked here, so the model is never imported into the server
+    process. Frames arriving within ``max_batch_delay`` seconds of each
+    other are grouped into batches of up to ``max_batch_size``, and at most
+    ``workers`` batches run at once, so a burst of frames queues up into
+    larger batches instead of blocking the event loop.
+
+    Batches go through ``pools.run_cpu``, so they share the server's
+    metered, spawn-based CPU pool; without ``pools`` the backend keeps its
+    own pool of ``workers`` processes.
+    """
+
+    name = 'local'
+
+    def __init__(self, model_spec: str, workers: int = 2, max_batch_size: int = 8, max_batch_delay: float = 0.005,
+                 pools: Optional[WorkerPools] = None):
+        check_model_spec(model_spec)
+        self.model_spec = model_spec
+        self.workers = max(1, workers)
+        self.max_batch_size = max(1, max_batch_size)
+        self.max_batch_delay = max_batch_delay
+        self._owns_pools = pools is None
+        self.pools = pools if pools is not None else WorkerPools(io_workers=1, cpu_workers=self.workers)
+        self._slots: Optional[asyncio.Semaphore] = None
+        self._pending: List[Tuple[bytes, asyncio.Future]] = []
+        self._flush_handle: Optional[asyncio.TimerHandle] = None
+        self._batches: Set[asyncio.Task] = set()
+
+        self.stats = {'frames': 0, 'batches': 0, 'largest_batch': 0, 'errors': 0}
+
+    async def analyze_facial_emotions(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        loop = asyncio.get_running_loop()
+        future = loop.create_future()
+        # Frames cross the process boundary, so they are copied here once
+        self._pending.append((bytes(image_data), future))
+        self.stats['frames'] += 1
+        if len(self._pending) >= self.max_batch_size:
+            self._dispatch()
+        elif self._flush_handle is None:
+            self._flush_handle = loop.call_later(self.max_batch_delay, self._dispatch)
+        return emotion_result(await future, self.name)
+
+    def _dispatch(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        batch, self._pending = self._pending, []
+        if batch:
+            task = asyncio.ensure_future(self._run_batch(batch))
+            self._batches.add(task)
+            task.add_done_callback(self._batches.discard)
+
+    async def _run_batch(self, batch: List[Tuple[bytes, asyncio.Future]]):
+        if self._slots is None:
+            self._slots = asyncio.Semaphore(self.workers)
+        async with self._slots:
+            self.stats['batches'] += 1
+            self.stats['largest_batch'] = max(self.stats['largest_batch'], len(batch))
+            try:
+                predictions = await self.pools.run_cpu(_predict_batch, self.model_spec, [frame for frame, _ in batch])
+            except Exception as e:
+                self.stats['errors'] += 1
+                for _, future in batch:
+                    if not future.done():
+                        future.set_exception(e)
+                return
+        for (_, future), scores in zip(batch, predictions):
+            if not future.done():
+                future.set_result(scores)
+
+    async def close(self):
+        self._dispatch()
+        if self._batches:
+            await asyncio.gather(*self._batches, return_exceptions=True)
+        if self._owns_pools:
+            self.pools.shutdown(wait=False)
+
+
+def create_emotion_backend(name: str, api_key: Optional[str] = None, local_model: Optional[str] = None,
+                           **local_options: Any) -> EmotionBackend:
+    """Build the backend selected by ``EMOTION_BACKEND``"""
+    name = name.lower()
+    if name == 'mock':
+        return MockEmotionBackend()
+    if name == 'hume':
+        if not api_key:
+            raise ValueError("The hume emotion backend requires HUME_API_KEY")
+        return HumeAPIBackend(api_key)
+    if name == 'local':
+        if not local_model:
+            raise ValueError("The local emotion backend requires EMOTION_LOCAL_MODEL (module:factory)")
+        return LocalModelBackend(local_model, **local_options)
+    raise ValueError(f"Unknown emotion backend: {name}")
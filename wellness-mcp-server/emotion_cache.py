@@ -0,0 +1,142 @@
+"""Result cache in front of the facial emotion analyzer"""
+
+import asyncio
+import hashlib
+import io
+from collections import OrderedDict
+from typing import Any, Dict, Optional, Union
+
+from lazy_imports import optional_module
+
+# Side of the grayscale thumbnail the difference hash is computed from
+_DHASH_SIZE = 8
+
+
+def content_hash(image_data: Union[bytes, memoryview]) -> str:
+    """Fast digest of the exact frame bytes"""
+    return hashlib.blake2b(image_data, digest_size=16).hexdigest()
+
+
+def perceptual_hash(image_data: Union[bytes, memoryview]) -> Optional[int]:
+    """64-bit difference hash of a frame, or None without Pillow or for unreadable data
+
+    Re-encoded or slightly noisy copies of a frame differ in only a few
+    bits, so near-identical frames are found by Hamming distance.
+    """
+    pil_image = optional_module('PIL.Image')
+    if pil_image is None:
+        return None
+    try:
+        with pil_image.open(io.BytesIO(image_data)) as frame:
+            frame.draft('L', (_DHASH_SIZE * 4, _DHASH_SIZE * 4))
+            pixels = frame.convert('L').resize((_DHASH_SIZE + 1, _DHASH_SIZE)).tobytes()
+    except (OSError, ValueError):
+        return None
+    bits = 0
+    for row in range(_DHASH_SIZE):
+        for column in range(_DHASH_SIZE):
+            left = pixels[row * (_DHASH_SIZE + 1) + column]
+            bits = (bits << 1) | (left > pixels[row * (_DHASH_SIZE + 1) + column + 1])
+    return bits
+
+
+class CachedEmotionAnalyzer:
+    """LRU cache of successful analyses in front of an emotion analyzer
+
+    Frames are keyed by a content hash; concurrent requests for the same
+    frame share one analysis. With ``perceptual`` enabled (and Pillow
+    installed) a frame whose difference hash is within ``max_distance``
+    bits of a cached frame reuses that frame's result. Failed analyses are
+    never cached.
+    """
+
+    def __init__(self, analyzer: Any, max_entries: int = 256, perceptual: bool = False, max_distance: int = 4):
+        self.analyzer = analyzer
+        self.max_entries = max(1, max_entries)
+        self.perceptual = perceptual
+        self.max_distance = max_distance
+        self._entries: "OrderedDict[str, Dict[str, Any]]" = OrderedDict()
+        self._perceptual_keys: "OrderedDict[str, int]" = OrderedDict()
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.stats = {'hits': 0, 'perceptual_hits': 0, 'misses': 0, 'coalesced': 0, 'evictions': 0}
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def clear(self):
+        self._entries.clear()
+        self._perceptual_keys.clear()
+
+    async def close(self):
+        await self.analyzer.close()
+
+    async def analyze_facial_emotions(self, image_data: Union[bytes, memoryview]) -> Dict[str, Any]:
+        key = content_hash(image_data)
+        result = self._lookup(key)
+        if result is not None:
+            self.stats['hits'] += 1
+            return dict(result)
+
+        future = self._inflight.get(key)
+        if future is not None:
+            self.stats['hits'] += 1
+            self.stats['coalesced'] += 1
+            return dict(await asyncio.shield(future))
+
+        dhash = None
+        if self.perceptual:
+            # Decoding for the hash is CPU work; keep it off the event loop
+            dhash = await asyncio.to_thread(perceptual_hash, bytes(image_data))
+            similar = self._nearest(dhash)
+            if similar is not None:
+                self._entries.move_to_end(similar)
+                self.stats['hits'] += 1
+                self.stats['perceptual_hits'] += 1
+                return dict(self._entries[similar])
+
+        self.stats['misses'] += 1
+        future = asyncio.ensure_future(self.analyzer.analyze_facial_emotions(image_data))
+        self._inflight[key] = future
+        future.add_done_callback(lambda done: self._forget(key, done))
+        result = await asyncio.shield(future)
+        if result.get('success'):
+            self._store(key, result, dhash)
+        return dict(result)
+
+    def _forget(self, key: str, future: asyncio.Future):
+        if self._inflight.get(key) is future:
+            del self._inflight[key]
+        if not future.cancelled():
+            # Mark the exception retrieved even if every waiter went away
+            future.exception()
+
+    def _lookup(self, key: str) -> Optional[Dict[str, Any]]:
+        result = self._entries.get(key)
+        if result is not None:
+            self._entries.move_to_end(key)
+        return result
+
+    def _nearest(self, dhash: Optional[int]) -> Optional[str]:
+        if dhash is None:
+            return None
+        best_key, best_distance = None, self.max_distance + 1
+        for key, other in self._perceptual_keys.items():
+            distance = bin(dhash ^ other).count('1')
+            if distance < best_distance:
+                best_key, best_distance = key, distance
+        return best_key
+
+    def _store(self, key: str, result: Dict[str, Any], dhash: Optional[int]):
+        self._entries[key] = result
+        self._entries.move_to_end(key)
+        if dhash is not None:
+            self._perceptual_keys[key] = dhash
+        while len(self._entries) > self.max_entries:
+            evicted, _ = self._entries.popitem(last=False)
+            self._perceptual_keys.pop(evicted, None)
+            self.stats['evictions'] += 1
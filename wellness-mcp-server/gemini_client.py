@@ -0,0 +1,141 @@
+"""Shared Gemini client with concurrency limits, request coalescing and rate limiting"""
+
+import asyncio
+import time
+from typing import Any, AsyncIterator, Dict, Optional
+
+
+class TokenBucket:
+    """Async token bucket refilling at ``rate`` tokens per second up to ``capacity``"""
+
+    def __init__(self, rate: float, capacity: Optional[float] = None):
+        if rate <= 0:
+            raise ValueError("rate must be positive")
+        self.rate = rate
+        self.capacity = capacity if capacity is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    @classmethod
+    def per_minute(cls, requests_per_minute: float, burst: Optional[float] = None) -> "TokenBucket":
+        return cls(requests_per_minute / 60.0, burst if burst is not None else requests_per_minute)
+
+    def _refill(self):
+        now = time.monotonic()
+        self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+        self._updated = now
+
+    async def acquire(self, tokens: float = 1.0):
+        """Wait until ``tokens`` are available and take them"""
+        # The lock keeps waiters in FIFO order so bursts drain fairly
+        async with self._lock:
+            while True:
+                self._refill()
+                if self._tokens >= tokens:
+                    self._tokens -= tokens
+                    return
+                await asyncio.sleep((tokens - self._tokens) / self.rate)
+
+
+class GeminiClient:
+    """Wraps a Gemini ``GenerativeModel`` for use by all tool handlers
+
+    - at most ``max_concurrency`` upstream calls run at once
+    - concurrent calls with the same prompt share one upstream request
+    - every caller waits at most ``timeout`` seconds (overridable per call)
+    - an optional token bucket keeps the request rate within quota
+    """
+
+    def __init__(self, model: Any, max_concurrency: int = 4, timeout: float = 30.0,
+                 rate_limiter: Optional[TokenBucket] = None):
+        self.model = model
+        self.max_concurrency = max(1, max_concurrency)
+        self.timeout = timeout
+        self.rate_limiter = rate_limiter
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._inflight: Dict[str, asyncio.Future] = {}
+
+        self.stats = {
+            'requests': 0,
+            'upstream_calls': 0,
+            'coalesced': 0,
+            'timeouts': 0,
+            'errors': 0,
+        }
+
+    @property
+    def in_flight(self) -> int:
+        """Distinct prompts currently being generated"""
+        return len(self._inflight)
+
+    async def generate(self, prompt: str, timeout: Optional[float] = None) -> str:
+        """Return the generated text for ``prompt``"""
+        self.stats['requests'] += 1
+        timeout = self.timeout if timeout is None else timeout
+
+        future = self._inflight.get(prompt)
+        if future is None:
+            future = asyncio.ensure_future(self._call_upstream(prompt))
+            self._inflight[prompt] = future
+            future.add_done_callback(lambda done: self._forget(prompt, done))
+        else:
+            self.stats['coalesced'] += 1
+
+        try:
+            # Shield so one caller timing out does not cancel the shared request
+            return await asyncio.wait_for(asyncio.shield(future), timeout)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise TimeoutError(f"Gemini request timed out after {timeout}s") from None
+
+    async def stream(self, prompt: str, timeout: Optional[float] = None) -> AsyncIterator[str]:
+        """Yield text chunks as Gemini produces them
+
+        Streams are never coalesced, but they count against the same
+        concurrency and rate limits. ``timeout`` bounds the whole stream.
+        """
+        self.stats['requests'] += 1
+        loop = asyncio.get_running_loop()
+        deadline = loop.time() + (self.timeout if timeout is None else timeout)
+
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        async with self._semaphore:
+            self.stats['upstream_calls'] += 1
+            try:
+                response = await asyncio.wait_for(
+                    self.model.generate_content_async(prompt, stream=True), deadline - loop.time())
+                chunks = response.__aiter__()
+                while True:
+                    try:
+                        chunk = await asyncio.wait_for(chunks.__anext__(), deadline - loop.time())
+                    except StopAsyncIteration:
+                        break
+                    if chunk.text:
+                        yield chunk.text
+            except asyncio.TimeoutError:
+                self.stats['timeouts'] += 1
+                raise TimeoutError(f"Gemini stream timed out after {timeout or self.timeout}s") from None
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+
+    async def _call_upstream(self, prompt: str) -> str:
+        if self.rate_limiter:
+            await self.rate_limiter.acquire()
+        async with self._semaphore:
+            self.stats['upstream_calls'] += 1
+            try:
+                response = await asyncio.wait_for(self.model.generate_content_async(prompt), self.timeout)
+            except Exception:
+                self.stats['errors'] += 1
+                raise
+        return response.text
+
+    def _forget(self, prompt: str, future: asyncio.Future):
+        if self._inflight.get(prompt) is future:
+            del self._inflight[prompt]
+        if not future.cancelled():
+            # Mark the exception retrieved even if every waiter already timed out
+            future.exception()
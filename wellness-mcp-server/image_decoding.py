@@ -0,0 +1,218 @@
+"""Bounded, low-copy decoding of base64 camera frames"""
+
+import asyncio
+import binascii
+import io
+import threading
+from typing import List, Optional, Tuple, Union
+
+from lazy_imports import optional_module
+
+# Largest decoded frame accepted by default (10 MiB)
+DEFAULT_MAX_IMAGE_BYTES = 10 * 1024 * 1024
+# A data URL header ("data:image/jpeg;base64,") is short; never scan further for the comma
+_MAX_HEADER_CHARS = 256
+# Base64 characters decoded per step; a multiple of 4 so every chunk decodes on its own
+_CHUNK_CHARS = 64 * 1024
+# Payloads at least this long are decoded in a worker thread instead of on the loop
+OFFLOAD_DECODE_CHARS = 256 * 1024
+
+
+class ImagePayloadError(ValueError):
+    """The image payload is malformed or too large"""
+
+
+class BufferPool:
+    """Reuses decode buffers across requests
+
+    Buffers are handed out with ``acquire`` and come back through
+    ``release``; at most ``max_buffers`` idle buffers are kept, so the pool
+    holds roughly one buffer per concurrently decoded frame.
+    """
+
+    def __init__(self, max_buffers: int = 4):
+        self.max_buffers = max_buffers
+        self._idle: List[bytearray] = []
+        # Frames may be decoded in worker threads
+        self._lock = threading.Lock()
+
+    def acquire(self, size: int) -> bytearray:
+        with self._lock:
+            for index, buffer in enumerate(self._idle):
+                if len(buffer) >= size:
+                    return self._idle.pop(index)
+        return bytearray(size)
+
+    def release(self, buffer: bytearray):
+        with self._lock:
+            if len(self._idle) < self.max_buffers:
+                self._idle.append(buffer)
+                return
+            # Keep the larger buffers; they can serve any smaller frame
+            smallest = min(range(len(self._idle)), key=lambda index: len(self._idle[index]), default=None)
+            if smallest is not None and len(self._idle[smallest]) < len(buffer):
+                self._idle[smallest] = buffer
+
+
+class DecodedImage:
+    """Decoded frame bytes backed by a pooled buffer
+
+    ``data`` is a memoryview into the buffer and is only valid until
+    ``release`` is called (or the ``with`` block exits).
+    """
+
+    def __init__(self, buffer: bytearray, size: int, mime_type: Optional[str], pool: Optional[BufferPool] = None):
+        self._buffer = buffer
+        self._pool = pool
+        self.data = memoryview(buffer)[:size]
+        self.mime_type = mime_type
+
+    def __len__(self) -> int:
+        return len(self.data)
+
+    def __enter__(self) -> "DecodedImage":
+        return self
+
+    def __exit__(self, *exc_info):
+        self.release()
+
+    def release(self):
+        if self._buffer is None:
+            return
+        self.data.release()
+        if self._pool is not None:
+            self._pool.release(self._buffer)
+        self._buffer = None
+
+
+def parse_data_url_header(payload: str) -> Tuple[int, Optional[str]]:
+    """Offset where base64 data starts and the declared MIME type, if any
+
+    Only the first few hundred characters are scanned, so a multi-megabyte
+    payload is never copied or searched end to end.
+    """
+    if not payload.startswith('data:'):
+        return 0, None
+    comma = payload.find(',', 5, _MAX_HEADER_CHARS)
+    if comma < 0:
+        raise ImagePayloadError("Malformed data URL: missing ',' after the header")
+    header = payload[5:comma]
+    mime_type = header.split(';', 1)[0] or None
+    return comma + 1, mime_type
+
+
+def max_decoded_size(payload: str, offset: int = 0) -> int:
+    """Upper bound on the decoded size of ``payload[offset:]`` without decoding it"""
+    length = len(payload) - offset
+    padding = 0
+    if length and payload.endswith('=='):
+        padding = 2
+    elif length and payload.endswith('='):
+        padding = 1
+    return max(0, (length * 3) // 4 - padding)
+
+
+class ImageDecoder:
+    """Decodes base64 image payloads into pooled buffers
+
+    The size limit is enforced from the encoded length before any bytes are
+    decoded. Data is then decoded in fixed-size chunks straight into a
+    reused buffer, so peak memory is the encoded string plus one buffer
+    instead of the encoded string, a copy of it and the decoded bytes.
+    """
+
+    def __init__(self, max_bytes: int = DEFAULT_MAX_IMAGE_BYTES, max_dimension: int = 0,
+                 pool: Optional[BufferPool] = None):
+        self.max_bytes = max_bytes
+        self.max_dimension = max_dimension
+        self.pool = pool or BufferPool()
+
+    def decode(self, payload: Union[str, bytes]) -> DecodedImage:
+        """Decode a base64 string or ``data:`` URL"""
+        if isinstance(payload, (bytes, bytearray)):
+            try:
+                payload = payload.decode('ascii')
+            except UnicodeDecodeError as e:
+                raise ImagePayloadError("Image data is not base64 text") from e
+        if not payload:
+            raise ImagePayloadError("No image data provided")
+
+        offset, mime_type = parse_data_url_header(payload)
+        limit = max_decoded_size(payload, offset)
+        if self.max_bytes and limit > self.max_bytes:
+            raise ImagePayloadError(f"Image too large: about {limit} bytes (maximum {self.max_bytes})")
+
+        buffer = self.pool.acquire(limit)
+        try:
+            size = self._decode_into(payload, offset, buffer)
+        except Exception:
+            self.pool.release(buffer)
+            raise
+        if not size:
+            self.pool.release(buffer)
+            raise ImagePayloadError("Invalid base64 image data: no image bytes")
+        return DecodedImage(buffer, size, mime_type, self.pool)
+
+    async def decode_async(self, payload: Union[str, bytes]) -> DecodedImage:
+        """``decode`` in a worker thread for large payloads
+
+        Small frames decode faster inline than the thread hand-off costs.
+        """
+        if len(payload) < OFFLOAD_DECODE_CHARS:
+            return self.decode(payload)
+        return await asyncio.to_thread(self.decode, payload)
+
+    @staticmethod
+    def _decode_into(payload: str, offset: int, buffer: bytearray) -> int:
+        position = 0
+        try:
+            for start in range(offset, len(payload), _CHUNK_CHARS):
+                end = start + _CHUNK_CHARS
+                if end >= len(payload):
+                    chunk = binascii.a2b_base64(payload[start:])
+                else:
+                    try:
+                        chunk = binascii.a2b_base64(payload[start:end])
+                    except binascii.Error:
+                        chunk = b''
+                    if len(chunk) != _CHUNK_CHARS // 4 * 3:
+                        # Embedded whitespace shifted the 4-character alignment;
+                        # decode the remainder in one piece instead
+                        chunk = binascii.a2b_base64(payload[start:])
+                        buffer[position:position + len(chunk)] = chunk
+                        return position + len(chunk)
+                buffer[position:position + len(chunk)] = chunk
+                position += len(chunk)
+        except binascii.Error as e:
+            raise ImagePayloadError(f"Invalid base64 image data: {e}") from e
+        return position
+
+    def normalize(self, image: DecodedImage) -> Union[bytes, memoryview]:
+        """Downscale frames larger than ``max_dimension`` to an RGB JPEG
+
+        Returns the original bytes when downscaling is disabled, Pillow is not
+        installed, the frame is already small enough, or Pillow cannot read it
+        (the emotion analyzer then decides what to do with it).
+        """
+        pil_image = optional_module('PIL.Image')
+        if not self.max_dimension or pil_image is None:
+            return image.data
+        try:
+            with pil_image.open(io.BytesIO(image.data)) as frame:
+                if max(frame.size) <= self.max_dimension:
+                    return image.data
+                # JPEG frames can be decoded at reduced scale directly
+                frame.draft('RGB', (self.max_dimension, self.max_dimension))
+                frame = frame.convert('RGB')
+                frame.thumbnail((self.max_dimension, self.max_dimension))
+                output = io.BytesIO()
+                frame.save(output, format='JPEG', quality=85)
+                return output.getvalue()
+        except (OSError, ValueError):
+            return image.data
+
+    async def normalize_async(self, image: DecodedImage) -> Union[bytes, memoryview]:
+        """``normalize`` in a worker thread when it has work to do"""
+        if not self.max_dimension or optional_module('PIL.Image') is None:
+            return image.data
+        return await asyncio.to_thread(self.normalize, image)
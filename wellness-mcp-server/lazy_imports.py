@@ -0,0 +1,63 @@
+"""Deferred loading of heavy optional SDKs
+
+``google.cloud.bigquery`` and ``google.generativeai`` take a noticeable
+share of process startup to import. The server only needs them once the
+matching integration is configured and first used, so they are imported
+through these helpers instead of at module level.
+"""
+
+import asyncio
+import importlib
+import threading
+from functools import lru_cache
+from types import ModuleType
+from typing import Any, Optional
+
+
+@lru_cache(maxsize=None)
+def optional_module(name: str) -> Optional[ModuleType]:
+    """Import ``name`` once, returning None if it is not installed"""
+    try:
+        return importlib.import_module(name)
+    except ImportError:
+        return None
+
+
+def load_bigquery() -> ModuleType:
+    return importlib.import_module('google.cloud.bigquery')
+
+
+def load_generativeai() -> ModuleType:
+    return importlib.import_module('google.generativeai')
+
+
+class LazyGenerativeModel:
+    """Stands in for ``GenerativeModel`` until the first request
+
+    The SDK is imported and the model built in a worker thread, so neither
+    process startup nor the event loop pays for the import. ``preload``
+    can be awaited (or scheduled) to warm it up ahead of the first call.
+    """
+
+    def __init__(self, model_name: str, api_key: str):
+        self.model_name = model_name
+        self.api_key = api_key
+        self._model = None
+        self._lock = threading.Lock()
+
+    def _build(self) -> Any:
+        with self._lock:
+            if self._model is None:
+                genai = load_generativeai()
+                genai.configure(api_key=self.api_key)
+                self._model = genai.GenerativeModel(self.model_name)
+        return self._model
+
+    async def preload(self) -> Any:
+        if self._model is None:
+            await asyncio.to_thread(self._build)
+        return self._model
+
+    async def generate_content_async(self, *args, **kwargs) -> Any:
+        model = await self.preload()
+        return await model.generate_content_async(*args, **kwargs)
@@ -0,0 +1,126 @@
+"""Durable SQLite storage used when BigQuery is unavailable"""
+
+import json
+import sqlite3
+import threading
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from wellness_tables import TABLE_SCHEMAS, parse_timestamp, table_name
+
+_SQLITE_TYPES = {
+    'STRING': 'TEXT',
+    'TIMESTAMP': 'TEXT',
+    'INT64': 'INTEGER',
+    'FLOAT64': 'REAL',
+    'JSON': 'TEXT',
+}
+
+
+class LocalWellnessStore:
+    """SQLite database in WAL mode holding the four wellness tables
+
+    Rows are inserted through ``insert_rows`` (the same call shape as the
+    BigQuery client), so a ``BatchedBigQueryWriter`` in front of it turns
+    many small saves into one transaction per batch. Each row carries an
+    ``_uploaded`` flag so rows written while offline can be replayed to
+    BigQuery once it is reachable again.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, isolation_level=None)
+        self._conn.row_factory = sqlite3.Row
+        self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute('PRAGMA synchronous=NORMAL')
+        self._create_tables()
+
+    def _create_tables(self):
+        with self._lock:
+            for table, columns in TABLE_SCHEMAS.items():
+                column_sql = ', '.join(f"{name} {_SQLITE_TYPES[kind]}" for name, kind in columns)
+                self._conn.execute(
+                    f"CREATE TABLE IF NOT EXISTS {table} ({column_sql}, _uploaded INTEGER NOT NULL DEFAULT 0)")
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_user_time ON {table} (user_id, timestamp)")
+                self._conn.execute(
+                    f"CREATE INDEX IF NOT EXISTS idx_{table}_pending ON {table} (_uploaded) WHERE _uploaded = 0")
+
+    def insert_rows(self, table_id: str, rows: List[Dict[str, Any]], uploaded: bool = False) -> List[Any]:
+        """Insert ``rows`` in a single transaction; returns an empty error list"""
+        table = table_name(table_id)
+        columns = [name for name, _ in TABLE_SCHEMAS[table]]
+        sql = (f"INSERT INTO {table} ({', '.join(columns)}, _uploaded) "
+               f"VALUES ({', '.join('?' for _ in columns)}, ?)")
+        values = [[_to_sql(row.get(name)) for name in columns] + [int(uploaded)] for row in rows]
+
+        with self._lock:
+            self._conn.execute('BEGIN')
+            try:
+                self._conn.executemany(sql, values)
+            except Exception:
+                self._conn.execute('ROLLBACK')
+                raise
+            self._conn.execute('COMMIT')
+        return []
+
+    def query_range(self, table: str, user_id: str, start: Optional[Any] = None,
+                    end: Optional[Any] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows for ``user_id`` with timestamps in ``[start, end]``, oldest first"""
+        sql = f"SELECT * FROM {table} WHERE user_id = ?"
+        params: List[Any] = [user_id]
+        if start is not None:
+            sql += " AND timestamp >= ?"
+            params.append(_to_sql(start))
+        if end is not None:
+            sql += " AND timestamp <= ?"
+            params.append(_to_sql(end))
+        sql += " ORDER BY timestamp"
+        if limit is not None:
+            sql += " LIMIT ?"
+            params.append(limit)
+
+        with self._lock:
+            rows = self._conn.execute(sql, params).fetchall()
+        return [_from_sql(table, row) for row in rows]
+
+    def pending_uploads(self, table: str, limit: int = 500) -> List[Tuple[int, Dict[str, Any]]]:
+        """Rows not yet uploaded to BigQuery as ``(rowid, row)`` pairs"""
+        with self._lock:
+            rows = self._conn.execute(
+                f"SELECT rowid AS _rowid, * FROM {table} WHERE _uploaded = 0 ORDER BY rowid LIMIT ?",
+                (limit,)).fetchall()
+        return [(row['_rowid'], _from_sql(table, row)) for row in rows]
+
+    def mark_uploaded(self, table: str, rowids: List[int]):
+        with self._lock:
+            self._conn.execute('BEGIN')
+            self._conn.executemany(f"UPDATE {table} SET _uploaded = 1 WHERE rowid = ?",
+                                   [(rowid,) for rowid in rowids])
+            self._conn.execute('COMMIT')
+
+    def count(self, table: str, pending_only: bool = False) -> int:
+        sql = f"SELECT COUNT(*) FROM {table}" + (" WHERE _uploaded = 0" if pending_only else "")
+        with self._lock:
+            return self._conn.execute(sql).fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def _to_sql(value: Any) -> Any:
+    if isinstance(value, datetime):
+        return value.isoformat()
+    if isinstance(value, (dict, list)):
+        return json.dumps(value)
+    return value
+
+
+def _from_sql(table: str, row: sqlite3.Row) -> Dict[str, Any]:
+    # Same shape as build_row: datetimes for TIMESTAMP, strings for JSON
+    return {
+        name: parse_timestamp(row[name]) if kind == 'TIMESTAMP' else row[name]
+        for name, kind in TABLE_SCHEMAS[table]
+    }
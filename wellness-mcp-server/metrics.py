@@ -0,0 +1,213 @@
+"""In-process metrics for tool calls and their Gemini, emotion and storage sub-spans
+
+Latencies go into fixed-bucket histograms, outcomes into counters, and
+values owned by other components (cache hit ratios, queue depths) are read
+through gauge callbacks when a snapshot is taken. ``prometheus_text``
+renders everything in the Prometheus text exposition format.
+"""
+
+import asyncio
+import bisect
+import logging
+import os
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Callable, Dict, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Upper bounds, in seconds, of the latency histogram buckets
+DEFAULT_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+PREFIX = 'wellness_'
+
+# Tool whose call is running in the current task; sub-spans are attributed to it
+current_tool: ContextVar[Optional[str]] = ContextVar('wellness_current_tool', default=None)
+
+Labels = Tuple[Tuple[str, str], ...]
+
+
+class Histogram:
+    """Cumulative-bucket latency histogram"""
+
+    def __init__(self, buckets: Tuple[float, ...] = DEFAULT_BUCKETS):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+        self.max = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+        self.max = max(self.max, value)
+
+    def quantile(self, q: float) -> float:
+        """Upper bound of the bucket holding the ``q`` quantile (``max`` for the overflow bucket)"""
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for bound, count in zip(self.buckets, self.counts):
+            seen += count
+            if seen >= rank:
+                return min(bound, self.max)
+        return self.max
+
+    def snapshot(self) -> Dict[str, float]:
+        return {
+            'count': self.count,
+            'mean_ms': round(self.sum / self.count * 1000, 2) if self.count else 0.0,
+            'p50_ms': round(self.quantile(0.5) * 1000, 2),
+            'p95_ms': round(self.quantile(0.95) * 1000, 2),
+            'p99_ms': round(self.quantile(0.99) * 1000, 2),
+            'max_ms': round(self.max * 1000, 2),
+        }
+
+
+def _labels(**labels: str) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _format_labels(labels: Labels, extra: str = '') -> str:
+    parts = [f'{key}="{value}"' for key, value in labels]
+    if extra:
+        parts.append(extra)
+    return '{' + ','.join(parts) + '}' if parts else ''
+
+
+class MetricsRegistry:
+    """Histograms, counters and gauges for one server"""
+
+    def __init__(self):
+        self.histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self.counters: Dict[str, Dict[Labels, float]] = {}
+        self._gauges: Dict[str, Tuple[str, Callable[[], Dict[str, float]]]] = {}
+
+    def observe(self, name: str, seconds: float, **labels: str):
+        series = self.histograms.setdefault(name, {})
+        key = _labels(**labels)
+        histogram = series.get(key)
+        if histogram is None:
+            histogram = series[key] = Histogram()
+        histogram.observe(seconds)
+
+    def increment(self, name: str, amount: float = 1, **labels: str):
+        series = self.counters.setdefault(name, {})
+        key = _labels(**labels)
+        series[key] = series.get(key, 0) + amount
+
+    def register_gauge(self, name: str, label: str, read: Callable[[], Dict[str, float]]):
+        """Read ``{label value: gauge value}`` from ``read`` whenever metrics are collected"""
+        self._gauges[name] = (label, read)
+
+    @contextmanager
+    def span(self, name: str, tool: Optional[str] = None) -> Iterator[None]:
+        """Time a sub-operation of the current tool call; exceptions count as errors"""
+        tool = tool or current_tool.get() or 'background'
+        started = time.perf_counter()
+        try:
+            yield
+        except BaseException as e:
+            if not isinstance(e, (asyncio.CancelledError, GeneratorExit)):
+                self.increment('span_errors', span=name, tool=tool)
+            raise
+        finally:
+            self.observe('span_duration_seconds', time.perf_counter() - started, span=name, tool=tool)
+
+    def gauges(self) -> Dict[str, Tuple[str, Dict[str, float]]]:
+        values = {}
+        for name, (label, read) in self._gauges.items():
+            try:
+                values[name] = (label, {key: float(value) for key, value in read().items()})
+            except Exception as e:
+                logger.warning("Could not read gauge %s: %s", name, e)
+        return values
+
+    def snapshot(self) -> Dict[str, object]:
+        """JSON-friendly view: latency summaries, counters and current gauge values"""
+        def label_text(labels: Labels) -> str:
+            return ','.join(f"{key}={value}" for key, value in labels) or 'all'
+
+        return {
+            'histograms': {
+                name: {label_text(labels): histogram.snapshot() for labels, histogram in sorted(series.items())}
+                for name, series in sorted(self.histograms.items())
+            },
+            'counters': {
+                name: {label_text(labels): value for labels, value in sorted(series.items())}
+                for name, series in sorted(self.counters.items())
+            },
+            'gauges': {
+                name: {f"{label}={key}": round(value, 4) for key, value in sorted(values.items())}
+                for name, (label, values) in sorted(self.gauges().items())
+            },
+        }
+
+    def prometheus_text(self) -> str:
+        lines: List[str] = []
+        for name, series in sorted(self.histograms.items()):
+            metric = PREFIX + name
+            lines.append(f"# TYPE {metric} histogram")
+            for labels, histogram in sorted(series.items()):
+                cumulative = 0
+                for bound, count in zip(histogram.buckets, histogram.counts):
+                    cumulative += count
+                    bucket_labels = _format_labels(labels, 'le="%g"' % bound)
+                    lines.append(f"{metric}_bucket{bucket_labels} {cumulative}")
+                inf_labels = _format_labels(labels, 'le="+Inf"')
+                lines.append(f"{metric}_bucket{inf_labels} {histogram.count}")
+                lines.append(f"{metric}_sum{_format_labels(labels)} {histogram.sum:.6f}")
+                lines.append(f"{metric}_count{_format_labels(labels)} {histogram.count}")
+        for name, series in sorted(self.counters.items()):
+            metric = f"{PREFIX}{name}_total"
+            lines.append(f"# TYPE {metric} counter")
+            for labels, value in sorted(series.items()):
+                lines.append(f"{metric}{_format_labels(labels)} {value:g}")
+        for name, (label, values) in sorted(self.gauges().items()):
+            metric = PREFIX + name
+            lines.append(f"# TYPE {metric} gauge")
+            for key, value in sorted(values.items()):
+                lines.append(f"{metric}{_format_labels(_labels(**{label: key}))} {value:g}")
+        return '\n'.join(lines) + '\n'
+
+
+def write_prometheus_file(registry: MetricsRegistry, path: str):
+    """Atomically replace ``path`` with the current metrics, e.g. for node_exporter's textfile collector"""
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, 'w', encoding='utf-8') as f:
+        f.write(registry.prometheus_text())
+    os.replace(tmp_path, path)
+
+
+async def export_to_file(registry: MetricsRegistry, path: str, interval: float):
+    """Rewrite the metrics file every ``interval`` seconds until cancelled"""
+    while True:
+        try:
+            await asyncio.to_thread(write_prometheus_file, registry, path)
+        except OSError as e:
+            logger.warning("Could not write metrics file %s: %s", path, e)
+        await asyncio.sleep(interval)
+
+
+async def serve_metrics(registry: MetricsRegistry, host: str, port: int) -> asyncio.AbstractServer:
+    """Answer every HTTP request on ``host:port`` with the Prometheus text
+
+    This side socket keeps scrapes off the stdio transport.
+    """
+    async def handle(reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            # Read and ignore the request line and headers
+            while (await reader.readline()).strip():
+                pass
+            body = registry.prometheus_text().encode('utf-8')
+            writer.write(b"HTTP/1.0 200 OK\r\nContent-Type: text/plain; version=0.0.4\r\n"
+                         + f"Content-Length: {len(body)}\r\n\r\n".encode('ascii') + body)
+            await writer.drain()
+        except (ConnectionError, asyncio.IncompleteReadError):
+            pass
+        finally:
+            writer.close()
+
+    return await asyncio.start_server(handle, host, port)
@@ -0,0 +1,203 @@
+"""Pre-generated mindfulness exercises for each user's usual requests
+
+Requests are reduced to a content key: exercise type, duration and a
+coarse emotion bucket. The prefetcher learns how often each user asks for
+each key (from stored ``mindfulness_sessions`` and from live requests)
+and, while the server is idle, generates a few variants of the common
+keys. Requests for a pooled key are answered from the pool, rotating
+through variants; each variant is retired after ``max_serves`` uses so
+content stays fresh.
+"""
+
+import asyncio
+import json
+import logging
+from collections import Counter, OrderedDict, deque
+from typing import Any, Awaitable, Callable, Deque, Dict, List, Optional, Set, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (exercise type, duration in minutes, emotion bucket)
+ContentKey = Tuple[str, int, str]
+
+# Emotion names grouped into the buckets content is generated for
+EMOTION_BUCKETS = {
+    'stressed': {'anger', 'anxiety', 'fear', 'distress', 'stress', 'nervousness', 'frustration',
+                 'annoyance', 'panic', 'disgust', 'overwhelm'},
+    'low': {'sadness', 'tiredness', 'disappointment', 'boredom', 'loneliness', 'guilt', 'shame',
+            'pain', 'grief', 'fatigue'},
+    'positive': {'joy', 'calmness', 'contentment', 'amusement', 'relief', 'satisfaction', 'happiness',
+                 'excitement', 'love', 'gratitude'},
+}
+
+# String values that mark an emotion as present, as in {"stress": "high"}
+_PRESENT = {'high', 'medium', 'moderate', 'severe', 'yes', 'true'}
+
+
+def emotion_bucket(current_emotions: Any) -> str:
+    """Coarse bucket (``stressed``, ``low``, ``positive`` or ``neutral``) of a request's emotions
+
+    Numeric scores bucket by the strongest emotion; string values count
+    the emotions marked as present.
+    """
+    if not isinstance(current_emotions, dict) or not current_emotions:
+        return 'neutral'
+    scores = {str(name).lower(): float(value) for name, value in current_emotions.items()
+              if isinstance(value, (int, float)) and not isinstance(value, bool)}
+    if scores:
+        names = [max(scores, key=scores.get)]
+    else:
+        names = [str(name).lower() for name, value in current_emotions.items()
+                 if str(value).lower() in _PRESENT or value is True]
+    for name in names:
+        for bucket, members in EMOTION_BUCKETS.items():
+            if name in members:
+                return bucket
+    return 'neutral'
+
+
+def content_key(exercise_type: str, duration_minutes: Any, current_emotions: Any) -> ContentKey:
+    return (str(exercise_type).strip().lower(), int(duration_minutes or 0), emotion_bucket(current_emotions))
+
+
+def session_key(row: Dict[str, Any]) -> Optional[ContentKey]:
+    """Content key of a stored ``mindfulness_sessions`` row"""
+    emotions = row.get('emotional_impact')
+    if isinstance(emotions, str):
+        try:
+            emotions = json.loads(emotions)
+        except ValueError:
+            emotions = None
+    if not row.get('exercise_type'):
+        return None
+    return content_key(row['exercise_type'], (row.get('duration_seconds') or 0) // 60, emotions)
+
+
+class MindfulnessPrefetcher:
+    """Learns common requests per user and serves pre-generated variants
+
+    ``generate(key, variant)`` produces one exercise for a key, and
+    ``load_history(user_id)`` returns the user's stored sessions; it is
+    called once per user, in the background, the first time they are seen.
+    Generation only runs while ``is_idle()`` is true.
+    """
+
+    def __init__(self, generate: Callable[[ContentKey, int], Awaitable[str]],
+                 load_history: Callable[[str], Awaitable[List[Dict[str, Any]]]],
+                 is_idle: Callable[[], bool] = lambda: True, variants: int = 3, min_uses: int = 2,
+                 top_combinations: int = 3, max_serves: int = 3, max_keys: int = 256, max_users: int = 10000):
+        self.generate = generate
+        self.load_history = load_history
+        self.is_idle = is_idle
+        self.variants = max(1, variants)
+        self.min_uses = max(1, min_uses)
+        self.top_combinations = max(1, top_combinations)
+        self.max_serves = max(1, max_serves)
+        self.max_keys = max(1, max_keys)
+        self.max_users = max(1, max_users)
+
+        # Variants per key as [text, times served], in rotation order
+        self._pool: 'OrderedDict[ContentKey, Deque[List[Any]]]' = OrderedDict()
+        self._usage: 'OrderedDict[str, Counter]' = OrderedDict()
+        self._generated: Counter = Counter()
+        self._loading: Set[asyncio.Task] = set()
+
+        self.stats = {'hits': 0, 'misses': 0, 'generated': 0, 'retired': 0, 'failures': 0}
+
+    def pooled(self, key: ContentKey) -> int:
+        return len(self._pool.get(key, ()))
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def take(self, user_id: str, key: ContentKey) -> Optional[str]:
+        """Record the request and return a pooled exercise for it, if any"""
+        self._record(user_id, key)
+        variants = self._pool.get(key)
+        if not variants:
+            self.stats['misses'] += 1
+            return None
+
+        self._pool.move_to_end(key)
+        entry = variants[0]
+        variants.rotate(-1)
+        entry[1] += 1
+        if entry[1] >= self.max_serves:
+            variants.remove(entry)
+            self.stats['retired'] += 1
+        self.stats['hits'] += 1
+        return entry[0]
+
+    def add(self, key: ContentKey, text: str):
+        """Pool an exercise for ``key`` (e.g. one just generated on demand)"""
+        variants = self._pool.get(key)
+        if variants is None:
+            variants = self._pool[key] = deque()
+            while len(self._pool) > self.max_keys:
+                self._pool.popitem(last=False)
+        if len(variants) < self.variants:
+            variants.append([text, 0])
+
+    def _record(self, user_id: str, key: ContentKey):
+        usage = self._usage.get(user_id)
+        if usage is None:
+            usage = self._usage[user_id] = Counter()
+            while len(self._usage) > self.max_users:
+                self._usage.popitem(last=False)
+            task = asyncio.get_running_loop().create_task(self._load_user(user_id, usage))
+            self._loading.add(task)
+            task.add_done_callback(self._loading.discard)
+        self._usage.move_to_end(user_id)
+        usage[key] += 1
+
+    async def _load_user(self, user_id: str, usage: Counter):
+        try:
+            rows = await self.load_history(user_id)
+        except Exception as e:
+            logger.warning("Could not load mindfulness history for %s: %s", user_id, e)
+            return
+        for row in rows:
+            key = session_key(row)
+            if key:
+                usage[key] += 1
+
+    def wanted(self) -> List[ContentKey]:
+        """Keys that are among some user's common requests, most demanded first"""
+        demand: Counter = Counter()
+        for usage in self._usage.values():
+            for key, count in usage.most_common(self.top_combinations):
+                if count >= self.min_uses:
+                    demand[key] += count
+        return [key for key, _ in demand.most_common(self.max_keys)]
+
+    async def refill(self, limit: Optional[int] = None) -> int:
+        """Generate missing variants of wanted keys while idle; returns how many were added"""
+        added = 0
+        for key in self.wanted():
+            while self.pooled(key) < self.variants:
+                if (limit is not None and added >= limit) or not self.is_idle():
+                    return added
+                variant = self._generated[key]
+                self._generated[key] += 1
+                try:
+                    text = await self.generate(key, variant)
+                except Exception as e:
+                    self.stats['failures'] += 1
+                    logger.warning("Could not pre-generate mindfulness exercise %s: %s", key, e)
+                    return added
+                self.add(key, text)
+                self.stats['generated'] += 1
+                added += 1
+        return added
+
+    async def run(self, interval: float, batch: int = 4):
+        """Top up the pool every ``interval`` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            await self.refill(batch)
+
+    async def close(self):
+        for task in list(self._loading):
+            task.cancel()
+        await asyncio.gather(*self._loading, return_exceptions=True)
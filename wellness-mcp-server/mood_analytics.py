@@ -0,0 +1,111 @@
+"""Vectorized mood-trend features for crisis analysis"""
+
+import time
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# Scores at or below this count as low mood
+LOW_MOOD_THRESHOLD = 2
+# Low-mood entries within the window that raise the risk level
+LOW_MOOD_ALERT_COUNT = 3
+
+_WEEKDAYS = ('mon', 'tue', 'wed', 'thu', 'fri', 'sat', 'sun')
+
+
+def _run_lengths(mask: np.ndarray) -> np.ndarray:
+    """Lengths of consecutive True runs in ``mask``"""
+    if not mask.any():
+        return np.zeros(0, dtype=np.int64)
+    padded = np.concatenate(([0], mask.astype(np.int8), [0]))
+    edges = np.flatnonzero(np.diff(padded))
+    return edges[1::2] - edges[::2]
+
+
+def compute_mood_features(timestamps: Sequence[int], scores: Sequence[int], now: Optional[float] = None,
+                          rolling_days: int = 3, utc_offset_seconds: Optional[int] = None,
+                          low_threshold: int = LOW_MOOD_THRESHOLD) -> Dict[str, Any]:
+    """Summarize a user's mood history into a small feature dict
+
+    ``timestamps`` are epoch seconds in ascending order and ``scores`` the
+    matching 1-10 mood scores (for example the arrays kept by
+    ``MoodHistoryStore``). Days and weekdays are bucketed in local time
+    unless ``utc_offset_seconds`` is given.
+    """
+    ts = np.asarray(timestamps, dtype=np.int64)
+    values = np.asarray(scores, dtype=np.float64)
+    if ts.size == 0:
+        return {'entry_count': 0}
+
+    now = time.time() if now is None else now
+    if utc_offset_seconds is None:
+        utc_offset_seconds = time.localtime(now).tm_gmtoff
+
+    # Day index of each entry (0 = first day with data), in local time
+    day = (ts + utc_offset_seconds) // 86400
+    day_index = day - day[0]
+    span_days = int(day_index[-1]) + 1
+
+    # Daily means over the full span (days without entries are NaN)
+    daily_sum = np.bincount(day_index, weights=values, minlength=span_days)
+    daily_count = np.bincount(day_index, minlength=span_days)
+    with np.errstate(invalid='ignore', divide='ignore'):
+        daily_mean = daily_sum / daily_count
+
+    # Rolling mean of entries over the trailing ``rolling_days`` window
+    window = max(1, rolling_days)
+    cumulative_sum = np.concatenate(([0.0], np.cumsum(daily_sum)))
+    cumulative_count = np.concatenate(([0], np.cumsum(daily_count)))
+    lo = np.maximum(np.arange(span_days) - window + 1, 0)
+    hi = np.arange(span_days) + 1
+    window_count = cumulative_count[hi] - cumulative_count[lo]
+    with np.errstate(invalid='ignore', divide='ignore'):
+        rolling_mean = (cumulative_sum[hi] - cumulative_sum[lo]) / window_count
+
+    # Least-squares trend in score points per day
+    elapsed_days = (ts - ts[0]) / 86400.0
+    if ts.size >= 2 and np.ptp(elapsed_days) > 0:
+        slope = float(np.polyfit(elapsed_days, values, 1)[0])
+    else:
+        slope = 0.0
+
+    low = values <= low_threshold
+    streaks = _run_lengths(low)
+    current_streak = int(streaks[-1]) if low[-1] else 0
+
+    weekday = (day + 3) % 7  # 1970-01-01 was a Thursday
+    weekday_sum = np.bincount(weekday, weights=values, minlength=7)
+    weekday_count = np.bincount(weekday, minlength=7)
+
+    recent = rolling_mean[-7:]
+    return {
+        'entry_count': int(ts.size),
+        'days_covered': span_days,
+        'hours_since_last_entry': round((now - ts[-1]) / 3600.0, 1),
+        'mean': round(float(values.mean()), 2),
+        'min': int(values.min()),
+        'max': int(values.max()),
+        'latest': int(values[-1]),
+        f'rolling_mean_{window}d': [None if np.isnan(v) else round(float(v), 2) for v in recent],
+        'days_with_entries': int(np.count_nonzero(daily_count)),
+        'lowest_daily_mean': round(float(np.nanmin(daily_mean)), 2),
+        'trend_per_day': round(slope, 3),
+        'volatility': round(float(values.std()), 2),
+        'mean_abs_change': round(float(np.abs(np.diff(values)).mean()), 2) if ts.size >= 2 else 0.0,
+        'low_mood_count': int(low.sum()),
+        'longest_low_streak': int(streaks.max()) if streaks.size else 0,
+        'current_low_streak': current_streak,
+        'weekday_means': {
+            name: round(float(weekday_sum[i] / weekday_count[i]), 2)
+            for i, name in enumerate(_WEEKDAYS) if weekday_count[i]
+        },
+    }
+
+
+def assess_mood_risk(features: Dict[str, Any], high_risk_entries: int = 0) -> str:
+    """Risk level from mood features and the number of entries flagged high risk"""
+    if high_risk_entries:
+        return "HIGH"
+    if features.get('low_mood_count', 0) >= LOW_MOOD_ALERT_COUNT:
+        return "MEDIUM"
+    return "LOW"
@@ -0,0 +1,191 @@
+"""Compact, time-indexed in-memory mood history"""
+
+import time
+from array import array
+from bisect import bisect_left, bisect_right
+from collections import OrderedDict
+from datetime import datetime, timezone
+from typing import Dict, List, NamedTuple, Optional, Tuple, Union
+
+
+class MoodRecord(NamedTuple):
+    """A single mood entry as returned by history queries
+
+    ``timestamp`` is epoch seconds; ``to_dict`` renders it as naive UTC,
+    the convention used for every stored timestamp.
+    """
+    timestamp: int
+    mood_score: int
+    text_description: str
+    high_risk: bool = False
+
+    def to_dict(self, user_id: str) -> Dict[str, Union[str, int, bool]]:
+        return {
+            'user_id': user_id,
+            'timestamp': datetime.fromtimestamp(self.timestamp, timezone.utc).replace(tzinfo=None).isoformat(),
+            'mood_score': self.mood_score,
+            'text_description': self.text_description,
+            'high_risk': self.high_risk
+        }
+
+
+class _UserHistory:
+    """Parallel arrays sorted by timestamp for one user"""
+
+    __slots__ = ('timestamps', 'scores', 'flags', 'texts')
+
+    def __init__(self):
+        self.timestamps = array('q')  # epoch seconds
+        self.scores = array('b')      # mood scores 1-10
+        self.flags = array('b')       # 1 if the text was flagged as high risk at ingest
+        self.texts: List[str] = []
+
+    def __len__(self) -> int:
+        return len(self.timestamps)
+
+    def append(self, timestamp: int, score: int, text: str, flag: int = 0):
+        if not self.timestamps or timestamp >= self.timestamps[-1]:
+            index = len(self.timestamps)
+        else:
+            # Late arrivals (e.g. synced offline entries) keep the arrays sorted
+            index = bisect_right(self.timestamps, timestamp)
+        self.timestamps.insert(index, timestamp)
+        self.scores.insert(index, score)
+        self.flags.insert(index, flag)
+        self.texts.insert(index, text)
+
+    def drop_before(self, cutoff: int):
+        index = bisect_left(self.timestamps, cutoff)
+        if index:
+            del self.timestamps[:index]
+            del self.scores[:index]
+            del self.flags[:index]
+            del self.texts[:index]
+
+    def drop_oldest(self, count: int):
+        del self.timestamps[:count]
+        del self.scores[:count]
+        del self.flags[:count]
+        del self.texts[:count]
+
+
+class MoodHistoryStore:
+    """Per-user, append-only mood history sorted by timestamp
+
+    Each user keeps epoch-second and mood-score arrays, so range queries are a
+    bisect rather than a scan over every cached entry. Memory stays bounded by
+    ``retention_days`` (entries older than this are dropped), ``max_entries_per_user``
+    (oldest entries dropped first) and ``max_users`` (least recently written
+    users evicted first).
+    """
+
+    def __init__(self, retention_days: Optional[int] = 90, max_entries_per_user: int = 5000,
+                 max_users: int = 100000):
+        self.retention_days = retention_days
+        self.max_entries_per_user = max(1, max_entries_per_user)
+        self.max_users = max(1, max_users)
+        self._users: "OrderedDict[str, _UserHistory]" = OrderedDict()
+
+    def __len__(self) -> int:
+        return len(self._users)
+
+    def __contains__(self, user_id: str) -> bool:
+        return user_id in self._users
+
+    def entry_count(self, user_id: Optional[str] = None) -> int:
+        """Number of stored entries for one user or across all users"""
+        if user_id is not None:
+            history = self._users.get(user_id)
+            return len(history) if history else 0
+        return sum(len(history) for history in self._users.values())
+
+    def append(self, user_id: str, mood_score: int, text_description: str = '',
+               timestamp: Union[str, datetime, float, None] = None, high_risk: bool = False):
+        """Record a mood entry for ``user_id``
+
+        ``high_risk`` marks entries whose text was flagged at ingest so later
+        risk checks can count them without rescanning the text.
+        """
+        epoch = _to_epoch(timestamp)
+        score = max(-128, min(127, int(mood_score)))
+
+        history = self._users.get(user_id)
+        if history is None:
+            history = self._users[user_id] = _UserHistory()
+            while len(self._users) > self.max_users:
+                self._users.popitem(last=False)
+        else:
+            self._users.move_to_end(user_id)
+
+        history.append(epoch, score, text_description or '', 1 if high_risk else 0)
+
+        if self.retention_days is not None:
+            history.drop_before(int(time.time()) - self.retention_days * 86400)
+        overflow = len(history) - self.max_entries_per_user
+        if overflow > 0:
+            history.drop_oldest(overflow)
+        if not history:
+            del self._users[user_id]
+
+    def entries_since(self, user_id: str, days: float, now: Optional[float] = None) -> List[MoodRecord]:
+        """Entries for ``user_id`` from the last ``days`` days, oldest first"""
+        now = time.time() if now is None else now
+        return self.entries_between(user_id, now - days * 86400, now)
+
+    def entries_between(self, user_id: str, start: float, end: float) -> List[MoodRecord]:
+        """Entries with ``start <= timestamp <= end``, oldest first"""
+        history = self._users.get(user_id)
+        if history is None:
+            return []
+        lo = bisect_left(history.timestamps, int(start))
+        hi = bisect_right(history.timestamps, int(end))
+        return [
+            MoodRecord(history.timestamps[i], history.scores[i], history.texts[i], bool(history.flags[i]))
+            for i in range(lo, hi)
+        ]
+
+    def window(self, user_id: str, start: float, end: float) -> Tuple[array, array]:
+        """Timestamp and score arrays with ``start <= timestamp <= end``
+
+        The slices are copies of the underlying typed arrays, so they can be
+        handed straight to ``numpy.frombuffer`` without building records.
+        """
+        history = self._users.get(user_id)
+        if history is None:
+            return array('q'), array('b')
+        lo = bisect_left(history.timestamps, int(start))
+        hi = bisect_right(history.timestamps, int(end))
+        return history.timestamps[lo:hi], history.scores[lo:hi]
+
+    def flagged_count(self, user_id: str, start: float, end: float) -> int:
+        """Number of high-risk entries with ``start <= timestamp <= end``"""
+        history = self._users.get(user_id)
+        if history is None:
+            return 0
+        lo = bisect_left(history.timestamps, int(start))
+        hi = bisect_right(history.timestamps, int(end))
+        return sum(history.flags[lo:hi])
+
+    def latest(self, user_id: str) -> Optional[MoodRecord]:
+        """Most recent entry for ``user_id``"""
+        history = self._users.get(user_id)
+        if not history:
+            return None
+        return MoodRecord(history.timestamps[-1], history.scores[-1], history.texts[-1], bool(history.flags[-1]))
+
+    def evict(self, user_id: str):
+        """Drop all history for ``user_id``"""
+        self._users.pop(user_id, None)
+
+
+def _to_epoch(timestamp: Union[str, datetime, float, None]) -> int:
+    """Epoch seconds; naive datetimes and ISO strings are read as UTC"""
+    if timestamp is None:
+        return int(time.time())
+    if isinstance(timestamp, str):
+        timestamp = datetime.fromisoformat(timestamp)
+    if isinstance(timestamp, datetime):
+        if timestamp.tzinfo is None:
+            timestamp = timestamp.replace(tzinfo=timezone.utc)
+        return int(timestamp.timestamp())
+    return int(timestamp)
@@ -0,0 +1,164 @@
+"""Heart-rate and HRV extraction from raw PPG samples"""
+
+from typing import Any, Dict, Optional, Sequence
+
+import numpy as np
+
+# Pass band covering 30-240 bpm
+LOW_CUTOFF_HZ = 0.5
+HIGH_CUTOFF_HZ = 4.0
+# Shortest plausible beat-to-beat gap (about 220 bpm)
+MIN_BEAT_GAP_SECONDS = 60 / 220
+# Peak detector windows: about one systolic wave and one beat wide
+PEAK_WINDOW_SECONDS = 0.111
+BEAT_WINDOW_SECONDS = 0.667
+# Block threshold offset, as a fraction of the mean signal energy
+BLOCK_OFFSET = 0.02
+# Beat intervals outside this range, or this far from the median, are artifacts
+MIN_RR_MS = 300
+MAX_RR_MS = 2000
+MAX_RR_DEVIATION = 0.3
+# Valid beat intervals, and their share of all intervals, needed before
+# heart rate and HRV are reported
+MIN_INTERVALS = 4
+MIN_SIGNAL_QUALITY = 0.6
+# RMSSD of a relaxed and a strongly stressed adult, in milliseconds
+RMSSD_RELAXED_MS = 60.0
+RMSSD_STRESSED_MS = 15.0
+# Resting heart rate and the elevation above it that counts as fully stressed
+RESTING_HEART_RATE = 70.0
+HEART_RATE_SPAN = 50.0
+
+
+class PPGSignalError(ValueError):
+    """The PPG payload is malformed or too short to analyze"""
+
+
+def bandpass(samples: np.ndarray, sampling_rate: float,
+             low_hz: float = LOW_CUTOFF_HZ, high_hz: float = HIGH_CUTOFF_HZ) -> np.ndarray:
+    """Zero-phase band-pass filter done in the frequency domain"""
+    spectrum = np.fft.rfft(samples - samples.mean())
+    frequencies = np.fft.rfftfreq(samples.size, d=1.0 / sampling_rate)
+    spectrum[(frequencies < low_hz) | (frequencies > high_hz)] = 0
+    return np.fft.irfft(spectrum, n=samples.size)
+
+
+def _moving_average(values: np.ndarray, width: int) -> np.ndarray:
+    """Centered moving average with a shrinking window at the edges"""
+    cumulative = np.concatenate(([0.0], np.cumsum(values)))
+    index = np.arange(values.size)
+    lo = np.maximum(index - width // 2, 0)
+    hi = np.minimum(index + width - width // 2, values.size)
+    return (cumulative[hi] - cumulative[lo]) / (hi - lo)
+
+
+def detect_peaks(signal: np.ndarray, sampling_rate: float,
+                 min_gap_seconds: float = MIN_BEAT_GAP_SECONDS) -> np.ndarray:
+    """Sample indices of systolic peaks in a band-passed signal
+
+    Two moving averages of the squared positive signal, one about a
+    systolic wave wide and one about a beat wide, mark the blocks that
+    hold a systolic wave; the tallest sample of each block is its peak.
+    Of any two peaks closer than ``min_gap_seconds`` the taller is kept.
+    """
+    energy = np.maximum(signal, 0.0) ** 2
+    peak_width = max(1, int(PEAK_WINDOW_SECONDS * sampling_rate))
+    beat_width = max(1, int(BEAT_WINDOW_SECONDS * sampling_rate))
+    threshold = _moving_average(energy, beat_width) + BLOCK_OFFSET * energy.mean()
+    in_block = _moving_average(energy, peak_width) > threshold
+
+    edges = np.flatnonzero(np.diff(np.concatenate(([0], in_block.astype(np.int8), [0]))))
+    starts, ends = edges[::2], edges[1::2]
+    wide = (ends - starts) >= peak_width
+    min_gap = max(1, int(min_gap_seconds * sampling_rate))
+
+    kept = []
+    for start, end in zip(starts[wide].tolist(), ends[wide].tolist()):
+        index = start + int(np.argmax(signal[start:end]))
+        if kept and index - kept[-1] < min_gap:
+            if signal[index] > signal[kept[-1]]:
+                kept[-1] = index
+        else:
+            kept.append(index)
+    return np.asarray(kept, dtype=np.int64)
+
+
+def analyze_ppg(samples: Sequence[float], sampling_rate: float) -> Dict[str, Any]:
+    """Heart rate, RMSSD and SDNN of a raw PPG recording
+
+    ``samples`` are evenly spaced readings at ``sampling_rate`` Hz. Beat
+    intervals that are implausible or deviate strongly from the median are
+    dropped, and ``signal_quality`` is the fraction that was kept; heart
+    rate and HRV are None when too few intervals survive.
+    """
+    try:
+        values = np.asarray(samples, dtype=np.float64)
+        sampling_rate = float(sampling_rate)
+    except (TypeError, ValueError) as e:
+        raise PPGSignalError(f"PPG samples must be numbers: {e}") from None
+    if values.ndim != 1:
+        raise PPGSignalError("PPG samples must be a flat list")
+    if not np.isfinite(sampling_rate) or sampling_rate < 2 * HIGH_CUTOFF_HZ:
+        raise PPGSignalError(f"Sampling rate must be at least {2 * HIGH_CUTOFF_HZ:g} Hz")
+    if not np.isfinite(values).all():
+        raise PPGSignalError("PPG samples contain NaN or infinite values")
+
+    duration = values.size / sampling_rate
+    if duration < (MIN_INTERVALS + 1) * MAX_RR_MS / 1000:
+        raise PPGSignalError(f"PPG recording too short: {duration:.1f}s")
+
+    peaks = detect_peaks(bandpass(values, sampling_rate), sampling_rate)
+    rr = np.diff(peaks) * (1000.0 / sampling_rate)
+    valid = (rr >= MIN_RR_MS) & (rr <= MAX_RR_MS)
+    if valid.any():
+        median = np.median(rr[valid])
+        valid &= np.abs(rr - median) <= MAX_RR_DEVIATION * median
+
+    features: Dict[str, Any] = {
+        'duration_seconds': round(duration, 1),
+        'beat_count': int(peaks.size),
+        'signal_quality': round(float(valid.mean()), 3) if rr.size else 0.0,
+    }
+    if valid.sum() < MIN_INTERVALS or features['signal_quality'] < MIN_SIGNAL_QUALITY:
+        return {**features, 'heart_rate_bpm': None, 'rmssd_ms': None, 'sdnn_ms': None}
+
+    intervals = rr[valid]
+    # Successive differences only between two adjacent clean intervals
+    successive = np.diff(rr)[valid[1:] & valid[:-1]]
+    rmssd = float(np.sqrt(np.mean(successive ** 2))) if successive.size else 0.0
+    return {
+        **features,
+        'heart_rate_bpm': round(60000.0 / float(intervals.mean()), 1),
+        'rmssd_ms': round(rmssd, 1),
+        'sdnn_ms': round(float(intervals.std(ddof=1)), 1),
+    }
+
+
+def hrv_stress_score(features: Dict[str, Any]) -> Optional[float]:
+    """Physiological stress on the 0-1 scale of facial stress scores
+
+    Low RMSSD dominates the score; an elevated heart rate adds to it.
+    Returns None when the recording yielded no usable beats.
+    """
+    rmssd = features.get('rmssd_ms')
+    heart_rate = features.get('heart_rate_bpm')
+    if rmssd is None or heart_rate is None:
+        return None
+    hrv_part = (RMSSD_RELAXED_MS - rmssd) / (RMSSD_RELAXED_MS - RMSSD_STRESSED_MS)
+    rate_part = (heart_rate - RESTING_HEART_RATE) / HEART_RATE_SPAN
+    return round(0.7 * min(max(hrv_part, 0.0), 1.0) + 0.3 * min(max(rate_part, 0.0), 1.0), 4)
+
+
+def analyze_ppg_payload(ppg_data: Any) -> Optional[Dict[str, Any]]:
+    """Features of a tool's ``ppg_data`` object, or None if it has no samples
+
+    The object carries ``samples`` and ``sampling_rate`` (Hz); payloads
+    without samples, such as a bare ``{"bpm": 80}``, are left alone.
+    """
+    if not isinstance(ppg_data, dict) or not ppg_data.get('samples'):
+        return None
+    if 'sampling_rate' not in ppg_data:
+        raise PPGSignalError("ppg_data.sampling_rate is required with samples")
+    features = analyze_ppg(ppg_data['samples'], ppg_data['sampling_rate'])
+    features['stress_score'] = hrv_stress_score(features)
+    return features
@@ -0,0 +1,177 @@
+"""Opt-in cProfile and tracemalloc capture of individual tool calls
+
+Profiling is armed for a number of upcoming calls (``profile_next``); each
+profiled call writes a ``.prof`` file (load it with ``pstats`` or snakeviz)
+and a text summary to the report directory. While nothing is armed the
+server only checks an integer per call.
+
+The profiler is switched on only while the profiled call's own coroutines
+run: its task and any tasks it starts (``gather`` fan-out), but not other
+calls interleaved on the event loop. Work handed to worker threads or
+processes shows up as time spent waiting for them.
+"""
+
+import asyncio
+import cProfile
+import io
+import itertools
+import logging
+import os
+import pstats
+import time
+import tracemalloc
+from contextvars import ContextVar
+from datetime import datetime
+from typing import Any, Coroutine, Iterable, List, Optional, TypeVar
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+# Entries printed in the text summary for the profile and for allocations
+TOP_FUNCTIONS = 40
+TOP_ALLOCATIONS = 25
+
+# Profiler of the call running in the current task, inherited by the tasks it starts
+_active_profile: ContextVar[Optional[cProfile.Profile]] = ContextVar('wellness_active_profile', default=None)
+
+
+class _Stepper:
+    """Drives a coroutine, enabling ``profile`` only while it executes"""
+
+    def __init__(self, coro: Coroutine, profile: cProfile.Profile):
+        self._coro = coro
+        self._profile = profile
+
+    def __await__(self):
+        send, error = None, None
+        while True:
+            self._profile.enable()
+            try:
+                if error is not None:
+                    yielded = self._coro.throw(error)
+                else:
+                    yielded = self._coro.send(send)
+            except StopIteration as stop:
+                return stop.value
+            finally:
+                self._profile.disable()
+            try:
+                send, error = (yield yielded), None
+            except BaseException as e:
+                send, error = None, e
+
+
+async def _stepped(coro: Coroutine, profile: cProfile.Profile):
+    return await _Stepper(coro, profile)
+
+
+class CallProfiler:
+    """Profiles the next ``remaining`` tool calls (``-1`` profiles every call)"""
+
+    def __init__(self, report_dir: str, remaining: int = 0, tools: Optional[Iterable[str]] = None,
+                 tracemalloc_frames: int = 0):
+        self.report_dir = report_dir
+        self.remaining = remaining
+        self.tools = set(tools) if tools else None
+        self.tracemalloc_frames = tracemalloc_frames
+        self.reports: List[str] = []
+        self._sequence = itertools.count(1)
+        self._active = 0
+        self._previous_factory: Any = None
+        self._started_tracemalloc = False
+
+    def profile_next(self, count: int, tools: Optional[Iterable[str]] = None,
+                     tracemalloc_frames: Optional[int] = None):
+        """Arm profiling for ``count`` calls (``0`` disarms, ``-1`` profiles every call)"""
+        self.remaining = count
+        self.tools = set(tools) if tools else None
+        if tracemalloc_frames is not None:
+            self.tracemalloc_frames = tracemalloc_frames
+
+    def claim(self, tool_name: str) -> bool:
+        """Whether to profile this call; consumes one of the remaining calls"""
+        if not self.remaining or (self.tools is not None and tool_name not in self.tools):
+            return False
+        if self.remaining > 0:
+            self.remaining -= 1
+        return True
+
+    async def run(self, tool_name: str, coro: Coroutine[Any, Any, T]) -> T:
+        """Await ``coro`` under a fresh profiler and write its report"""
+        profile = cProfile.Profile()
+        loop = asyncio.get_running_loop()
+        self._begin(loop)
+        _active_profile.set(profile)
+        before = tracemalloc.take_snapshot() if self.tracemalloc_frames else None
+        started = time.perf_counter()
+        status = 'error'
+        try:
+            result = await _Stepper(coro, profile)
+            status = 'ok'
+            return result
+        except asyncio.CancelledError:
+            status = 'cancelled'
+            raise
+        finally:
+            elapsed = time.perf_counter() - started
+            after = tracemalloc.take_snapshot() if before is not None else None
+            self._end(loop)
+            name = f"{datetime.now():%Y%m%d-%H%M%S}-{next(self._sequence):04d}-{tool_name}"
+            try:
+                path = await asyncio.shield(asyncio.to_thread(
+                    self._write_report, name, tool_name, status, elapsed, profile, before, after))
+                self.reports.append(path)
+                logger.info("Profile of %s written to %s", tool_name, path)
+            except OSError as e:
+                logger.warning("Could not write profile of %s: %s", tool_name, e)
+
+    def _begin(self, loop: asyncio.AbstractEventLoop):
+        self._active += 1
+        if self._active > 1:
+            return
+        # Tasks started by a profiled call are profiled too; the factory
+        # is only installed while a profiled call is running
+        self._previous_factory = loop.get_task_factory()
+        loop.set_task_factory(self._task_factory)
+        if self.tracemalloc_frames and not tracemalloc.is_tracing():
+            tracemalloc.start(self.tracemalloc_frames)
+            self._started_tracemalloc = True
+
+    def _end(self, loop: asyncio.AbstractEventLoop):
+        self._active -= 1
+        if self._active:
+            return
+        loop.set_task_factory(self._previous_factory)
+        self._previous_factory = None
+        if self._started_tracemalloc:
+            tracemalloc.stop()
+            self._started_tracemalloc = False
+
+    def _task_factory(self, loop: asyncio.AbstractEventLoop, coro: Coroutine, **kwargs: Any) -> asyncio.Future:
+        context = kwargs.get('context')
+        profile = (context.get(_active_profile) if context is not None else _active_profile.get())
+        if profile is not None:
+            coro = _stepped(coro, profile)
+        if self._previous_factory is not None:
+            return self._previous_factory(loop, coro, **kwargs)
+        return asyncio.Task(coro, loop=loop, **kwargs)
+
+    def _write_report(self, name: str, tool_name: str, status: str, elapsed: float, profile: cProfile.Profile,
+                      before: Optional[tracemalloc.Snapshot], after: Optional[tracemalloc.Snapshot]) -> str:
+        os.makedirs(self.report_dir, exist_ok=True)
+        base = os.path.join(self.report_dir, name)
+        profile.dump_stats(f"{base}.prof")
+
+        out = io.StringIO()
+        out.write(f"Tool: {tool_name}\nStatus: {status}\nWall time: {elapsed * 1000:.1f} ms\n\n")
+        stats = pstats.Stats(profile, stream=out)
+        out.write(f"Time in the call's own steps: {stats.total_tt * 1000:.1f} ms\n")
+        stats.sort_stats('cumulative').print_stats(TOP_FUNCTIONS)
+        if before is not None and after is not None:
+            out.write("Allocations during the call (all tasks, by line):\n")
+            for stat in after.compare_to(before, 'lineno')[:TOP_ALLOCATIONS]:
+                out.write(f"{stat}\n")
+        with open(f"{base}.txt", 'w', encoding='utf-8') as f:
+            f.write(out.getvalue())
+        return f"{base}.txt"
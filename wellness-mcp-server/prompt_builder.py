@@ -0,0 +1,89 @@
+"""Compact Gemini prompts that stay within a per-tool token budget
+
+Tokens are estimated locally (about four UTF-8 bytes per token), so no
+tokenizer round trip is needed. Prompts are filled from a template whose
+fields are shrunk, longest first, until the estimate fits the budget.
+"""
+
+import json
+from typing import Any, Dict, Optional
+
+# Estimated prompt tokens allowed per tool; fields are truncated beyond this
+DEFAULT_TOKEN_BUDGETS = {
+    'mood_check_in': 400,
+    'mood_check_in_bulk': 400,
+    'stress_monitoring': 400,
+    'set_wellness_goal': 400,
+    'provide_mindfulness': 400,
+    'crisis_support_check': 600,
+}
+
+# Emotion scores sent to Gemini; the rest carry little signal
+MAX_PROMPT_EMOTIONS = 8
+
+ELLIPSIS = '…'
+
+
+def estimate_tokens(text: str) -> int:
+    """Rough token count: one per four UTF-8 bytes, rounded up"""
+    return (len(text.encode('utf-8')) + 3) // 4
+
+
+def _rounded(value: Any, precision: int) -> Any:
+    if isinstance(value, float):
+        return round(value, precision)
+    if isinstance(value, dict):
+        return {key: _rounded(item, precision) for key, item in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_rounded(item, precision) for item in value]
+    return value
+
+
+def compact_json(value: Any, precision: int = 2) -> str:
+    """Whitespace-free JSON with floats rounded to ``precision`` digits"""
+    return json.dumps(_rounded(value, precision), separators=(',', ':'), sort_keys=True, default=str)
+
+
+def top_scores(scores: Dict[str, float], limit: int = MAX_PROMPT_EMOTIONS) -> Dict[str, float]:
+    """The ``limit`` highest scores, strongest first"""
+    ranked = sorted(scores.items(), key=lambda item: item[1], reverse=True)
+    return dict(ranked[:limit])
+
+
+def truncate_to_tokens(text: str, max_tokens: int) -> str:
+    """Cut ``text`` to about ``max_tokens``, at a word boundary where possible"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(0, max_tokens * 4 - len(ELLIPSIS.encode('utf-8')))
+    cut = text.encode('utf-8')[:limit].decode('utf-8', errors='ignore')
+    space = cut.rfind(' ')
+    if space > len(cut) // 2:
+        cut = cut[:space]
+    return cut.rstrip() + ELLIPSIS
+
+
+def fit_prompt(template: str, budget: Optional[int], **fields: Any) -> str:
+    """Fill ``template`` with ``fields``, shrinking the longest ones to fit ``budget``
+
+    Fields under their fair share of the remaining budget are kept whole and
+    the rest are truncated to an equal share, so short values (scores,
+    levels) survive while long free text is cut. ``None`` means no budget.
+    """
+    values = {name: str(value) for name, value in fields.items()}
+    if not budget:
+        return template.format(**values)
+
+    available = budget - estimate_tokens(template.format(**{name: '' for name in values}))
+    remaining = sorted(values, key=lambda name: estimate_tokens(values[name]))
+    while remaining:
+        share = max(0, available) // len(remaining)
+        name = remaining[0]
+        cost = estimate_tokens(values[name])
+        if cost > share:
+            # This and every longer field exceed an equal share
+            for name in remaining:
+                values[name] = truncate_to_tokens(values[name], share)
+            break
+        available -= cost
+        remaining.pop(0)
+    return template.format(**values)
@@ -0,0 +1,223 @@
+"""Content-addressed cache for Gemini responses"""
+
+import asyncio
+import hashlib
+import json
+import logging
+import os
+import re
+import threading
+import time
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+_WHITESPACE = re.compile(r'\s+')
+
+
+class ResponseCache:
+    """LRU cache of generated text keyed on model name and normalized prompt
+
+    Entries expire after a per-tool TTL (``tool_ttls``, falling back to
+    ``default_ttl``); a TTL of 0 disables caching for that tool. When
+    ``persist_dir`` is set, entries are also written there as JSON files so
+    they survive restarts, and memory misses fall back to disk. Expired
+    files are deleted when read, and the oldest files are pruned once the
+    directory holds more than ``max_disk_entries``. ``get_async`` and
+    ``put_async`` do their disk I/O in a worker thread.
+    """
+
+    def __init__(self, max_entries: int = 1024, default_ttl: float = 3600,
+                 tool_ttls: Optional[Dict[str, float]] = None, persist_dir: Optional[str] = None,
+                 max_disk_entries: int = 10000):
+        self.max_entries = max(1, max_entries)
+        self.default_ttl = default_ttl
+        self.tool_ttls = dict(tool_ttls or {})
+        self.persist_dir = persist_dir
+        self.max_disk_entries = max(1, max_disk_entries)
+        self._entries: "OrderedDict[str, Tuple[float, str]]" = OrderedDict()
+        # Files in persist_dir, counted on the first write; guarded by _disk_lock
+        self._disk_count: Optional[int] = None
+        self._disk_lock = threading.Lock()
+
+        self.stats = {'hits': 0, 'misses': 0, 'disk_hits': 0, 'evictions': 0, 'disk_evictions': 0}
+
+        if persist_dir:
+            os.makedirs(persist_dir, exist_ok=True)
+
+    def __len__(self) -> int:
+        return len(self._entries)
+
+    @staticmethod
+    def normalize_prompt(prompt: str) -> str:
+        """Collapse whitespace so formatting-only differences share an entry"""
+        return _WHITESPACE.sub(' ', prompt).strip()
+
+    @classmethod
+    def make_key(cls, model_name: str, prompt: str) -> str:
+        payload = f"{model_name}\0{cls.normalize_prompt(prompt)}".encode('utf-8')
+        return hashlib.sha256(payload).hexdigest()
+
+    def ttl_for(self, tool_name: str) -> float:
+        return self.tool_ttls.get(tool_name, self.default_ttl)
+
+    def get(self, tool_name: str, model_name: str, prompt: str) -> Optional[str]:
+        """Return cached text, or None on a miss or expired entry"""
+        if self.ttl_for(tool_name) <= 0:
+            return None
+
+        key = self.make_key(model_name, prompt)
+        text = self._get_memory(key)
+        if text is None and self.persist_dir:
+            text = self._adopt(key, self._load_disk(key))
+        return self._counted(text)
+
+    async def get_async(self, tool_name: str, model_name: str, prompt: str) -> Optional[str]:
+        """``get`` that reads the disk tier off the event loop"""
+        if self.ttl_for(tool_name) <= 0:
+            return None
+
+        key = self.make_key(model_name, prompt)
+        text = self._get_memory(key)
+        if text is None and self.persist_dir:
+            text = self._adopt(key, await asyncio.to_thread(self._load_disk, key))
+        return self._counted(text)
+
+    def put(self, tool_name: str, model_name: str, prompt: str, text: str):
+        """Cache ``text`` for the tool's TTL"""
+        stored = self._put_memory(tool_name, model_name, prompt, text)
+        if stored and self.persist_dir:
+            self._write_disk(*stored)
+
+    async def put_async(self, tool_name: str, model_name: str, prompt: str, text: str):
+        """``put`` that writes the disk tier off the event loop"""
+        stored = self._put_memory(tool_name, model_name, prompt, text)
+        if stored and self.persist_dir:
+            await asyncio.to_thread(self._write_disk, *stored)
+
+    def _get_memory(self, key: str) -> Optional[str]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, text = entry
+        if expires_at > time.time():
+            self._entries.move_to_end(key)
+            return text
+        del self._entries[key]
+        return None
+
+    def _adopt(self, key: str, entry: Optional[Tuple[float, str]]) -> Optional[str]:
+        """Promote a disk entry into memory"""
+        if entry is None:
+            return None
+        self._store(key, entry)
+        self.stats['disk_hits'] += 1
+        return entry[1]
+
+    def _counted(self, text: Optional[str]) -> Optional[str]:
+        self.stats['hits' if text is not None else 'misses'] += 1
+        return text
+
+    def _put_memory(self, tool_name: str, model_name: str, prompt: str,
+                    text: str) -> Optional[Tuple[str, Tuple[float, str]]]:
+        ttl = self.ttl_for(tool_name)
+        if ttl <= 0 or not text:
+            return None
+
+        key = self.make_key(model_name, prompt)
+        entry = (time.time() + ttl, text)
+        self._store(key, entry)
+        return key, entry
+
+    def clear(self):
+        """Drop all in-memory entries"""
+        self._entries.clear()
+
+    def hit_rate(self) -> float:
+        lookups = self.stats['hits'] + self.stats['misses']
+        return self.stats['hits'] / lookups if lookups else 0.0
+
+    def _store(self, key: str, entry: Tuple[float, str]):
+        self._entries[key] = entry
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.stats['evictions'] += 1
+
+    def _disk_path(self, key: str) -> str:
+        return os.path.join(self.persist_dir, f"{key}.json")
+
+    def _load_disk(self, key: str) -> Optional[Tuple[float, str]]:
+        """Unexpired disk entry for ``key``; expired or unreadable files are deleted"""
+        path = self._disk_path(key)
+        try:
+            with open(path, 'r', encoding='utf-8') as f:
+                data = json.load(f)
+            entry = float(data['expires_at']), data['text']
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError):
+            entry = None
+        if entry is not None and entry[0] > time.time():
+            return entry
+        self._remove_disk([path])
+        return None
+
+    def _write_disk(self, key: str, entry: Tuple[float, str]):
+        path = self._disk_path(key)
+        tmp_path = f"{path}.tmp"
+        try:
+            existed = os.path.exists(path)
+            with open(tmp_path, 'w', encoding='utf-8') as f:
+                json.dump({'expires_at': entry[0], 'text': entry[1]}, f)
+            os.replace(tmp_path, path)
+        except OSError as e:
+            logger.warning("Could not persist cached response: %s", e)
+            return
+
+        with self._disk_lock:
+            if self._disk_count is None:
+                self._disk_count = len(self._disk_files())
+            elif not existed:
+                self._disk_count += 1
+            over_limit = self._disk_count > self.max_disk_entries
+        if over_limit:
+            self.prune_disk()
+
+    def _disk_files(self) -> List[str]:
+        try:
+            names = os.listdir(self.persist_dir)
+        except OSError:
+            return []
+        return [os.path.join(self.persist_dir, name) for name in names if name.endswith('.json')]
+
+    def _remove_disk(self, paths: List[str]):
+        removed = 0
+        for path in paths:
+            try:
+                os.remove(path)
+                removed += 1
+            except OSError:
+                pass
+        with self._disk_lock:
+            if self._disk_count is not None:
+                self._disk_count = max(0, self._disk_count - removed)
+            self.stats['disk_evictions'] += removed
+
+    def prune_disk(self):
+        """Delete the least recently written files down to 90% of ``max_disk_entries``"""
+        if not self.persist_dir:
+            return
+        with self._disk_lock:
+            files = []
+            for path in self._disk_files():
+                try:
+                    files.append((os.path.getmtime(path), path))
+                except OSError:
+                    pass
+            self._disk_count = len(files)
+            excess = len(files) - int(self.max_disk_entries * 0.9)
+        if excess > 0:
+            files.sort()
+            self._remove_disk([path for _, path in files[:excess]])
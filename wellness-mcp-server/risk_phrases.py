@@ -0,0 +1,37 @@
+"""Single-pass matching of high-risk phrases in mood descriptions"""
+
+import re
+from typing import Iterable, List
+
+# Phrases in a mood description that always warrant a HIGH risk level
+HIGH_RISK_PHRASES = ('suicide', 'hurt myself', 'end it all', 'give up', 'no point', 'hopeless')
+
+
+class RiskPhraseMatcher:
+    """Finds any of a fixed set of phrases in one regex scan
+
+    All phrases are compiled into a single alternation (longest first) so a
+    text is scanned once regardless of how many phrases there are. Matching
+    is case-insensitive, treats any run of whitespace between words as a
+    single space and only matches whole words, so "hopelessly" or
+    "give upgrades" are not flagged.
+    """
+
+    def __init__(self, phrases: Iterable[str] = HIGH_RISK_PHRASES):
+        self.phrases = tuple(sorted({' '.join(phrase.casefold().split()) for phrase in phrases if phrase.strip()},
+                                    key=len, reverse=True))
+        if not self.phrases:
+            raise ValueError("At least one phrase is required")
+        alternatives = '|'.join(r'\s+'.join(map(re.escape, phrase.split())) for phrase in self.phrases)
+        self._pattern = re.compile(rf'\b(?:{alternatives})\b')
+
+    def search(self, text: str) -> bool:
+        """True if ``text`` contains any phrase"""
+        return bool(text) and self._pattern.search(text.casefold()) is not None
+
+    def find(self, text: str) -> List[str]:
+        """Distinct phrases found in ``text``, in order of first appearance"""
+        if not text:
+            return []
+        found = dict.fromkeys(' '.join(match.group().split()) for match in self._pattern.finditer(text.casefold()))
+        return list(found)
@@ -0,0 +1,158 @@
+"""Incremental background crisis-risk scoring across all users"""
+
+import asyncio
+import heapq
+import itertools
+import logging
+import time
+from typing import Dict, List, NamedTuple, Optional, Set, Tuple
+
+from mood_history import MoodHistoryStore
+
+logger = logging.getLogger(__name__)
+
+RISK_LEVELS = ("LOW", "MEDIUM", "HIGH")
+
+
+class UserRisk(NamedTuple):
+    """Latest risk assessment for one user"""
+    user_id: str
+    level: str
+    low_mood_count: int
+    current_low_streak: int
+    high_risk_entries: int
+    mean: float
+    trend_per_day: float
+    first_entry_at: int
+    last_entry_at: int
+    scanned_at: float
+
+    @property
+    def priority(self) -> Tuple:
+        """Sort key, most urgent first when used with a min-heap"""
+        return (-RISK_LEVELS.index(self.level), -self.high_risk_entries, -self.low_mood_count,
+                -self.current_low_streak, self.mean)
+
+    def to_dict(self) -> Dict[str, object]:
+        return self._asdict()
+
+
+class CrisisRiskScanner:
+    """Re-scores users whose mood history changed and ranks them by risk
+
+    Writers call ``mark_dirty`` whenever a user gets a new mood entry; each
+    ``scan`` only touches those users, so users without new data cost
+    nothing. Users above ``LOW`` risk are kept in a heap ordered by
+    ``UserRisk.priority``; superseded heap entries are skipped lazily and
+    compacted once they outnumber the live ones. An assessment goes stale
+    once its oldest entry leaves the window, so those users are re-scored
+    when scanning and before listing.
+    """
+
+    def __init__(self, history: MoodHistoryStore, window_days: float = 7, batch_size: int = 256):
+        self.history = history
+        self.window_days = window_days
+        self.batch_size = max(1, batch_size)
+        self._dirty: Set[str] = set()
+        self._current: Dict[str, UserRisk] = {}
+        self._heap: List[Tuple[Tuple, int, str, UserRisk]] = []
+        self._sequence = itertools.count()
+        self.stats = {'scans': 0, 'users_scored': 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._dirty)
+
+    def mark_dirty(self, user_id: str):
+        """Schedule ``user_id`` for re-scoring on the next scan"""
+        self._dirty.add(user_id)
+
+    def get(self, user_id: str) -> Optional[UserRisk]:
+        """Current assessment for ``user_id`` if it is above LOW risk"""
+        return self._current.get(user_id)
+
+    def score_user(self, user_id: str, now: Optional[float] = None) -> Optional[UserRisk]:
+        """Assess ``user_id`` from the last ``window_days`` of history"""
+        from mood_analytics import assess_mood_risk, compute_mood_features
+
+        now = time.time() if now is None else now
+        start = now - self.window_days * 86400
+        timestamps, scores = self.history.window(user_id, start, now)
+        if not timestamps:
+            return None
+
+        features = compute_mood_features(timestamps, scores, now=now)
+        high_risk_entries = self.history.flagged_count(user_id, start, now)
+        return UserRisk(
+            user_id=user_id,
+            level=assess_mood_risk(features, high_risk_entries),
+            low_mood_count=features['low_mood_count'],
+            current_low_streak=features['current_low_streak'],
+            high_risk_entries=high_risk_entries,
+            mean=features['mean'],
+            trend_per_day=features['trend_per_day'],
+            first_entry_at=int(timestamps[0]),
+            last_entry_at=int(timestamps[-1]),
+            scanned_at=now
+        )
+
+    def _update(self, user_id: str, risk: Optional[UserRisk]):
+        if risk is None or risk.level == "LOW":
+            self._current.pop(user_id, None)
+            return
+        self._current[user_id] = risk
+        heapq.heappush(self._heap, (risk.priority, next(self._sequence), user_id, risk))
+
+    def _rescore_aged(self, now: float) -> int:
+        """Re-score users whose assessment includes entries now outside the window"""
+        cutoff = now - self.window_days * 86400
+        aged = [user_id for user_id, risk in self._current.items() if risk.first_entry_at < cutoff]
+        for user_id in aged:
+            self._dirty.discard(user_id)
+            self._update(user_id, self.score_user(user_id, now))
+        return len(aged)
+
+    def _compact(self):
+        if len(self._heap) > 2 * len(self._current) + 64:
+            self._heap = [entry for entry in self._heap if self._current.get(entry[2]) is entry[3]]
+            heapq.heapify(self._heap)
+
+    async def scan(self, now: Optional[float] = None) -> int:
+        """Re-score every dirty user; returns how many were scored
+
+        Work is done in batches of ``batch_size`` users, yielding to the
+        event loop in between so a large backlog does not stall requests.
+        """
+        scored = self._rescore_aged(time.time() if now is None else now)
+        while self._dirty:
+            batch = [self._dirty.pop() for _ in range(min(self.batch_size, len(self._dirty)))]
+            for user_id in batch:
+                self._update(user_id, self.score_user(user_id, now))
+            scored += len(batch)
+            await asyncio.sleep(0)
+        self._compact()
+        self.stats['scans'] += 1
+        self.stats['users_scored'] += scored
+        return scored
+
+    def at_risk(self, limit: int = 20, min_level: str = "MEDIUM",
+                now: Optional[float] = None) -> List[UserRisk]:
+        """Highest-risk users first, as of ``now``"""
+        now = time.time() if now is None else now
+        self._rescore_aged(now)
+        threshold = RISK_LEVELS.index(min_level)
+        live = (
+            entry for entry in self._heap
+            if self._current.get(entry[2]) is entry[3]
+            and RISK_LEVELS.index(entry[3].level) >= threshold
+        )
+        return [entry[3] for entry in heapq.nsmallest(limit, live)]
+
+    async def run(self, interval: float):
+        """Scan dirty users every ``interval`` seconds until cancelled"""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                await self.scan()
+            except Exception as e:
+                logger.exception("Crisis risk scan failed: %s", e)
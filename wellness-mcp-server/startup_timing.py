@@ -0,0 +1,56 @@
+"""Startup timing report for the wellness MCP server"""
+
+import json
+import logging
+import time
+from contextlib import contextmanager
+from typing import Dict, Iterator, Optional
+
+logger = logging.getLogger(__name__)
+
+
+class StartupTimer:
+    """Records how long each startup phase took and when it finished
+
+    ``origin`` is a ``time.perf_counter()`` reading taken as early as
+    possible (typically at module import) so the report includes import time.
+    """
+
+    def __init__(self, origin: Optional[float] = None):
+        self.origin = time.perf_counter() if origin is None else origin
+        self.durations: Dict[str, float] = {}
+        self.milestones: Dict[str, float] = {}
+
+    @contextmanager
+    def phase(self, name: str) -> Iterator[None]:
+        started = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.durations[name] = time.perf_counter() - started
+            self.milestones[name] = time.perf_counter() - self.origin
+
+    def mark(self, name: str):
+        """Record that ``name`` was reached"""
+        self.milestones[name] = time.perf_counter() - self.origin
+
+    def report(self) -> Dict[str, Dict[str, float]]:
+        """Phase durations and milestones since origin, in milliseconds"""
+        return {
+            'phase_ms': {name: round(value * 1000, 3) for name, value in self.durations.items()},
+            'since_start_ms': {name: round(value * 1000, 3) for name, value in self.milestones.items()},
+        }
+
+    def write_report(self, destination: Optional[str]):
+        """Write the report as JSON to a file path, or log it for ``-``"""
+        if not destination:
+            return
+        payload = json.dumps(self.report(), indent=2)
+        if destination == '-':
+            logger.info("Startup report:\n%s", payload)
+            return
+        try:
+            with open(destination, 'w', encoding='utf-8') as f:
+                f.write(payload)
+        except OSError as e:
+            logger.warning("Could not write startup report: %s", e)
@@ -0,0 +1,172 @@
+"""Interchangeable storage backends for the four wellness tables"""
+
+import asyncio
+from abc import ABC, abstractmethod
+from bisect import bisect_left, bisect_right
+from datetime import datetime
+from typing import Any, Dict, List, Optional, Tuple
+
+from bigquery_writer import BatchedBigQueryWriter
+from lazy_imports import load_bigquery
+from local_store import LocalWellnessStore
+from wellness_tables import TABLE_SCHEMAS, build_row, parse_timestamp
+
+
+class WellnessStorageBackend(ABC):
+    """Bulk writes and per-user time-range reads for every wellness table
+
+    Rows passed to ``save_rows`` and returned by ``query_range`` have the
+    shape produced by ``wellness_tables.build_row``: one key per column,
+    datetimes for TIMESTAMP columns and JSON strings for JSON columns.
+    """
+
+    name = 'abstract'
+
+    @abstractmethod
+    async def save_rows(self, table: str, rows: List[Dict[str, Any]]):
+        """Persist ``rows`` (already built with ``build_row``) to ``table``"""
+
+    @abstractmethod
+    async def query_range(self, table: str, user_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows for ``user_id`` with ``start <= timestamp <= end``, oldest first"""
+
+    async def flush(self):
+        """Wait until buffered writes are durable"""
+
+    async def close(self):
+        """Flush and release resources"""
+        await self.flush()
+
+    async def save(self, table: str, records: List[Dict[str, Any]]):
+        """Build rows from handler dicts and save them in one batch"""
+        await self.save_rows(table, [build_row(table, record) for record in records])
+
+    async def save_mood_entries(self, entries: List[Dict[str, Any]]):
+        await self.save('mood_entries', entries)
+
+    async def save_stress_sessions(self, sessions: List[Dict[str, Any]]):
+        await self.save('stress_sessions', sessions)
+
+    async def save_wellness_goals(self, goals: List[Dict[str, Any]]):
+        await self.save('wellness_goals', goals)
+
+    async def save_mindfulness_sessions(self, sessions: List[Dict[str, Any]]):
+        await self.save('mindfulness_sessions', sessions)
+
+    async def get_mood_entries(self, user_id: str, start: Optional[datetime] = None,
+                               end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.query_range('mood_entries', user_id, start, end)
+
+    async def get_stress_sessions(self, user_id: str, start: Optional[datetime] = None,
+                                  end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.query_range('stress_sessions', user_id, start, end)
+
+    async def get_wellness_goals(self, user_id: str, start: Optional[datetime] = None,
+                                 end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.query_range('wellness_goals', user_id, start, end)
+
+    async def get_mindfulness_sessions(self, user_id: str, start: Optional[datetime] = None,
+                                       end: Optional[datetime] = None) -> List[Dict[str, Any]]:
+        return await self.query_range('mindfulness_sessions', user_id, start, end)
+
+
+class InMemoryBackend(WellnessStorageBackend):
+    """Process-local backend for tests, benchmarks and ephemeral deployments"""
+
+    name = 'memory'
+
+    def __init__(self):
+        # table -> user_id -> (sorted timestamps, rows in the same order)
+        self._tables: Dict[str, Dict[str, Tuple[List[datetime], List[Dict[str, Any]]]]] = {
+            table: {} for table in TABLE_SCHEMAS
+        }
+
+    async def save_rows(self, table: str, rows: List[Dict[str, Any]]):
+        users = self._tables[table]
+        for row in rows:
+            timestamps, stored = users.setdefault(row['user_id'], ([], []))
+            index = bisect_right(timestamps, row['timestamp'])
+            timestamps.insert(index, row['timestamp'])
+            stored.insert(index, dict(row))
+
+    async def query_range(self, table: str, user_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        timestamps, stored = self._tables[table].get(user_id, ([], []))
+        lo = bisect_left(timestamps, parse_timestamp(start)) if start is not None else 0
+        hi = bisect_right(timestamps, parse_timestamp(end)) if end is not None else len(timestamps)
+        if limit is not None:
+            hi = min(hi, lo + limit)
+        return [dict(row) for row in stored[lo:hi]]
+
+
+class SQLiteBackend(WellnessStorageBackend):
+    """Embedded SQLite backend with group-committed writes"""
+
+    name = 'sqlite'
+
+    def __init__(self, store: LocalWellnessStore, max_batch_size: int = 200, flush_interval: float = 0.05):
+        self.store = store
+        self.writer = BatchedBigQueryWriter(store, max_batch_size=max_batch_size, flush_interval=flush_interval)
+
+    async def save_rows(self, table: str, rows: List[Dict[str, Any]]):
+        await self.writer.enqueue(table, rows)
+
+    async def query_range(self, table: str, user_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        # Read-your-writes: commit anything still buffered first
+        await self.writer.flush()
+        return await asyncio.to_thread(self.store.query_range, table, user_id, start, end, limit)
+
+    async def flush(self):
+        await self.writer.flush()
+
+    async def close(self):
+        await self.writer.close()
+        self.store.close()
+
+
+class BigQueryBackend(WellnessStorageBackend):
+    """BigQuery backend; writes are batched and all client calls run off the loop"""
+
+    name = 'bigquery'
+
+    def __init__(self, client: Any, project_id: str, dataset_id: str, writer: BatchedBigQueryWriter):
+        self.client = client
+        self.project_id = project_id
+        self.dataset_id = dataset_id
+        self.writer = writer
+
+    def table_id(self, table: str) -> str:
+        return f"{self.project_id}.{self.dataset_id}.{table}"
+
+    async def save_rows(self, table: str, rows: List[Dict[str, Any]]):
+        await self.writer.enqueue(self.table_id(table), rows)
+
+    async def query_range(self, table: str, user_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        bigquery = load_bigquery()
+
+        sql = f"SELECT * FROM `{self.table_id(table)}` WHERE user_id = @user_id"
+        params = [bigquery.ScalarQueryParameter('user_id', 'STRING', user_id)]
+        if start is not None:
+            sql += " AND timestamp >= @start"
+            params.append(bigquery.ScalarQueryParameter('start', 'TIMESTAMP', parse_timestamp(start)))
+        if end is not None:
+            sql += " AND timestamp <= @end"
+            params.append(bigquery.ScalarQueryParameter('end', 'TIMESTAMP', parse_timestamp(end)))
+        sql += " ORDER BY timestamp"
+        if limit is not None:
+            sql += f" LIMIT {int(limit)}"
+
+        def run_query():
+            job = self.client.query(sql, job_config=bigquery.QueryJobConfig(query_parameters=params))
+            return [dict(row.items()) for row in job.result()]
+
+        return await asyncio.to_thread(run_query)
+
+    async def flush(self):
+        await self.writer.flush()
+
+    async def close(self):
+        await self.writer.close()
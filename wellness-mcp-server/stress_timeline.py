@@ -0,0 +1,72 @@
+"""Stress scoring for single frames and smoothed multi-frame timelines"""
+
+from typing import Any, Dict, List, Optional, Sequence
+
+# Facial emotions that contribute to the stress score
+STRESS_INDICATORS = ('anger', 'fear', 'sadness', 'disgust')
+# Share of the stress score taken from PPG heart-rate variability when available
+PHYSIOLOGICAL_WEIGHT = 0.4
+
+
+def frame_stress_score(emotions: Dict[str, float]) -> float:
+    """Raw stress score of one frame: the summed stress-emotion scores"""
+    return sum(emotions.get(indicator, 0) for indicator in STRESS_INDICATORS)
+
+
+def combine_stress(facial: float, physiological: Optional[float] = None,
+                   weight: float = PHYSIOLOGICAL_WEIGHT) -> float:
+    """Blend a facial stress score with an HRV-derived one on the same scale"""
+    if physiological is None:
+        return facial
+    return (1 - weight) * facial + weight * physiological
+
+
+def stress_level(score: float) -> int:
+    """Stress score on the 0-10 scale reported to users"""
+    return max(0, min(int(score * 10), 10))
+
+
+def smooth(values: Sequence[float], alpha: float = 0.3) -> List[float]:
+    """Exponential moving average of ``values``; ``alpha`` weights the newest value"""
+    alpha = min(max(alpha, 0.0), 1.0)
+    smoothed: List[float] = []
+    current: Optional[float] = None
+    for value in values:
+        current = value if current is None else alpha * value + (1 - alpha) * current
+        smoothed.append(current)
+    return smoothed
+
+
+def summarize_frames(frames: Sequence[Dict[str, Any]], alpha: float = 0.3,
+                     physiological: Optional[float] = None) -> Dict[str, Any]:
+    """Aggregate analyzed frames into a smoothed stress timeline
+
+    ``frames`` are ``{'offset_ms': int, 'emotions': {...}}`` dicts in
+    capture order. The result holds the per-frame timeline, the mean
+    emotion scores across frames and the overall stress levels. A
+    session-wide ``physiological`` (HRV) score is blended into every frame.
+    """
+    if not frames:
+        return {'frame_count': 0, 'timeline': [], 'emotions': {}}
+
+    raw = [combine_stress(frame_stress_score(frame['emotions']), physiological) for frame in frames]
+    smoothed = smooth(raw, alpha)
+
+    totals: Dict[str, float] = {}
+    for frame in frames:
+        for emotion, score in frame['emotions'].items():
+            totals[emotion] = totals.get(emotion, 0.0) + score
+    emotions = {emotion: round(total / len(frames), 4) for emotion, total in totals.items()}
+
+    return {
+        'frame_count': len(frames),
+        'timeline': [
+            {'offset_ms': frame['offset_ms'], 'stress': round(value, 4), 'smoothed_stress': round(level, 4)}
+            for frame, value, level in zip(frames, raw, smoothed)
+        ],
+        'emotions': emotions,
+        'dominant_emotion': max(emotions, key=emotions.get) if emotions else 'neutral',
+        'mean_stress_level': stress_level(sum(smoothed) / len(smoothed)),
+        'peak_stress_level': stress_level(max(smoothed)),
+        'final_stress_level': stress_level(smoothed[-1]),
+    }
@@ -0,0 +1,67 @@
+"""Tests for the load and latency benchmark harness"""
+
+import json
+
+import pytest
+
+pytest.importorskip('mcp')
+
+import benchmark  # noqa: E402
+from benchmark import BenchmarkConfig, build_workload, compare_results, percentiles  # noqa: E402
+
+
+def test_workload_is_reproducible_and_follows_the_mix():
+    config = BenchmarkConfig(mix={'mood_check_in': 3, 'set_wellness_goal': 1, 'list_at_risk_users': 0})
+    first = build_workload(config, 200, seed=7)
+
+    assert first == build_workload(config, 200, seed=7)
+    assert first != build_workload(config, 200, seed=8)
+    tools = [tool for tool, _ in first]
+    assert set(tools) == {'mood_check_in', 'set_wellness_goal'}
+    assert tools.count('mood_check_in') > 2 * tools.count('set_wellness_goal')
+
+
+def test_percentiles_use_nearest_rank():
+    latency = percentiles([i / 1000 for i in range(1, 101)])
+    assert (latency['p50_ms'], latency['p95_ms'], latency['p99_ms'], latency['max_ms']) == (50, 95, 99, 100)
+
+
+def test_small_run_reports_every_tool_and_saves_json(tmp_path, monkeypatch):
+    monkeypatch.setenv('WELLNESS_CPU_WORKERS', '0')
+    output = tmp_path / 'results.json'
+
+    exit_code = benchmark.main([
+        '--requests', '60', '--concurrency', '8', '--warmup', '0', '--storage', 'bigquery',
+        '--gemini-latency-ms', '2', '--emotion-latency-ms', '1', '--bigquery-latency-ms', '1',
+        '--output', str(output),
+    ])
+
+    assert exit_code == 0
+    results = json.loads(output.read_text())
+    assert results['totals']['requests'] == 60
+    assert results['totals']['errors'] == 0
+    assert results['totals']['throughput_rps'] > 0
+    assert sum(tool['requests'] for tool in results['tools'].values()) == 60
+    assert results['upstream_calls']['gemini'] > 0
+    assert results['upstream_calls']['bigquery_rows'] > 0
+    assert results['server_settings']['WELLNESS_CPU_WORKERS'] == '0'
+    assert 'span_duration_seconds' in results['server_metrics']['histograms']
+
+    assert benchmark.main(['--requests', '20', '--warmup', '0', '--gemini-latency-ms', '1',
+                           '--emotion-latency-ms', '1', '--bigquery-latency-ms', '1',
+                           '--compare', str(output), '--tolerance', '100']) == 0
+
+
+def test_compare_flags_latency_and_throughput_regressions():
+    def results(p95_ms, rps):
+        latency = {'p50_ms': 10.0, 'p95_ms': p95_ms, 'p99_ms': p95_ms}
+        return {'totals': {'latency': latency, 'throughput_rps': rps},
+                'tools': {'mood_check_in': {'latency': latency}}}
+
+    assert compare_results(results(100, 50), results(105, 48)) == []
+    regressions = compare_results(results(100, 50), results(150, 30))
+    assert 'total p95_ms: 100 -> 150' in regressions
+    assert 'throughput_rps: 50 -> 30' in regressions
+    assert 'mood_check_in p99_ms: 100 -> 150' in regressions
+    # Growth below the absolute floor is noise
+    assert compare_results(results(1, 50), results(3, 50)) == []
@@ -0,0 +1,103 @@
+"""Tests for lazy BigQuery client construction and cached table provisioning"""
+
+import asyncio
+import logging
+import threading
+import time
+
+import pytest
+
+from bigquery_provisioning import LazyBigQueryClient, TableProvisioner
+from startup_timing import StartupTimer
+
+
+class RecordingProvisioner(TableProvisioner):
+    """Replaces the BigQuery create_table call with a slow local stand-in"""
+
+    def __init__(self, *args, fail_on=None, **kwargs):
+        super().__init__(None, 'proj', 'ds', *args, **kwargs)
+        self.created = []
+        self.fail_on = fail_on
+
+    def _create_table(self, table_id):
+        time.sleep(0.05)
+        if table_id.endswith(self.fail_on or '\0'):
+            raise RuntimeError('permission denied')
+        self.created.append(table_id)
+
+
+def test_client_is_built_on_first_use_only():
+    built = []
+    client = LazyBigQueryClient(lambda: built.append(threading.get_ident()) or type('C', (), {'project': 'p'})())
+    assert not client.created and built == []
+
+    assert client.project == 'p'
+    assert client.project == 'p'
+    assert len(built) == 1
+
+
+def test_failed_construction_is_retried():
+    attempts = []
+
+    def factory():
+        attempts.append(1)
+        if len(attempts) == 1:
+            raise OSError('no credentials')
+        return object()
+
+    client = LazyBigQueryClient(factory)
+    with pytest.raises(OSError):
+        client.get()
+    assert client.get() is not None
+    assert len(attempts) == 2
+
+
+def test_tables_are_provisioned_concurrently_and_cached(tmp_path):
+    cache_path = str(tmp_path / 'tables.json')
+    provisioner = RecordingProvisioner(cache_path=cache_path)
+
+    started = time.perf_counter()
+    provisioned = asyncio.run(provisioner.provision())
+    elapsed = time.perf_counter() - started
+
+    assert len(provisioned) == 4
+    assert elapsed < 0.15  # four 50ms creations overlap
+
+    second = RecordingProvisioner(cache_path=cache_path)
+    assert asyncio.run(second.provision()) == []
+    assert second.created == []
+
+
+def test_schema_change_or_failure_reprovisions(tmp_path):
+    cache_path = str(tmp_path / 'tables.json')
+    failing = RecordingProvisioner(cache_path=cache_path, fail_on='wellness_goals')
+    with pytest.raises(RuntimeError):
+        asyncio.run(failing.provision())
+    assert len(failing.created) == 3
+
+    retry = RecordingProvisioner(cache_path=cache_path)
+    assert asyncio.run(retry.provision()) == ['proj.ds.wellness_goals']
+
+    changed = RecordingProvisioner(cache_path=cache_path, schemas={'mood_entries': [('entry_id', 'STRING')]})
+    assert asyncio.run(changed.provision()) == ['proj.ds.mood_entries']
+
+
+def test_startup_report_records_phases(tmp_path, caplog):
+    timer = StartupTimer()
+    with timer.phase('bigquery_client'):
+        time.sleep(0.01)
+    timer.mark('stdio_ready')
+
+    report = timer.report()
+    assert report['phase_ms']['bigquery_client'] >= 10
+    assert set(report['since_start_ms']) == {'bigquery_client', 'stdio_ready'}
+
+    path = tmp_path / 'startup.json'
+    timer.write_report(str(path))
+    assert 'stdio_ready' in path.read_text()
+
+    with caplog.at_level(logging.INFO, logger='startup_timing'):
+        timer.write_report('-')
+        timer.write_report(str(tmp_path / 'missing' / 'startup.json'))
+    assert 'stdio_ready' in caplog.records[0].getMessage()
+    assert caplog.records[1].levelno == logging.WARNING
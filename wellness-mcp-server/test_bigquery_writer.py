@@ -0,0 +1,190 @@
+"""Tests for the batched BigQuery writer using a local fake client"""
+
+import asyncio
+import threading
+import time
+
+import pytest
+
+from bigquery_provisioning import bigquery_schema
+from bigquery_writer import BatchedBigQueryWriter
+
+
+class FakeBigQueryClient:
+    """Records insert_rows calls and the thread they ran on"""
+
+    def __init__(self, delay: float = 0.0, fail: bool = False):
+        self.delay = delay
+        self.fail = fail
+        self.calls = []
+
+    def insert_rows(self, table_id, rows):
+        time.sleep(self.delay)
+        self.calls.append((table_id, list(rows), threading.get_ident()))
+        if self.fail:
+            raise ConnectionError("BigQuery unreachable")
+        return []
+
+
+def test_rows_are_coalesced_per_table_and_flushed_on_close():
+    client = FakeBigQueryClient()
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, max_batch_size=100, flush_interval=60)
+        for i in range(5):
+            await writer.enqueue('p.d.mood_entries', [{'n': i}])
+        await writer.enqueue('p.d.stress_sessions', [{'n': 0}])
+        assert client.calls == []
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    tables = sorted((table_id, len(rows)) for table_id, rows, _ in client.calls)
+    assert tables == [('p.d.mood_entries', 5), ('p.d.stress_sessions', 1)]
+    assert writer.stats['rows_written'] == 6
+    assert writer.stats['batches_written'] == 2
+
+
+def test_size_threshold_triggers_flush():
+    client = FakeBigQueryClient()
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, max_batch_size=3, flush_interval=60)
+        await writer.enqueue('t', [{'n': i} for i in range(7)])
+        await writer.close()
+
+    asyncio.run(run())
+    assert [len(rows) for _, rows, _ in client.calls] == [3, 3, 1]
+
+
+def test_time_threshold_triggers_flush():
+    client = FakeBigQueryClient()
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, max_batch_size=100, flush_interval=0.05)
+        await writer.enqueue('t', [{'n': 1}])
+        await asyncio.sleep(0.2)
+        calls = len(client.calls)
+        await writer.close()
+        return calls
+
+    assert asyncio.run(run()) == 1
+
+
+def test_insert_runs_off_the_event_loop():
+    client = FakeBigQueryClient(delay=0.2)
+
+    async def run():
+        loop_thread = threading.get_ident()
+        writer = BatchedBigQueryWriter(client, max_batch_size=1, flush_interval=60)
+        await writer.enqueue('t', [{'n': 1}])
+
+        # The loop keeps ticking while the slow insert is in flight
+        started = time.perf_counter()
+        await asyncio.sleep(0.01)
+        elapsed = time.perf_counter() - started
+
+        await writer.close()
+        return loop_thread, elapsed
+
+    loop_thread, elapsed = asyncio.run(run())
+    assert client.calls[0][2] != loop_thread
+    assert elapsed < 0.15
+
+
+def test_bounded_buffer_applies_backpressure():
+    client = FakeBigQueryClient(delay=0.05)
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, max_batch_size=1, flush_interval=60, max_buffered_rows=2)
+        producer = asyncio.ensure_future(writer.enqueue('t', [{'n': i} for i in range(10)]))
+        await asyncio.sleep(0.02)
+        assert not producer.done()
+        assert writer.pending_rows <= 3
+        await producer
+        await writer.close()
+
+    asyncio.run(run())
+    assert sum(len(rows) for _, rows, _ in client.calls) == 10
+
+
+def test_failed_batches_are_reported_to_error_handler():
+    client = FakeBigQueryClient(fail=True)
+    failed = []
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, flush_interval=60,
+                                       on_error=lambda table_id, rows, exc: failed.append((table_id, len(rows))))
+        await writer.enqueue('t', [{'n': 1}, {'n': 2}])
+        await writer.close()
+        return writer
+
+    writer = asyncio.run(run())
+    assert failed == [('t', 2)]
+    assert writer.stats['rows_failed'] == 2
+
+
+
+def test_failing_error_handler_does_not_stop_the_writer():
+    client = FakeBigQueryClient(fail=True)
+
+    def spill(table_id, rows, exc):
+        raise OSError("database is locked")
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, flush_interval=60, on_error=spill)
+        await writer.enqueue('t', [{'n': 1}])
+        await asyncio.wait_for(writer.flush(), timeout=1)
+        client.fail = False
+        await writer.enqueue('t', [{'n': 2}])
+        await asyncio.wait_for(writer.close(), timeout=1)
+        return writer
+
+    writer = asyncio.run(run())
+    assert writer.stats['rows_failed'] == 1
+    assert writer.stats['rows_written'] == 1
+
+
+def test_flush_fails_instead_of_hanging_when_the_worker_dies():
+    client = FakeBigQueryClient(delay=0.1)
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, flush_interval=60)
+        await writer.enqueue('t', [{'n': 1}])
+        flush = asyncio.ensure_future(writer.flush())
+        await asyncio.sleep(0.02)
+        writer._worker.cancel()
+        with pytest.raises(RuntimeError, match="stopped before flushing"):
+            await asyncio.wait_for(flush, timeout=1)
+
+    asyncio.run(run())
+
+
+class SchemaCheckingClient:
+    """Rejects inserts by table id without a schema, like ``bigquery.Client``"""
+
+    def __init__(self):
+        self.calls = []
+
+    def insert_rows(self, table, rows, selected_fields=None):
+        if isinstance(table, str) and selected_fields is None:
+            raise ValueError(f"Could not determine schema for table '{table}'")
+        self.calls.append((table, [field.name for field in selected_fields], len(rows)))
+        return []
+
+
+def test_inserts_pass_the_table_schema():
+    pytest.importorskip('google.cloud.bigquery')
+    client = SchemaCheckingClient()
+    failed = []
+
+    async def run():
+        writer = BatchedBigQueryWriter(client, flush_interval=60, selected_fields=bigquery_schema,
+                                       on_error=lambda table_id, rows, exc: failed.append(exc))
+        await writer.enqueue('p.d.mood_entries', [{'user_id': 'alice', 'mood_score': 3}])
+        await writer.close()
+
+    asyncio.run(run())
+    assert failed == []
+    assert client.calls[0][0] == 'p.d.mood_entries'
+    assert client.calls[0][1][:3] == ['entry_id', 'user_id', 'timestamp']
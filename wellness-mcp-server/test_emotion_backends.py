@@ -0,0 +1,136 @@
+"""Tests for the facial emotion analysis backends"""
+
+import asyncio
+import os
+
+import pytest
+
+import emotion_backends
+from emotion_backends import (
+    HumeAPIBackend,
+    LocalModelBackend,
+    MockEmotionBackend,
+    create_emotion_backend,
+    parse_hume_face_result,
+)
+from worker_pools import WorkerPools
+
+
+def make_length_model():
+    """Worker-side model: scores a frame by its length, no face for empty frames"""
+    pid = os.getpid()
+
+    def predict(frames):
+        return [{'fear': len(frame) / 10, 'joy': 1 - len(frame) / 10, 'pid': pid} if frame != b'-' else None
+                for frame in frames]
+    return predict
+
+
+def make_broken_model():
+    def predict(frames):
+        raise RuntimeError('model crashed')
+    return predict
+
+
+def test_mock_backend_and_factory():
+    result = asyncio.run(MockEmotionBackend().analyze_facial_emotions(b'frame'))
+    assert result['success'] and result['dominant_emotion'] == 'joy'
+
+    assert isinstance(create_emotion_backend('hume', api_key='key'), HumeAPIBackend)
+    with pytest.raises(ValueError, match='HUME_API_KEY'):
+        create_emotion_backend('hume')
+    with pytest.raises(ValueError, match='EMOTION_LOCAL_MODEL'):
+        create_emotion_backend('local')
+    with pytest.raises(ValueError, match='module:factory'):
+        create_emotion_backend('local', local_model='no_colon')
+    with pytest.raises(ValueError, match='Unknown'):
+        create_emotion_backend('gpu')
+
+
+def test_hume_face_results_are_normalized():
+    scores = parse_hume_face_result({'face': {'predictions': [{'emotions': [
+        {'name': 'Joy', 'score': 0.2}, {'name': 'Fear', 'score': 0.5},
+        {'name': 'Surprise (positive)', 'score': 0.1}, {'name': 'Surprise (negative)', 'score': 0.3},
+    ]}]}})
+
+    assert scores['fear'] == 0.5 and scores['joy'] == 0.2
+    assert scores['surprise'] == 0.3
+    assert parse_hume_face_result({'face': {'warning': 'No faces detected.'}}) is None
+    with pytest.raises(RuntimeError, match='quota'):
+        parse_hume_face_result({'error': 'quota exceeded'})
+
+
+def test_hume_sdk_failures_are_reported_as_results(monkeypatch):
+    def missing_sdk():
+        raise ImportError("The hume package is not installed")
+
+    monkeypatch.setattr(emotion_backends, 'load_hume_stream_api', missing_sdk)
+    result = asyncio.run(HumeAPIBackend('key').analyze_facial_emotions(b'frame'))
+    assert result == {'success': False, 'error': 'Hume SDK unavailable: The hume package is not installed',
+                      'backend': 'hume'}
+
+    def rejecting_client(api_key):
+        raise ValueError('bad api key')
+
+    monkeypatch.setattr(emotion_backends, 'load_hume_stream_api', lambda: (rejecting_client, object))
+    result = asyncio.run(HumeAPIBackend('key').analyze_facial_emotions(b'frame'))
+    assert not result['success'] and 'bad api key' in result['error']
+
+
+def test_local_backend_batches_frames_across_worker_processes():
+    backend = LocalModelBackend(f'{__name__}:make_length_model', workers=2, max_batch_size=4, max_batch_delay=0.05)
+    frames = [b'x' * (i % 5 + 1) for i in range(12)] + [b'-']
+
+    async def run():
+        try:
+            return await asyncio.gather(*(backend.analyze_facial_emotions(frame) for frame in frames))
+        finally:
+            await backend.close()
+
+    results = asyncio.run(run())
+    assert [result['emotions']['fear'] for result in results[:5]] == [0.1, 0.2, 0.3, 0.4, 0.5]
+    assert results[-1] == {'success': False, 'error': 'No face detected', 'backend': 'local'}
+    assert backend.stats['batches'] == 4
+    assert backend.stats['largest_batch'] == 4
+    assert all(result['emotions']['pid'] != os.getpid() for result in results[:-1])
+
+
+def test_local_model_errors_reach_every_caller():
+    backend = LocalModelBackend(f'{__name__}:make_broken_model', workers=1)
+
+    async def run():
+        try:
+            return await asyncio.gather(*(backend.analyze_facial_emotions(b'f') for _ in range(3)),
+                                        return_exceptions=True)
+        finally:
+            await backend.close()
+
+    results = asyncio.run(run())
+    assert all(isinstance(result, RuntimeError) for result in results)
+    assert backend.stats['errors'] == 1
+
+
+def test_local_model_spec_is_checked_without_importing_the_model(tmp_path, monkeypatch):
+    (tmp_path / 'heavy_emotion_model.py').write_text("raise RuntimeError('imported in the server')\n")
+    monkeypatch.syspath_prepend(str(tmp_path))
+
+    LocalModelBackend('heavy_emotion_model:build')
+    with pytest.raises(ValueError, match='not found'):
+        LocalModelBackend('no_such_emotion_model:build')
+
+
+def test_local_backend_runs_batches_in_the_shared_cpu_pool():
+    pools = WorkerPools(io_workers=1, cpu_workers=1)
+    backend = LocalModelBackend(f'{__name__}:make_length_model', workers=1, pools=pools)
+
+    async def run():
+        try:
+            return await backend.analyze_facial_emotions(b'xx')
+        finally:
+            await backend.close()
+
+    result = asyncio.run(run())
+    assert result['emotions']['fear'] == 0.2 and result['emotions']['pid'] != os.getpid()
+    # The server's pools stay up and count the batch
+    assert pools.snapshot()['cpu']['finished'] == 1
+    pools.shutdown()
@@ -0,0 +1,86 @@
+"""Tests for the facial emotion result cache"""
+
+import asyncio
+import io
+
+import pytest
+
+from emotion_cache import CachedEmotionAnalyzer, perceptual_hash
+
+
+class CountingAnalyzer:
+    def __init__(self, delay=0.0, success=True):
+        self.calls = 0
+        self.delay = delay
+        self.success = success
+
+    async def analyze_facial_emotions(self, image_data):
+        self.calls += 1
+        await asyncio.sleep(self.delay)
+        if not self.success:
+            return {'success': False, 'error': 'no face found'}
+        return {'success': True, 'emotions': {'joy': len(bytes(image_data)) / 100}}
+
+
+def test_repeated_frames_hit_and_lru_evicts():
+    analyzer = CountingAnalyzer()
+    cache = CachedEmotionAnalyzer(analyzer, max_entries=2)
+
+    async def run():
+        for frame in (b'a' * 10, memoryview(b'a' * 10), b'b' * 20, b'c' * 30, b'a' * 10):
+            await cache.analyze_facial_emotions(frame)
+
+    asyncio.run(run())
+    assert analyzer.calls == 4
+    assert cache.stats['hits'] == 1
+    assert cache.stats['evictions'] == 2
+    assert len(cache) == 2
+    assert cache.hit_rate() == pytest.approx(0.2)
+
+
+def test_concurrent_duplicates_share_one_analysis_and_failures_are_not_cached():
+    analyzer = CountingAnalyzer(delay=0.01)
+    cache = CachedEmotionAnalyzer(analyzer)
+
+    async def run():
+        return await asyncio.gather(*(cache.analyze_facial_emotions(b'frame') for _ in range(5)))
+
+    results = asyncio.run(run())
+    assert analyzer.calls == 1
+    assert cache.stats['coalesced'] == 4
+    assert all(result['emotions'] == {'joy': 0.05} for result in results)
+
+    failing = CachedEmotionAnalyzer(CountingAnalyzer(success=False))
+    for _ in range(2):
+        assert asyncio.run(failing.analyze_facial_emotions(b'frame'))['success'] is False
+    assert failing.analyzer.calls == 2
+    assert len(failing) == 0
+
+
+def test_near_identical_frames_hit_with_perceptual_hashing():
+    pil_image = pytest.importorskip('PIL.Image')
+
+    def jpeg(noise):
+        image = pil_image.new('L', (64, 64))
+        image.putdata([(x * 4 + noise * ((x + y) % 3)) % 256 for y in range(64) for x in range(64)])
+        output = io.BytesIO()
+        image.save(output, format='JPEG', quality=90)
+        return output.getvalue()
+
+    original, resent = jpeg(0), jpeg(1)
+    assert original != resent
+    assert perceptual_hash(b'not an image') is None
+
+    analyzer = CountingAnalyzer()
+    exact = CachedEmotionAnalyzer(analyzer)
+    similar = CachedEmotionAnalyzer(analyzer, perceptual=True)
+
+    async def run():
+        for cache in (exact, similar):
+            await cache.analyze_facial_emotions(original)
+            await cache.analyze_facial_emotions(resent)
+
+    asyncio.run(run())
+    assert exact.stats['misses'] == 2
+    assert similar.stats['perceptual_hits'] == 1
+    assert analyzer.calls == 3
@@ -0,0 +1,134 @@
+"""Tests for the shared Gemini client against a local stub model"""
+
+import asyncio
+import time
+
+import pytest
+
+from gemini_client import GeminiClient, TokenBucket
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    """Mimics GenerativeModel.generate_content_async with a fixed latency"""
+
+    def __init__(self, latency: float = 0.05):
+        self.latency = latency
+        self.calls = []
+        self.active = 0
+        self.max_active = 0
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.calls.append(prompt)
+        if stream:
+            return self._stream(prompt)
+        self.active += 1
+        self.max_active = max(self.max_active, self.active)
+        try:
+            await asyncio.sleep(self.latency)
+        finally:
+            self.active -= 1
+        return StubResponse(f"reply to {prompt}")
+
+    async def _stream(self, prompt):
+        for word in f"reply to {prompt}".split(' '):
+            await asyncio.sleep(self.latency)
+            yield StubResponse(word + ' ')
+
+
+def test_concurrent_identical_prompts_share_one_upstream_call():
+    model = StubModel()
+
+    async def run():
+        client = GeminiClient(model)
+        results = await asyncio.gather(*(client.generate('same prompt') for _ in range(10)))
+        return client, results
+
+    client, results = asyncio.run(run())
+    assert results == ['reply to same prompt'] * 10
+    assert model.calls == ['same prompt']
+    assert client.stats['coalesced'] == 9
+    assert client.in_flight == 0
+
+
+def test_semaphore_bounds_upstream_concurrency():
+    model = StubModel(latency=0.02)
+
+    async def run():
+        client = GeminiClient(model, max_concurrency=3)
+        await asyncio.gather(*(client.generate(f'prompt {i}') for i in range(12)))
+
+    asyncio.run(run())
+    assert len(model.calls) == 12
+    assert model.max_active == 3
+
+
+def test_per_call_timeout_does_not_cancel_shared_request():
+    model = StubModel(latency=0.1)
+
+    async def run():
+        client = GeminiClient(model, timeout=5)
+        impatient = client.generate('slow', timeout=0.01)
+        patient = client.generate('slow')
+        return client, await asyncio.gather(impatient, patient, return_exceptions=True)
+
+    client, (impatient, patient) = asyncio.run(run())
+    assert isinstance(impatient, TimeoutError)
+    assert patient == 'reply to slow'
+    assert client.stats['timeouts'] == 1
+    assert len(model.calls) == 1
+
+
+def test_token_bucket_limits_request_rate():
+    model = StubModel(latency=0)
+
+    async def run():
+        client = GeminiClient(model, max_concurrency=10, rate_limiter=TokenBucket(rate=50, capacity=2))
+        started = time.perf_counter()
+        await asyncio.gather(*(client.generate(f'prompt {i}') for i in range(7)))
+        return time.perf_counter() - started
+
+    # Two requests burst immediately, the remaining five wait ~20ms each
+    elapsed = asyncio.run(run())
+    assert elapsed >= 0.09
+
+
+def test_token_bucket_rejects_non_positive_rate():
+    with pytest.raises(ValueError):
+        TokenBucket(rate=0)
+
+
+def test_stream_yields_chunks_before_generation_finishes():
+    model = StubModel(latency=0.05)
+
+    async def run():
+        client = GeminiClient(model)
+        started = time.perf_counter()
+        chunks = []
+        first_chunk_at = None
+        async for chunk in client.stream('mindfulness'):
+            if first_chunk_at is None:
+                first_chunk_at = time.perf_counter() - started
+            chunks.append(chunk)
+        return chunks, first_chunk_at, time.perf_counter() - started
+
+    chunks, first_chunk_at, total = asyncio.run(run())
+    assert ''.join(chunks) == 'reply to mindfulness '
+    assert len(chunks) == 3
+    assert first_chunk_at < total / 2
+
+
+def test_stream_timeout_covers_whole_stream():
+    model = StubModel(latency=0.05)
+
+    async def run():
+        client = GeminiClient(model)
+        async for _ in client.stream('slow', timeout=0.08):
+            pass
+
+    with pytest.raises(TimeoutError):
+        asyncio.run(run())
@@ -0,0 +1,99 @@
+"""Tests for base64 frame decoding"""
+
+import base64
+import os
+import tracemalloc
+
+import pytest
+
+import image_decoding
+from image_decoding import BufferPool, ImageDecoder, ImagePayloadError, max_decoded_size
+
+
+def test_decodes_plain_base64_and_data_urls():
+    raw = os.urandom(1000)
+    encoded = base64.b64encode(raw).decode()
+    decoder = ImageDecoder()
+
+    with decoder.decode(encoded) as image:
+        assert bytes(image.data) == raw
+        assert image.mime_type is None
+    with decoder.decode(f"data:image/png;base64,{encoded}") as image:
+        assert bytes(image.data) == raw
+        assert image.mime_type == 'image/png'
+
+
+def test_multi_chunk_payloads_and_embedded_newlines(monkeypatch):
+    monkeypatch.setattr(image_decoding, '_CHUNK_CHARS', 64)
+    raw = os.urandom(1001)
+    decoder = ImageDecoder()
+
+    with decoder.decode(base64.b64encode(raw).decode()) as image:
+        assert bytes(image.data) == raw
+    with decoder.decode(base64.encodebytes(raw).decode()) as image:
+        assert bytes(image.data) == raw
+
+
+def test_size_limit_is_enforced_before_decoding(monkeypatch):
+    decoder = ImageDecoder(max_bytes=1024)
+    payload = base64.b64encode(os.urandom(2048)).decode()
+    monkeypatch.setattr(decoder, '_decode_into', lambda *args: pytest.fail("decoded an oversized payload"))
+
+    with pytest.raises(ImagePayloadError, match="too large"):
+        decoder.decode(payload)
+    assert max_decoded_size(payload) == 2048
+
+
+def test_malformed_payloads_raise_payload_errors():
+    decoder = ImageDecoder()
+    with pytest.raises(ImagePayloadError):
+        decoder.decode("")
+    with pytest.raises(ImagePayloadError, match="data URL"):
+        decoder.decode("data:image/png;base64" + "A" * 400)
+    with pytest.raises(ImagePayloadError, match="base64"):
+        decoder.decode("abc")
+
+
+def test_buffers_are_reused_after_release():
+    pool = BufferPool(max_buffers=1)
+    decoder = ImageDecoder(pool=pool)
+    encoded = base64.b64encode(os.urandom(3000)).decode()
+
+    image = decoder.decode(encoded)
+    first_buffer = image._buffer
+    image.release()
+    image.release()
+    with decoder.decode(base64.b64encode(b'small').decode()) as image:
+        assert image._buffer is first_buffer
+        assert bytes(image.data) == b'small'
+
+
+def test_peak_memory_is_below_split_and_decode():
+    payload = "data:image/jpeg;base64," + base64.b64encode(os.urandom(4 * 1024 * 1024)).decode()
+    decoder = ImageDecoder(pool=BufferPool(max_buffers=0))
+
+    tracemalloc.start()
+    base64.b64decode(payload.split(',')[-1])
+    _, baseline_peak = tracemalloc.get_traced_memory()
+    tracemalloc.reset_peak()
+    with decoder.decode(payload):
+        pass
+    _, decoder_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    assert decoder_peak < baseline_peak * 0.6
+
+
+def test_normalize_downscales_large_frames():
+    pil_image = pytest.importorskip('PIL.Image')
+    import io
+
+    frame = io.BytesIO()
+    pil_image.new('RGB', (2000, 1000), 'red').save(frame, format='JPEG')
+    decoder = ImageDecoder(max_dimension=500)
+
+    with decoder.decode(base64.b64encode(frame.getvalue()).decode()) as image:
+        with pil_image.open(io.BytesIO(decoder.normalize(image))) as result:
+            assert max(result.size) == 500
+    with decoder.decode(base64.b64encode(b'not an image').decode()) as image:
+        assert bytes(decoder.normalize(image)) == b'not an image'
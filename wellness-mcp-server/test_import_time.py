@@ -0,0 +1,74 @@
+"""Import-time and cold-start regression checks for the wellness server
+
+Run with ``-s`` to see the measured numbers. Budgets can be tightened or
+relaxed per machine through WELLNESS_IMPORT_BUDGET_MS and
+WELLNESS_STARTUP_BUDGET_MS.
+"""
+
+import json
+import os
+import subprocess
+import sys
+
+import pytest
+
+pytest.importorskip('mcp')
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+HEAVY_MODULES = ('google.cloud.bigquery', 'google.generativeai')
+
+STARTUP_SCRIPT = """
+import json, sys, time
+started = time.perf_counter()
+import wellness_mcp_server
+imported = time.perf_counter()
+wellness_mcp_server.WellnessMCPServer()
+constructed = time.perf_counter()
+print(json.dumps({
+    'import_ms': (imported - started) * 1000,
+    'startup_ms': (constructed - started) * 1000,
+    'heavy_modules': [name for name in %r if name in sys.modules],
+}))
+""" % (HEAVY_MODULES,)
+
+
+def _unconfigured_env(tmp_path):
+    env = os.environ.copy()
+    for name in ('GEMINI_API_KEY', 'HUME_API_KEY', 'BIGQUERY_PROJECT_ID', 'WELLNESS_STORAGE_BACKEND'):
+        env.pop(name, None)
+    env['WELLNESS_LOCAL_DB'] = str(tmp_path / 'wellness.db')
+    return env
+
+
+def _importtime(env):
+    """Cumulative microseconds per module from ``python -X importtime``"""
+    result = subprocess.run([sys.executable, '-X', 'importtime', '-c', 'import wellness_mcp_server'],
+                            cwd=HERE, env=env, capture_output=True, text=True, check=True)
+    modules = {}
+    for line in result.stderr.splitlines():
+        if not line.startswith('import time:') or 'cumulative' in line:
+            continue
+        _, cumulative, name = (part.strip() for part in line[len('import time:'):].split('|'))
+        modules[name] = int(cumulative)
+    return modules
+
+
+def test_heavy_sdks_are_not_imported_when_unconfigured(tmp_path):
+    modules = _importtime(_unconfigured_env(tmp_path))
+    assert 'wellness_mcp_server' in modules
+    assert not [name for name in HEAVY_MODULES if name in modules]
+
+    print(f"\nimport wellness_mcp_server: {modules['wellness_mcp_server'] / 1000:.1f}ms")
+    budget_ms = float(os.getenv('WELLNESS_IMPORT_BUDGET_MS', '1500'))
+    assert modules['wellness_mcp_server'] / 1000 < budget_ms
+
+
+def test_cold_start_stays_within_budget(tmp_path):
+    result = subprocess.run([sys.executable, '-c', STARTUP_SCRIPT], cwd=HERE, env=_unconfigured_env(tmp_path),
+                            capture_output=True, text=True, check=True)
+    timings = json.loads(result.stdout.strip().splitlines()[-1])
+
+    print(f"\ncold start: import {timings['import_ms']:.1f}ms, ready {timings['startup_ms']:.1f}ms")
+    assert timings['heavy_modules'] == []
+    budget_ms = float(os.getenv('WELLNESS_STARTUP_BUDGET_MS', '2000'))
+    assert timings['startup_ms'] < budget_ms
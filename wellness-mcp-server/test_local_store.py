@@ -0,0 +1,74 @@
+"""Tests for the SQLite fallback store"""
+
+import asyncio
+from datetime import datetime
+
+from bigquery_writer import BatchedBigQueryWriter
+from local_store import LocalWellnessStore
+
+
+def mood_row(user_id, timestamp, score):
+    return {
+        'entry_id': f"mood_{user_id}_{timestamp}",
+        'user_id': user_id,
+        'timestamp': datetime.fromisoformat(timestamp),
+        'mood_score': score,
+        'text_description': '',
+        'emotion_data': {'joy': 0.5},
+        'gemini_analysis': '',
+        'created_at': datetime.utcnow()
+    }
+
+
+def test_rows_survive_reopen_and_query_by_range(tmp_path):
+    path = str(tmp_path / 'wellness.db')
+    store = LocalWellnessStore(path)
+    store.insert_rows('project.dataset.mood_entries', [
+        mood_row('alice', '2024-01-03T09:00:00', 4),
+        mood_row('alice', '2024-01-01T09:00:00', 2),
+        mood_row('bob', '2024-01-02T09:00:00', 8),
+    ])
+    store.close()
+
+    reopened = LocalWellnessStore(path)
+    rows = reopened.query_range('mood_entries', 'alice', start='2024-01-01T00:00:00', end='2024-01-05T00:00:00')
+    assert [row['mood_score'] for row in rows] == [2, 4]
+    assert rows[0]['emotion_data'] == '{"joy": 0.5}'
+    assert reopened._conn.execute('PRAGMA journal_mode').fetchone()[0] == 'wal'
+
+
+def test_pending_rows_can_be_marked_uploaded(tmp_path):
+    store = LocalWellnessStore(str(tmp_path / 'wellness.db'))
+    store.insert_rows('mood_entries', [mood_row('alice', f'2024-01-0{i}T09:00:00', i) for i in range(1, 6)])
+    store.insert_rows('mood_entries', [mood_row('alice', '2024-01-09T09:00:00', 9)], uploaded=True)
+
+    pending = store.pending_uploads('mood_entries', limit=3)
+    assert [row['mood_score'] for _, row in pending] == [1, 2, 3]
+
+    store.mark_uploaded('mood_entries', [rowid for rowid, _ in pending])
+    assert store.count('mood_entries', pending_only=True) == 2
+    assert store.count('mood_entries') == 6
+
+
+def test_batched_writer_group_commits_local_rows(tmp_path):
+    store = LocalWellnessStore(str(tmp_path / 'wellness.db'))
+    commits = []
+    insert_rows = store.insert_rows
+
+    def counting_insert(table_id, rows):
+        commits.append(len(rows))
+        return insert_rows(table_id, rows)
+
+    store.insert_rows = counting_insert
+
+    async def run():
+        writer = BatchedBigQueryWriter(store, max_batch_size=100, flush_interval=0.05)
+        await asyncio.gather(*(
+            writer.enqueue('mood_entries', [mood_row('alice', f'2024-02-01T09:00:{i:02d}', 5)])
+            for i in range(20)
+        ))
+        await writer.close()
+
+    asyncio.run(run())
+    assert commits == [20]
+    assert store.count('mood_entries') == 20
@@ -0,0 +1,86 @@
+"""Tests for the in-process metrics registry and its exporters"""
+
+import asyncio
+
+import pytest
+
+from metrics import Histogram, MetricsRegistry, current_tool, serve_metrics, write_prometheus_file
+
+
+def test_histogram_quantiles_use_bucket_bounds():
+    histogram = Histogram(buckets=(0.01, 0.1, 1.0))
+    for value in [0.005] * 90 + [0.05] * 9 + [3.0]:
+        histogram.observe(value)
+
+    assert histogram.quantile(0.5) == 0.01
+    assert histogram.quantile(0.95) == 0.1
+    assert histogram.quantile(1.0) == 3.0
+    snapshot = histogram.snapshot()
+    assert snapshot['count'] == 100
+    assert snapshot['max_ms'] == 3000.0
+
+
+def test_spans_are_attributed_to_the_current_tool_and_count_errors():
+    metrics = MetricsRegistry()
+
+    async def run():
+        current_tool.set('mood_check_in')
+        with metrics.span('gemini'):
+            await asyncio.sleep(0)
+        with pytest.raises(RuntimeError):
+            with metrics.span('storage'):
+                raise RuntimeError("disk full")
+
+    asyncio.run(run())
+    with metrics.span('bigquery_insert'):
+        pass
+
+    spans = metrics.snapshot()['histograms']['span_duration_seconds']
+    assert spans['span=gemini,tool=mood_check_in']['count'] == 1
+    assert spans['span=storage,tool=mood_check_in']['count'] == 1
+    assert spans['span=bigquery_insert,tool=background']['count'] == 1
+    assert metrics.counters['span_errors'] == {(('span', 'storage'), ('tool', 'mood_check_in')): 1}
+
+
+def test_prometheus_text_includes_histograms_counters_and_gauges():
+    metrics = MetricsRegistry()
+    metrics.observe('tool_duration_seconds', 0.02, tool='mood_check_in')
+    metrics.increment('tool_calls', tool='mood_check_in', status='ok')
+    metrics.register_gauge('queue_depth', 'queue', lambda: {'tool_calls': 3})
+    metrics.register_gauge('broken', 'queue', lambda: 1 / 0)
+
+    text = metrics.prometheus_text()
+    assert '# TYPE wellness_tool_duration_seconds histogram' in text
+    assert 'wellness_tool_duration_seconds_bucket{tool="mood_check_in",le="0.01"} 0' in text
+    assert 'wellness_tool_duration_seconds_bucket{tool="mood_check_in",le="0.025"} 1' in text
+    assert 'wellness_tool_duration_seconds_bucket{tool="mood_check_in",le="+Inf"} 1' in text
+    assert 'wellness_tool_calls_total{status="ok",tool="mood_check_in"} 1' in text
+    assert 'wellness_queue_depth{queue="tool_calls"} 3' in text
+    assert 'broken' not in text
+
+
+def test_file_export_and_scrape_socket(tmp_path):
+    metrics = MetricsRegistry()
+    metrics.increment('tool_calls', tool='list_at_risk_users', status='ok')
+
+    path = tmp_path / 'wellness.prom'
+    write_prometheus_file(metrics, str(path))
+    assert 'wellness_tool_calls_total' in path.read_text()
+
+    async def scrape():
+        server = await serve_metrics(metrics, '127.0.0.1', 0)
+        port = server.sockets[0].getsockname()[1]
+        try:
+            reader, writer = await asyncio.open_connection('127.0.0.1', port)
+            writer.write(b"GET /metrics HTTP/1.0\r\n\r\n")
+            await writer.drain()
+            response = await reader.read()
+            writer.close()
+            return response.decode('utf-8')
+        finally:
+            server.close()
+            await server.wait_closed()
+
+    response = asyncio.run(scrape())
+    assert response.startswith('HTTP/1.0 200 OK')
+    assert 'wellness_tool_calls_total{status="ok",tool="list_at_risk_users"} 1' in response
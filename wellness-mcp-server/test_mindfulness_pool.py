@@ -0,0 +1,72 @@
+"""Tests for pre-generated mindfulness content"""
+
+import asyncio
+
+from mindfulness_pool import MindfulnessPrefetcher, content_key, emotion_bucket, session_key
+
+
+def test_emotion_buckets():
+    assert emotion_bucket({'joy': 0.2, 'fear': 0.7}) == 'stressed'
+    assert emotion_bucket({'sadness': 0.6, 'joy': 0.1}) == 'low'
+    assert emotion_bucket({'calmness': 0.9}) == 'positive'
+    assert emotion_bucket({'stress': 'high'}) == 'stressed'
+    assert emotion_bucket({'stress': 'low', 'gratitude': 'high'}) == 'positive'
+    assert emotion_bucket({'confusion': 0.9}) == 'neutral'
+    assert emotion_bucket(None) == 'neutral'
+
+
+def test_session_rows_map_to_content_keys():
+    row = {'exercise_type': 'Breathing ', 'duration_seconds': 600, 'emotional_impact': '{"fear": 0.8}'}
+    assert session_key(row) == ('breathing', 10, 'stressed')
+    assert session_key({'exercise_type': None}) is None
+    assert content_key('breathing', 10, {'fear': 0.8}) == ('breathing', 10, 'stressed')
+
+
+def make_prefetcher(history=None, idle=lambda: True, **options):
+    generated = []
+
+    async def generate(key, variant):
+        generated.append((key, variant))
+        return f"{key[0]} exercise #{variant}"
+
+    async def load_history(user_id):
+        return history.get(user_id, []) if history else []
+
+    return MindfulnessPrefetcher(generate, load_history, is_idle=idle, **options), generated
+
+
+def test_common_requests_learned_from_history_are_pregenerated_and_rotated():
+    key = ('breathing', 10, 'stressed')
+    rows = [{'exercise_type': 'breathing', 'duration_seconds': 600, 'emotional_impact': '{"fear": 0.8}'}] * 3
+    prefetcher, generated = make_prefetcher({'alice': rows}, variants=2, max_serves=2)
+
+    async def run():
+        # First request misses but registers alice and loads her history
+        assert prefetcher.take('alice', key) is None
+        await asyncio.sleep(0)
+        assert await prefetcher.refill() == 2
+        return [prefetcher.take('alice', key) for _ in range(5)]
+
+    served = asyncio.run(run())
+    assert generated == [(key, 0), (key, 1)]
+    # Variants alternate and each is retired after two serves
+    assert served == ['breathing exercise #0', 'breathing exercise #1',
+                      'breathing exercise #0', 'breathing exercise #1', None]
+    assert prefetcher.stats['retired'] == 2
+
+
+def test_rare_requests_are_not_pregenerated_and_busy_servers_wait():
+    busy = [True]
+    prefetcher, generated = make_prefetcher(idle=lambda: not busy[0], min_uses=2)
+
+    async def run():
+        prefetcher.take('bob', ('meditation', 5, 'low'))
+        prefetcher.take('bob', ('body_scan', 15, 'neutral'))
+        prefetcher.take('bob', ('body_scan', 15, 'neutral'))
+        await asyncio.sleep(0)
+        assert await prefetcher.refill() == 0
+        busy[0] = False
+        return await prefetcher.refill()
+
+    assert asyncio.run(run()) == 3
+    assert {key for key, _ in generated} == {('body_scan', 15, 'neutral')}
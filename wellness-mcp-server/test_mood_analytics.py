@@ -0,0 +1,68 @@
+"""Tests for the vectorized mood-trend features"""
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from mood_analytics import assess_mood_risk, compute_mood_features
+
+DAY = 86400
+# A Monday at 00:00 UTC
+MONDAY = 1_704_672_000
+
+
+def features_for(scores_by_day, per_day=1, **kwargs):
+    timestamps, scores = [], []
+    for day, score in enumerate(scores_by_day):
+        for i in range(per_day):
+            timestamps.append(MONDAY + day * DAY + 3600 * (i + 1))
+            scores.append(score)
+    kwargs.setdefault('utc_offset_seconds', 0)
+    kwargs.setdefault('now', timestamps[-1] + 3600)
+    return compute_mood_features(timestamps, scores, **kwargs)
+
+
+def test_empty_history_has_no_features():
+    assert compute_mood_features([], []) == {'entry_count': 0}
+    assert assess_mood_risk({'entry_count': 0}) == "LOW"
+
+
+def test_declining_mood_has_negative_trend_and_low_streak():
+    features = features_for([8, 7, 6, 5, 2, 1, 2])
+
+    assert features['entry_count'] == 7
+    assert features['days_covered'] == 7
+    assert features['trend_per_day'] == pytest.approx(-34 / 28, abs=1e-3)
+    assert features['low_mood_count'] == 3
+    assert features['longest_low_streak'] == 3
+    assert features['current_low_streak'] == 3
+    assert features['latest'] == 2
+    assert features['hours_since_last_entry'] == 1.0
+    assert assess_mood_risk(features) == "MEDIUM"
+
+
+def test_rolling_mean_and_weekday_buckets():
+    features = features_for([6, 4, 2, 8], per_day=2)
+
+    assert features['rolling_mean_3d'] == [6.0, 5.0, 4.0, 4.67]
+    assert features['weekday_means'] == {'mon': 6.0, 'tue': 4.0, 'wed': 2.0, 'thu': 8.0}
+    assert features['lowest_daily_mean'] == 2.0
+    assert features['days_with_entries'] == 4
+
+
+def test_gaps_are_reported_as_missing_days():
+    timestamps = [MONDAY, MONDAY + 3 * DAY]
+    features = compute_mood_features(timestamps, [5, 7], now=MONDAY + 3 * DAY, utc_offset_seconds=0,
+                                     rolling_days=1)
+
+    assert features['days_covered'] == 4
+    assert features['rolling_mean_1d'] == [5.0, None, None, 7.0]
+    assert features['mean_abs_change'] == 2.0
+
+
+def test_broken_low_streak_is_not_current():
+    features = features_for([1, 2, 6, 1])
+
+    assert features['longest_low_streak'] == 2
+    assert features['current_low_streak'] == 1
+    assert features['volatility'] == pytest.approx(np.std([1, 2, 6, 1]), abs=0.01)
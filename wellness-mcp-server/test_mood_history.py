@@ -0,0 +1,79 @@
+"""Tests for the time-indexed mood history store"""
+
+import time
+from datetime import datetime, timedelta
+
+from mood_history import MoodHistoryStore
+
+
+def test_entries_since_returns_only_the_requested_window():
+    store = MoodHistoryStore(retention_days=None)
+    now = time.time()
+    for days_ago in (10, 6, 3, 0):
+        store.append('alice', 5 - days_ago % 3, f'{days_ago} days ago', now - days_ago * 86400)
+    store.append('bob', 9, 'other user', now)
+
+    recent = store.entries_since('alice', 7, now=now)
+    assert [record.text_description for record in recent] == ['6 days ago', '3 days ago', '0 days ago']
+    assert store.entries_since('carol', 7) == []
+
+
+def test_out_of_order_appends_stay_sorted():
+    store = MoodHistoryStore(retention_days=None)
+    base = datetime(2024, 1, 10, 12, 0)
+    store.append('alice', 5, 'b', base.isoformat())
+    store.append('alice', 3, 'a', (base - timedelta(days=1)).isoformat())
+    store.append('alice', 7, 'c', base + timedelta(hours=1))
+
+    records = store.entries_between('alice', 0, time.time())
+    assert [record.text_description for record in records] == ['a', 'b', 'c']
+    assert store.latest('alice').mood_score == 7
+    assert records[0].to_dict('alice')['timestamp'] == (base - timedelta(days=1)).isoformat()
+
+
+def test_retention_and_per_user_bounds():
+    store = MoodHistoryStore(retention_days=30, max_entries_per_user=3)
+    now = time.time()
+    store.append('alice', 2, 'too old', now - 31 * 86400)
+    for i in range(5):
+        store.append('alice', i + 1, str(i), now - (5 - i))
+
+    assert store.entry_count('alice') == 3
+    assert [record.text_description for record in store.entries_since('alice', 60)] == ['2', '3', '4']
+
+
+def test_least_recently_written_users_are_evicted():
+    store = MoodHistoryStore(max_users=2)
+    store.append('alice', 5)
+    store.append('bob', 5)
+    store.append('alice', 6)
+    store.append('carol', 7)
+
+    assert 'bob' not in store
+    assert 'alice' in store and 'carol' in store
+    assert len(store) == 2
+
+
+def test_window_returns_typed_array_slices():
+    store = MoodHistoryStore(retention_days=None)
+    for offset, score in enumerate((4, 2, 8)):
+        store.append('alice', score, '', 1_000_000 + offset * 60)
+
+    timestamps, scores = store.window('alice', 1_000_060, 1_000_200)
+    assert list(timestamps) == [1_000_060, 1_000_120]
+    assert list(scores) == [2, 8]
+    assert timestamps.typecode == 'q' and scores.typecode == 'b'
+    assert list(store.window('bob', 0, 2_000_000)[0]) == []
+
+
+def test_high_risk_flags_follow_their_entries():
+    store = MoodHistoryStore(retention_days=None, max_entries_per_user=3)
+    store.append('alice', 5, 'fine', 100)
+    store.append('alice', 2, 'flagged', 300, high_risk=True)
+    store.append('alice', 4, 'late arrival', 200)
+    store.append('alice', 6, 'newest', 400)
+
+    assert [record.high_risk for record in store.entries_between('alice', 0, 1000)] == [False, True, False]
+    assert store.flagged_count('alice', 0, 1000) == 1
+    assert store.flagged_count('alice', 350, 1000) == 0
+    assert store.flagged_count('bob', 0, 1000) == 0
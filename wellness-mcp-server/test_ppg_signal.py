@@ -0,0 +1,98 @@
+"""Tests and synthetic-signal benchmarks for the PPG pipeline
+
+Run with ``-s`` to see the measured timings. The budget can be relaxed per
+machine through WELLNESS_PPG_BUDGET_MS.
+"""
+
+import os
+import time
+
+import pytest
+
+np = pytest.importorskip('numpy')
+
+from ppg_signal import PPGSignalError, analyze_ppg, analyze_ppg_payload, hrv_stress_score
+
+
+def synthetic_ppg(heart_rate=72.0, rr_jitter_ms=0.0, seconds=60.0, sampling_rate=100.0, noise=0.05,
+                  drift=0.5, seed=0):
+    """A pulse train with a dicrotic notch, baseline wander and sensor noise
+
+    Beat intervals alternate by ``rr_jitter_ms`` so the expected RMSSD is
+    ``2 * rr_jitter_ms`` and SDNN is about ``rr_jitter_ms``.
+    """
+    rng = np.random.default_rng(seed)
+    mean_rr = 60.0 / heart_rate
+    beats, t, sign = [], 0.5, 1
+    while t < seconds:
+        beats.append(t)
+        t += mean_rr + sign * rr_jitter_ms / 1000
+        sign = -sign
+
+    times = np.arange(int(seconds * sampling_rate)) / sampling_rate
+    signal = np.zeros_like(times)
+    for beat in beats:
+        phase = times - beat
+        signal += np.exp(-(phase / 0.08) ** 2) + 0.4 * np.exp(-((phase - 0.3) / 0.1) ** 2)
+    signal += drift * np.sin(2 * np.pi * 0.1 * times)
+    signal += noise * rng.standard_normal(times.size)
+    return signal, np.diff(beats)
+
+
+def test_recovers_heart_rate_and_hrv_from_a_noisy_signal():
+    signal, rr = synthetic_ppg(heart_rate=75, rr_jitter_ms=20)
+    features = analyze_ppg(signal, 100)
+
+    assert features['heart_rate_bpm'] == pytest.approx(75, abs=1)
+    assert features['rmssd_ms'] == pytest.approx(40, abs=8)
+    assert features['sdnn_ms'] == pytest.approx(float(np.std(rr * 1000, ddof=1)), abs=5)
+    assert features['signal_quality'] > 0.95
+    assert features['duration_seconds'] == 60.0
+
+
+def test_low_hrv_and_fast_heart_rate_score_as_stress():
+    relaxed = analyze_ppg(synthetic_ppg(heart_rate=62, rr_jitter_ms=35)[0], 100)
+    stressed = analyze_ppg(synthetic_ppg(heart_rate=110, rr_jitter_ms=4)[0], 100)
+
+    assert hrv_stress_score(relaxed) < 0.2
+    assert hrv_stress_score(stressed) > 0.8
+    assert hrv_stress_score({'heart_rate_bpm': None, 'rmssd_ms': None}) is None
+
+
+def test_pure_noise_reports_no_heart_rate():
+    noise = np.random.default_rng(1).standard_normal(6000)
+    features = analyze_ppg(noise, 100)
+
+    assert features['heart_rate_bpm'] is None
+    assert features['signal_quality'] < 0.9
+
+
+def test_rejects_malformed_payloads():
+    assert analyze_ppg_payload({'bpm': 80}) is None
+    assert analyze_ppg_payload(None) is None
+    with pytest.raises(PPGSignalError, match='sampling_rate'):
+        analyze_ppg_payload({'samples': [1, 2, 3]})
+    with pytest.raises(PPGSignalError, match='too short'):
+        analyze_ppg([0.0] * 100, 100)
+    with pytest.raises(PPGSignalError, match='Sampling rate'):
+        analyze_ppg([0.0] * 100, 1)
+    with pytest.raises(PPGSignalError, match='numbers'):
+        analyze_ppg(['a'] * 2000, 100)
+
+
+@pytest.mark.parametrize('minutes,sampling_rate', [(5, 100), (10, 256)])
+def test_benchmark_multi_minute_recordings(minutes, sampling_rate):
+    signal, _ = synthetic_ppg(heart_rate=80, rr_jitter_ms=15, seconds=minutes * 60, sampling_rate=sampling_rate)
+    samples = signal.tolist()
+    analyze_ppg(samples, sampling_rate)
+
+    runs = []
+    for _ in range(5):
+        started = time.perf_counter()
+        features = analyze_ppg(samples, sampling_rate)
+        runs.append((time.perf_counter() - started) * 1000)
+
+    best = min(runs)
+    print(f"\n{minutes} min @ {sampling_rate} Hz ({len(samples)} samples): best {best:.1f}ms")
+    assert features['heart_rate_bpm'] == pytest.approx(80, abs=1)
+    assert best < float(os.getenv('WELLNESS_PPG_BUDGET_MS', '100'))
@@ -0,0 +1,83 @@
+"""Tests for per-call profiling"""
+
+import asyncio
+import pstats
+
+from profiling import CallProfiler
+
+
+def busy_child(n):
+    return sum(i * i for i in range(n))
+
+
+def busy_bystander(n):
+    return sum(i * i for i in range(n))
+
+
+async def handler():
+    await asyncio.sleep(0)
+    # Fan-out tasks started by the profiled call are included
+    results = await asyncio.gather(*(asyncio.to_thread(len, 'x'), child()))
+    return results[1]
+
+
+async def child():
+    await asyncio.sleep(0.01)
+    return busy_child(10000)
+
+
+async def bystander():
+    for _ in range(5):
+        busy_bystander(10000)
+        await asyncio.sleep(0.002)
+
+
+def test_nothing_is_profiled_until_armed(tmp_path):
+    profiler = CallProfiler(str(tmp_path / 'profiles'))
+    assert not profiler.claim('mood_check_in')
+
+    profiler.profile_next(2, tools=['mood_check_in'])
+    assert not profiler.claim('stress_monitoring')
+    assert profiler.claim('mood_check_in')
+    assert profiler.claim('mood_check_in')
+    assert not profiler.claim('mood_check_in')
+
+    profiler.profile_next(-1)
+    assert all(profiler.claim('stress_monitoring') for _ in range(5))
+    assert profiler.remaining == -1
+
+
+def test_profile_covers_the_call_and_its_tasks_but_not_other_calls(tmp_path):
+    profiler = CallProfiler(str(tmp_path / 'profiles'), remaining=1)
+
+    async def run():
+        loop = asyncio.get_running_loop()
+        factory = loop.get_task_factory()
+        result, _ = await asyncio.gather(profiler.run('mood_check_in', handler()), bystander())
+        assert loop.get_task_factory() is factory
+        return result
+
+    assert asyncio.run(run()) == busy_child(10000)
+    assert len(profiler.reports) == 1
+
+    report = profiler.reports[0]
+    assert report.endswith('-mood_check_in.txt')
+    text = open(report).read()
+    assert 'Tool: mood_check_in' in text
+    assert 'Status: ok' in text
+
+    functions = {name for _, _, name in pstats.Stats(report[:-4] + '.prof').stats}
+    assert 'busy_child' in functions
+    assert 'busy_bystander' not in functions
+
+
+def test_tracemalloc_snapshots_are_optional(tmp_path):
+    profiler = CallProfiler(str(tmp_path), remaining=1, tracemalloc_frames=5)
+
+    async def allocate():
+        return [bytes(1000) for _ in range(1000)]
+
+    asyncio.run(profiler.run('set_wellness_goal', allocate()))
+    text = open(profiler.reports[0]).read()
+    assert 'Allocations during the call' in text
+    assert 'test_profiling.py' in text
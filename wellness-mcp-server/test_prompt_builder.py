@@ -0,0 +1,41 @@
+"""Tests for prompt compaction and token budgeting"""
+
+from prompt_builder import compact_json, estimate_tokens, fit_prompt, top_scores, truncate_to_tokens
+
+
+def test_estimate_tokens_counts_utf8_bytes():
+    assert estimate_tokens('') == 0
+    assert estimate_tokens('abcd') == 1
+    assert estimate_tokens('abcde') == 2
+    assert estimate_tokens('😊') == 1
+
+
+def test_compact_json_rounds_and_drops_whitespace():
+    assert compact_json({'b': [0.123456, 2], 'a': {'joy': 0.98765}}) == '{"a":{"joy":0.99},"b":[0.12,2]}'
+
+
+def test_top_scores_keeps_the_strongest():
+    scores = {f"emotion_{i}": i / 100 for i in range(48)}
+    top = top_scores(scores, limit=3)
+    assert list(top) == ['emotion_47', 'emotion_46', 'emotion_45']
+
+
+def test_truncate_to_tokens_cuts_at_a_word_boundary():
+    text = ' '.join(['worried'] * 100)
+    cut = truncate_to_tokens(text, 10)
+    assert estimate_tokens(cut) <= 10
+    assert cut.endswith('worried…')
+    assert truncate_to_tokens('short', 10) == 'short'
+
+
+def test_fit_prompt_shrinks_long_fields_and_keeps_short_ones():
+    template = "Mood Score: {score}/10\nDescription: {description}\nGoal: {goal}"
+    prompt = fit_prompt(template, 60, score=3, description='tired ' * 500, goal='sleep more ' * 100)
+
+    assert estimate_tokens(prompt) <= 60
+    assert 'Mood Score: 3/10' in prompt
+    assert prompt.count('…') == 2
+
+    assert fit_prompt(template, None, score=3, description='x' * 1000, goal='g').count('x') == 1000
+    assert fit_prompt(template, 60, score=3, description='fine', goal='rest') == \
+        "Mood Score: 3/10\nDescription: fine\nGoal: rest"
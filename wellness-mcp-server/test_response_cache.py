@@ -0,0 +1,103 @@
+"""Tests for the Gemini response cache"""
+
+import asyncio
+import threading
+from unittest import mock
+
+from response_cache import ResponseCache
+
+PROMPT = """Create a personalized mindfulness exercise:
+
+Exercise Type: breathing
+Duration: 5 minutes"""
+
+
+def test_hit_after_put_ignores_whitespace_differences():
+    cache = ResponseCache()
+    assert cache.get('provide_mindfulness', 'model-a', PROMPT) is None
+    cache.put('provide_mindfulness', 'model-a', PROMPT, 'Breathe in...')
+
+    assert cache.get('provide_mindfulness', 'model-a', PROMPT.replace('\n\n', '\n') + '  ') == 'Breathe in...'
+    assert cache.get('provide_mindfulness', 'model-b', PROMPT) is None
+    assert cache.stats['hits'] == 1
+    assert cache.stats['misses'] == 2
+
+
+def test_per_tool_ttl_expiry_and_disabled_tools():
+    cache = ResponseCache(default_ttl=100, tool_ttls={'crisis_support_check': 0, 'mood_check_in': 10})
+    cache.put('crisis_support_check', 'm', 'p', 'never cached')
+    assert cache.get('crisis_support_check', 'm', 'p') is None
+
+    with mock.patch('response_cache.time.time', return_value=1000.0):
+        cache.put('mood_check_in', 'm', 'p', 'short lived')
+    with mock.patch('response_cache.time.time', return_value=1005.0):
+        assert cache.get('mood_check_in', 'm', 'p') == 'short lived'
+    with mock.patch('response_cache.time.time', return_value=1011.0):
+        assert cache.get('mood_check_in', 'm', 'p') is None
+
+
+def test_lru_eviction():
+    cache = ResponseCache(max_entries=2)
+    cache.put('t', 'm', 'a', 'A')
+    cache.put('t', 'm', 'b', 'B')
+    cache.get('t', 'm', 'a')
+    cache.put('t', 'm', 'c', 'C')
+
+    assert cache.get('t', 'm', 'b') is None
+    assert cache.get('t', 'm', 'a') == 'A'
+    assert cache.stats['evictions'] == 1
+    assert len(cache) == 2
+
+
+def test_disk_tier_survives_restart(tmp_path):
+    first = ResponseCache(persist_dir=str(tmp_path))
+    first.put('provide_mindfulness', 'm', PROMPT, 'persisted')
+
+    second = ResponseCache(persist_dir=str(tmp_path))
+    assert second.get('provide_mindfulness', 'm', PROMPT) == 'persisted'
+    assert second.stats['disk_hits'] == 1
+    assert second.get('provide_mindfulness', 'm', PROMPT) == 'persisted'
+    assert second.stats['disk_hits'] == 1
+
+
+def test_expired_disk_entries_are_deleted_on_read(tmp_path):
+    cache = ResponseCache(default_ttl=10, persist_dir=str(tmp_path))
+    with mock.patch('response_cache.time.time', return_value=1000.0):
+        cache.put('t', 'm', 'p', 'stale soon')
+    assert len(list(tmp_path.glob('*.json'))) == 1
+
+    restarted = ResponseCache(default_ttl=10, persist_dir=str(tmp_path))
+    with mock.patch('response_cache.time.time', return_value=1011.0):
+        assert restarted.get('t', 'm', 'p') is None
+    assert list(tmp_path.glob('*.json')) == []
+
+
+def test_disk_tier_is_bounded(tmp_path):
+    cache = ResponseCache(persist_dir=str(tmp_path), max_disk_entries=10)
+    for i in range(25):
+        cache.put('t', 'm', f"prompt {i}", f"text {i}")
+
+    assert len(list(tmp_path.glob('*.json'))) <= 10
+    assert cache.stats['disk_evictions'] >= 15
+
+
+def test_async_access_does_disk_io_off_the_loop(tmp_path):
+    threads = []
+
+    class RecordingCache(ResponseCache):
+        def _load_disk(self, key):
+            threads.append(threading.get_ident())
+            return super()._load_disk(key)
+
+        def _write_disk(self, key, entry):
+            threads.append(threading.get_ident())
+            super()._write_disk(key, entry)
+
+    async def run():
+        await RecordingCache(persist_dir=str(tmp_path)).put_async('provide_mindfulness', 'm', PROMPT, 'persisted')
+        second = RecordingCache(persist_dir=str(tmp_path))
+        return await second.get_async('provide_mindfulness', 'm', PROMPT), second.stats['disk_hits']
+
+    assert asyncio.run(run()) == ('persisted', 1)
+    assert len(threads) == 2
+    assert threading.get_ident() not in threads
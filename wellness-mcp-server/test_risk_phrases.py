@@ -0,0 +1,37 @@
+"""Tests for the high-risk phrase matcher"""
+
+import pytest
+
+from risk_phrases import HIGH_RISK_PHRASES, RiskPhraseMatcher
+
+
+def test_matches_case_and_whitespace_variants():
+    matcher = RiskPhraseMatcher()
+
+    assert matcher.find("I just want to END   it\nALL. Everything feels Hopeless") == ['end it all', 'hopeless']
+    assert matcher.search("thinking about suicide")
+    assert matcher.find("no point, no point at all") == ['no point']
+
+
+def test_only_whole_words_match():
+    matcher = RiskPhraseMatcher()
+
+    assert not matcher.search("hopelessly devoted to my new hobby")
+    assert not matcher.search("never give upgrades a second thought")
+    assert not matcher.search("")
+    assert matcher.find(None) == []
+
+
+def test_custom_phrases_are_normalized_and_longest_first():
+    matcher = RiskPhraseMatcher(['Give  Up', 'give up on life', ' '])
+
+    assert matcher.phrases == ('give up on life', 'give up')
+    assert matcher.find("I want to give up on life") == ['give up on life']
+    with pytest.raises(ValueError):
+        RiskPhraseMatcher([])
+
+
+def test_every_default_phrase_is_detected():
+    matcher = RiskPhraseMatcher()
+    for phrase in HIGH_RISK_PHRASES:
+        assert matcher.find(f"lately {phrase.upper()} keeps coming up") == [phrase]
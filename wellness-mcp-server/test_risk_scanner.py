@@ -0,0 +1,95 @@
+"""Tests for the background crisis-risk scanner"""
+
+import asyncio
+
+import pytest
+
+pytest.importorskip('numpy')
+
+from mood_history import MoodHistoryStore  # noqa: E402
+from risk_scanner import CrisisRiskScanner  # noqa: E402
+
+NOW = 1_704_672_000
+
+
+def record(history, user_id, scores, flags=None):
+    flags = flags or [False] * len(scores)
+    for offset, (score, flag) in enumerate(zip(scores, flags)):
+        history.append(user_id, score, '', NOW - (len(scores) - offset) * 3600, high_risk=flag)
+
+
+def test_only_dirty_users_are_rescored_and_ranked():
+    history = MoodHistoryStore(retention_days=None)
+    scanner = CrisisRiskScanner(history)
+    record(history, 'steady', [7, 8, 7])
+    record(history, 'low', [2, 1, 2, 2])
+    record(history, 'lower', [1, 1, 1, 1, 1])
+    record(history, 'words', [6], [True])
+    for user_id in ('steady', 'low', 'lower', 'words'):
+        scanner.mark_dirty(user_id)
+
+    assert asyncio.run(scanner.scan(now=NOW)) == 4
+    ranked = scanner.at_risk(now=NOW)
+    assert [(risk.user_id, risk.level) for risk in ranked] == [
+        ('words', 'HIGH'), ('lower', 'MEDIUM'), ('low', 'MEDIUM')
+    ]
+    assert [risk.user_id for risk in scanner.at_risk(min_level='HIGH', now=NOW)] == ['words']
+    assert scanner.get('steady') is None
+
+    # Nothing new: the next pass does no work
+    assert asyncio.run(scanner.scan(now=NOW)) == 0
+
+
+def test_recovering_user_drops_off_the_list():
+    history = MoodHistoryStore(retention_days=None)
+    scanner = CrisisRiskScanner(history)
+    record(history, 'alice', [2, 2, 1])
+    scanner.mark_dirty('alice')
+    asyncio.run(scanner.scan(now=NOW))
+    assert scanner.get('alice').level == 'MEDIUM'
+
+    history.evict('alice')
+    record(history, 'alice', [8, 9])
+    scanner.mark_dirty('alice')
+    asyncio.run(scanner.scan(now=NOW))
+    assert scanner.at_risk(now=NOW) == []
+
+
+def test_users_whose_entries_aged_out_are_not_listed():
+    history = MoodHistoryStore(retention_days=None)
+    scanner = CrisisRiskScanner(history, window_days=7)
+    record(history, 'alice', [1, 1, 1])
+    scanner.mark_dirty('alice')
+    asyncio.run(scanner.scan(now=NOW))
+
+    assert scanner.at_risk(now=NOW + 8 * 86400) == []
+
+
+def test_superseded_heap_entries_are_compacted():
+    history = MoodHistoryStore(retention_days=None)
+    scanner = CrisisRiskScanner(history, batch_size=7)
+    record(history, 'alice', [1, 1, 1])
+    for _ in range(200):
+        scanner.mark_dirty('alice')
+        asyncio.run(scanner.scan(now=NOW))
+
+    assert len(scanner._heap) <= 2 * len(scanner._current) + 64
+    assert [risk.user_id for risk in scanner.at_risk(now=NOW)] == ['alice']
+
+
+def test_assessments_are_recomputed_as_entries_age_out():
+    history = MoodHistoryStore(retention_days=None)
+    scanner = CrisisRiskScanner(history, window_days=7)
+    history.append('alice', 3, '', NOW - 6 * 86400, high_risk=True)
+    history.append('alice', 7, '', NOW - 3600)
+    record(history, 'bob', [1, 1, 1])
+    scanner.mark_dirty('alice')
+    scanner.mark_dirty('bob')
+    asyncio.run(scanner.scan(now=NOW))
+    assert [risk.user_id for risk in scanner.at_risk(now=NOW)] == ['alice', 'bob']
+
+    # Two days on, alice's flagged entry has left the window; her recent one has not
+    later = NOW + 2 * 86400
+    assert [risk.user_id for risk in scanner.at_risk(now=later)] == ['bob']
+    assert scanner.get('alice') is None
+    assert scanner.get('bob').scanned_at == NOW
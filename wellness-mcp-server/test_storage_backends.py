@@ -0,0 +1,83 @@
+"""Contract tests shared by the in-memory and SQLite storage backends"""
+
+import asyncio
+from datetime import datetime, timedelta
+
+import pytest
+
+from local_store import LocalWellnessStore
+from storage_backends import InMemoryBackend, SQLiteBackend
+
+
+@pytest.fixture(params=['memory', 'sqlite'])
+def backend(request, tmp_path):
+    if request.param == 'memory':
+        return InMemoryBackend()
+    return SQLiteBackend(LocalWellnessStore(str(tmp_path / 'wellness.db')))
+
+
+def test_bulk_write_and_range_read_for_every_table(backend):
+    base = datetime(2024, 3, 1, 9, 0)
+
+    async def run():
+        await backend.save_mood_entries([
+            {'user_id': 'alice', 'timestamp': (base + timedelta(days=day)).isoformat(), 'mood_score': day}
+            for day in (4, 1, 3, 2)
+        ] + [{'user_id': 'bob', 'timestamp': base.isoformat(), 'mood_score': 9}])
+        await backend.save_stress_sessions([{'session_id': 's1', 'user_id': 'alice', 'timestamp': base,
+                                             'stress_level': 6, 'ppg_data': {'bpm': 80}}])
+        await backend.save_wellness_goals([{'goal_id': 'g1', 'user_id': 'alice', 'timestamp': base,
+                                            'goal_type': 'sleep', 'progress_percentage': 0,
+                                            'ai_suggestions': 'not a column'}])
+        await backend.save_mindfulness_sessions([{'session_id': 'm1', 'user_id': 'alice', 'timestamp': base,
+                                                  'exercise_type': 'breathing', 'duration_seconds': 300}])
+
+        moods = await backend.get_mood_entries('alice', start=base + timedelta(days=2), end=base + timedelta(days=3))
+        stress = await backend.get_stress_sessions('alice')
+        goals = await backend.get_wellness_goals('alice')
+        sessions = await backend.get_mindfulness_sessions('alice', end=base)
+        await backend.close()
+        return moods, stress, goals, sessions
+
+    moods, stress, goals, sessions = asyncio.run(run())
+    assert [row['mood_score'] for row in moods] == [2, 3]
+    assert isinstance(moods[0]['timestamp'], datetime)
+    assert stress[0]['ppg_data'] == '{"bpm": 80}'
+    assert goals[0]['progress_percentage'] == 0.0
+    assert 'ai_suggestions' not in goals[0]
+    assert sessions[0]['exercise_type'] == 'breathing'
+
+
+def test_query_limit_and_unknown_user(backend):
+    base = datetime(2024, 3, 1)
+
+    async def run():
+        await backend.save_mood_entries([
+            {'user_id': 'alice', 'timestamp': base + timedelta(hours=hour), 'mood_score': 5} for hour in range(10)
+        ])
+        limited = await backend.query_range('mood_entries', 'alice', limit=3)
+        missing = await backend.query_range('mood_entries', 'nobody')
+        await backend.close()
+        return limited, missing
+
+    limited, missing = asyncio.run(run())
+    assert [row['timestamp'].hour for row in limited] == [0, 1, 2]
+    assert missing == []
+
+
+def test_offset_aware_timestamps_are_stored_as_naive_utc(backend):
+    async def run():
+        await backend.save_mood_entries([
+            {'user_id': 'alice', 'timestamp': '2024-03-01T10:00:00', 'mood_score': 1},
+            {'user_id': 'alice', 'timestamp': '2024-03-01T10:00:00+02:00', 'mood_score': 2},
+            {'user_id': 'alice', 'timestamp': '2024-03-01T09:30:00Z', 'mood_score': 3},
+        ])
+        rows = await backend.get_mood_entries('alice', start=datetime(2024, 3, 1, 8), end=datetime(2024, 3, 1, 9, 45))
+        everything = await backend.get_mood_entries('alice')
+        await backend.close()
+        return rows, everything
+
+    rows, everything = asyncio.run(run())
+    assert [row['mood_score'] for row in rows] == [2, 3]
+    assert [row['mood_score'] for row in everything] == [2, 3, 1]
+    assert all(row['timestamp'].tzinfo is None for row in everything)
@@ -0,0 +1,43 @@
+"""Tests for frame stress scoring and timeline smoothing"""
+
+import pytest
+
+from stress_timeline import combine_stress, frame_stress_score, smooth, stress_level, summarize_frames
+
+
+def test_frame_score_sums_stress_emotions():
+    assert frame_stress_score({'anger': 0.2, 'fear': 0.1, 'joy': 0.9}) == pytest.approx(0.3)
+    assert stress_level(0.34) == 3
+    assert stress_level(1.7) == 10
+    assert stress_level(-0.1) == 0
+
+
+def test_smoothing_weights_the_newest_value_by_alpha():
+    assert smooth([1.0, 0.0, 0.0], alpha=0.5) == [1.0, 0.5, 0.25]
+    assert smooth([0.2, 0.8], alpha=1.0) == [0.2, 0.8]
+    assert smooth([], alpha=0.3) == []
+
+
+def test_summary_builds_a_smoothed_timeline():
+    frames = [
+        {'offset_ms': 0, 'emotions': {'anger': 0.1, 'joy': 0.8}},
+        {'offset_ms': 1000, 'emotions': {'anger': 0.9, 'joy': 0.1}},
+        {'offset_ms': 2000, 'emotions': {'anger': 0.8, 'joy': 0.2}},
+    ]
+    summary = summarize_frames(frames, alpha=0.5)
+
+    assert [point['smoothed_stress'] for point in summary['timeline']] == [0.1, 0.5, 0.65]
+    assert summary['emotions'] == {'anger': 0.6, 'joy': pytest.approx(0.3667, abs=1e-4)}
+    assert summary['dominant_emotion'] == 'anger'
+    assert (summary['mean_stress_level'], summary['peak_stress_level'], summary['final_stress_level']) == (4, 6, 6)
+    assert summarize_frames([])['frame_count'] == 0
+
+
+def test_physiological_score_is_blended_into_every_frame():
+    assert combine_stress(0.5) == 0.5
+    assert combine_stress(0.2, 0.8, weight=0.5) == pytest.approx(0.5)
+
+    frames = [{'offset_ms': 0, 'emotions': {'fear': 0.0}}, {'offset_ms': 1000, 'emotions': {'fear': 0.0}}]
+    summary = summarize_frames(frames, alpha=0.5, physiological=1.0)
+    assert [point['stress'] for point in summary['timeline']] == [0.4, 0.4]
+    assert summary['final_stress_level'] == 4
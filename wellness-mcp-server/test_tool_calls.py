@@ -0,0 +1,110 @@
+"""Tests for concurrent tool-call execution"""
+
+import asyncio
+import time
+
+import pytest
+
+from tool_calls import ToolCallRunner, ToolCallTimeout
+
+
+def test_calls_overlap_up_to_the_concurrency_limit():
+    runner = ToolCallRunner(max_concurrency=3)
+
+    async def slow():
+        await asyncio.sleep(0.05)
+        return 'done'
+
+    async def run():
+        started = time.perf_counter()
+        results = await asyncio.gather(*(runner.run('mood_check_in', slow) for _ in range(6)))
+        return results, time.perf_counter() - started
+
+    results, elapsed = asyncio.run(run())
+    assert results == ['done'] * 6
+    assert runner.stats['max_active'] == 3
+    assert 0.1 <= elapsed < 0.25  # two waves of three
+    assert (runner.active, runner.queued) == (0, 0)
+
+
+def test_per_tool_timeouts():
+    runner = ToolCallRunner(default_timeout=1, tool_timeouts={'crisis_support_check': 0.02, 'unbounded': 0})
+
+    async def hang():
+        await asyncio.sleep(0.1)
+        return 'late'
+
+    with pytest.raises(ToolCallTimeout, match='crisis_support_check timed out after 0.02s'):
+        asyncio.run(runner.run('crisis_support_check', hang))
+    assert asyncio.run(runner.run('unbounded', hang)) == 'late'
+    assert runner.stats['timeouts'] == 1
+
+
+def test_cancelling_one_call_leaves_other_calls_running():
+    runner = ToolCallRunner()
+
+    async def work(seconds):
+        await asyncio.sleep(seconds)
+        return seconds
+
+    async def run():
+        doomed = asyncio.ensure_future(runner.run('provide_mindfulness', lambda: work(1)))
+        survivor = asyncio.ensure_future(runner.run('mood_check_in', lambda: work(0.05)))
+        await asyncio.sleep(0.01)
+        doomed.cancel()
+        return await asyncio.gather(doomed, survivor, return_exceptions=True)
+
+    doomed, survivor = asyncio.run(run())
+    assert isinstance(doomed, asyncio.CancelledError)
+    assert survivor == 0.05
+    assert runner.stats['cancelled'] == 1
+
+
+def test_cancelling_the_caller_cancels_the_call():
+    runner = ToolCallRunner()
+    finished = []
+
+    async def work():
+        await asyncio.sleep(0.2)
+        finished.append(True)
+
+    async def run():
+        caller = asyncio.ensure_future(runner.run('mood_check_in', work))
+        await asyncio.sleep(0.01)
+        caller.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await caller
+        await asyncio.sleep(0.3)
+
+    asyncio.run(run())
+    assert finished == []
+    assert runner.active == 0
+
+
+def test_cancelling_a_queued_call_releases_its_place():
+    runner = ToolCallRunner(max_concurrency=1)
+    started = []
+
+    async def work(name):
+        started.append(name)
+        await asyncio.sleep(0.05)
+        return name
+
+    async def run():
+        blocker = asyncio.ensure_future(runner.run('mood_check_in', lambda: work('blocker')))
+        queued = asyncio.ensure_future(runner.run('provide_mindfulness', lambda: work('queued')))
+        await asyncio.sleep(0.01)
+        assert (runner.active, runner.queued) == (1, 1)
+        # What the MCP SDK does when the client cancels the queued request
+        queued.cancel()
+        results = await asyncio.gather(blocker, queued, return_exceptions=True)
+        after = await runner.run('mood_check_in', lambda: work('after'))
+        return results, after
+
+    (blocker, queued), after = asyncio.run(run())
+    assert blocker == 'blocker'
+    assert isinstance(queued, asyncio.CancelledError)
+    assert after == 'after'
+    assert started == ['blocker', 'after']
+    assert runner.stats['cancelled'] == 1
+    assert (runner.active, runner.queued) == (0, 0)
@@ -0,0 +1,454 @@
+"""Tool-level tests for WellnessMCPServer with a stub Gemini model"""
+
+import asyncio
+import base64
+import time
+from datetime import datetime, timedelta, timezone
+
+import pytest
+
+pytest.importorskip('mcp')
+pytest.importorskip('google.generativeai')
+
+from mcp.types import CallToolRequest, CallToolRequestParams  # noqa: E402
+
+import wellness_mcp_server  # noqa: E402
+from emotion_backends import MockEmotionBackend  # noqa: E402
+from gemini_client import GeminiClient  # noqa: E402
+from wellness_mcp_server import WellnessMCPServer  # noqa: E402
+
+
+class StubResponse:
+    def __init__(self, text):
+        self.text = text
+
+
+class StubModel:
+    def __init__(self):
+        self.prompts = []
+
+    async def generate_content_async(self, prompt, stream=False):
+        self.prompts.append(prompt)
+        return StubResponse("Stub insight")
+
+
+class UnreachableBigQuery:
+    """Stands in for google.cloud.bigquery when no credentials are available"""
+
+    class Client:
+        def __init__(self, project=None):
+            raise ConnectionError("BigQuery unreachable")
+
+
+@pytest.fixture
+def server(monkeypatch, tmp_path):
+    monkeypatch.setattr(wellness_mcp_server, 'load_bigquery', lambda: UnreachableBigQuery)
+    monkeypatch.setenv('WELLNESS_LOCAL_DB', str(tmp_path / 'wellness.db'))
+    monkeypatch.setenv('BIGQUERY_PROJECT_ID', 'test-project')
+    monkeypatch.delenv('WELLNESS_STORAGE_BACKEND', raising=False)
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    monkeypatch.delenv('HUME_API_KEY', raising=False)
+    wellness_server = WellnessMCPServer()
+    wellness_server.gemini_model = StubModel()
+    wellness_server.gemini_client = GeminiClient(wellness_server.gemini_model)
+    return wellness_server
+
+
+def call(server, name, arguments):
+    request = CallToolRequest(method="tools/call", params=CallToolRequestParams(name=name, arguments=arguments))
+    return asyncio.run(server.call_tool(request))[0].text
+
+
+def test_mood_check_in_bulk_validates_and_stores_entries(server):
+    text = call(server, 'mood_check_in_bulk', {
+        'user_id': 'alice',
+        'max_concurrency': 2,
+        'entries': [
+            {'mood_score': 3, 'text_description': 'Rough morning'},
+            {'mood_score': 11},
+            {'mood_score': 6, 'text_description': 'Better', 'analyze': False},
+            {'mood_score': 4, 'timestamp': 'yesterday'},
+        ]
+    })
+
+    assert 'Saved: 2/4' in text
+    assert '#0: saved (analyzed)' in text
+    assert '#1: invalid' in text
+    assert '#2: saved' in text
+    assert '#3: invalid' in text
+    assert len(server.gemini_model.prompts) == 1
+    assert server.mood_history.entry_count('alice') == 2
+
+
+@pytest.fixture
+def non_utc_timezone(monkeypatch):
+    """Run the test as if the host clock were in New York"""
+    if not hasattr(time, 'tzset'):
+        pytest.skip("time.tzset is not available on this platform")
+    monkeypatch.setenv('TZ', 'America/New_York')
+    time.tzset()
+    yield
+    monkeypatch.undo()
+    time.tzset()
+
+
+@pytest.mark.parametrize('backend', ['memory', 'sqlite'])
+def test_mood_check_in_bulk_accepts_mixed_timezone_offsets(monkeypatch, tmp_path, backend, non_utc_timezone):
+    monkeypatch.setenv('WELLNESS_STORAGE_BACKEND', backend)
+    monkeypatch.setenv('WELLNESS_LOCAL_DB', str(tmp_path / 'wellness.db'))
+    monkeypatch.delenv('GEMINI_API_KEY', raising=False)
+    wellness_server = WellnessMCPServer()
+    # Yesterday, so the entries are inside the mood history retention window
+    day = (datetime.now(timezone.utc) - timedelta(days=1)).strftime('%Y-%m-%d')
+
+    request = CallToolRequest(method="tools/call", params=CallToolRequestParams(name='mood_check_in_bulk', arguments={
+        'user_id': 'alice',
+        'analyze': False,
+        'entries': [
+            {'mood_score': 4, 'timestamp': f'{day}T10:00:00'},
+            {'mood_score': 5, 'timestamp': f'{day}T10:00:00+02:00'},
+            {'mood_score': 6, 'timestamp': f'{day}T09:00:00Z'},
+        ]
+    }))
+
+    async def run():
+        text = (await wellness_server.call_tool(request))[0].text
+        rows = await wellness_server.memory_saver.query_range('mood_entries', 'alice')
+        await wellness_server.memory_saver.close()
+        return text, rows
+
+    text, rows = asyncio.run(run())
+    assert 'Saved: 3/3' in text
+    assert [row['mood_score'] for row in rows] == [5, 6, 4]
+    # 09:00Z lands at 09:00 UTC on the timeline, not at 09:00 local time
+    utc_nine = int(datetime.fromisoformat(f'{day}T09:00:00+00:00').timestamp())
+    assert wellness_server.mood_history.window('alice', utc_nine, utc_nine)[1].tolist() == [6]
+
+
+def test_check_ins_stay_on_the_utc_timeline_on_non_utc_hosts(server, non_utc_timezone):
+    now = time.time()
+    call(server, 'mood_check_in', {'user_id': 'alice', 'mood_score': 5})
+    call(server, 'mood_check_in_bulk', {'user_id': 'alice', 'analyze': False, 'entries': [
+        {'mood_score': 2, 'text_description': 'I feel hopeless',
+         'timestamp': datetime.now(timezone.utc).isoformat().replace('+00:00', 'Z')},
+    ]})
+
+    timestamps, _ = server.mood_history.window('alice', now - 7 * 86400, now + 60)
+    assert len(timestamps) == 2
+    assert all(abs(timestamp - now) < 60 for timestamp in timestamps)
+    assert server.mood_history.flagged_count('alice', now - 7 * 86400, now + 60) == 1
+
+
+def test_offline_mood_entries_are_replayed_to_bigquery(server):
+    class FakeBigQueryClient:
+        def __init__(self):
+            self.rows = []
+
+        def insert_rows(self, table_id, rows, selected_fields=None):
+            # Like bigquery.Client, a bare table id needs an explicit schema
+            if selected_fields is None:
+                raise ValueError(f"Could not determine schema for table '{table_id}'")
+            self.rows.extend((table_id, row['mood_score']) for row in rows)
+            return []
+
+    async def run():
+        saver = server.memory_saver
+        assert not await saver.start()
+        await saver.save_mood_entry({'user_id': 'alice', 'mood_score': 3, 'timestamp': '2024-01-01T09:00:00'})
+
+        saver.client = FakeBigQueryClient()
+        saver.bigquery_available = True
+        uploaded = await saver.replay_to_bigquery()
+        again = await saver.replay_to_bigquery()
+        return saver.client.rows, uploaded, again
+
+    rows, uploaded, again = asyncio.run(run())
+    assert rows == [('test-project.wellness_data.mood_entries', 3)]
+    assert (uploaded, again) == (1, 0)
+
+
+def test_goals_and_sessions_are_persisted(server):
+    def request(name, arguments):
+        return CallToolRequest(method="tools/call", params=CallToolRequestParams(name=name, arguments=arguments))
+
+    async def run():
+        saver = server.memory_saver
+        await saver.start()
+        await server.call_tool(request('set_wellness_goal', {
+            'goal_type': 'exercise', 'description': 'Walk daily', 'target_value': {'minutes': 30}, 'user_id': 'alice'
+        }))
+        await server.call_tool(request('provide_mindfulness', {
+            'exercise_type': 'breathing', 'duration_minutes': 5, 'user_id': 'alice'
+        }))
+        return (await saver.query_range('wellness_goals', 'alice'),
+                await saver.query_range('mindfulness_sessions', 'alice'))
+
+    goals, sessions = asyncio.run(run())
+    assert goals[0]['goal_description'] == 'Walk daily'
+    assert goals[0]['target_value'] == '{"minutes": 30}'
+    assert sessions[0]['duration_seconds'] == 300
+
+
+def test_crisis_check_sends_mood_features_instead_of_raw_entries(server):
+    for score, text in ((2, 'private note one'), (1, 'private note two'), (2, 'private note three')):
+        server.mood_history.append('alice', score, text)
+
+    text = call(server, 'crisis_support_check', {'user_id': 'alice'})
+
+    assert 'Risk Level: MEDIUM' in text
+    assert 'Mood Entries Analyzed: 3' in text
+    prompt = server.gemini_model.prompts[-1]
+    assert '"low_mood_count":3' in prompt
+    assert 'private note' not in prompt
+    # A window this small is summarized inline, without starting the process pool
+    assert server.worker_pools.snapshot().get('cpu') is None
+
+
+def test_list_at_risk_users_scans_new_check_ins(server):
+    for score in (2, 1, 2):
+        call(server, 'mood_check_in', {'user_id': 'alice', 'mood_score': score})
+    call(server, 'mood_check_in', {'user_id': 'bob', 'mood_score': 8})
+
+    text = call(server, 'list_at_risk_users', {})
+
+    assert '• alice: MEDIUM (low moods: 3' in text
+    assert 'bob' not in text
+    assert server.risk_scanner.pending == 0
+
+
+def test_high_risk_text_is_flagged_at_ingest(server):
+    text = call(server, 'mood_check_in', {
+        'user_id': 'alice', 'mood_score': 6, 'text_description': 'Honestly it all feels   HOPELESS'
+    })
+
+    assert 'EMERGENCY RESOURCES' in text
+    assert server.mood_history.latest('alice').high_risk
+    assert '• alice: HIGH' in call(server, 'list_at_risk_users', {})
+
+
+def test_high_risk_text_gets_emergency_resources_even_when_the_save_fails(server, monkeypatch):
+    async def failing_save(entries):
+        return False
+
+    monkeypatch.setattr(server.memory_saver, 'save_mood_entries', failing_save)
+
+    text = call(server, 'mood_check_in', {
+        'user_id': 'alice', 'mood_score': 2, 'text_description': 'I feel hopeless'
+    })
+    assert text.index('EMERGENCY RESOURCES') < text.index('Failed to save mood entry')
+    # The resources are not held back for the LLM analysis
+    assert server.gemini_model.prompts == []
+
+    text = call(server, 'mood_check_in_bulk', {
+        'user_id': 'alice', 'entries': [{'mood_score': 2, 'text_description': 'I feel hopeless'}]
+    })
+    assert 'failed to save' in text
+    assert 'EMERGENCY RESOURCES' in text
+
+
+def test_stress_monitoring_decodes_data_urls_and_rejects_oversized_frames(server):
+    server.emotion_analyzer = MockEmotionBackend()
+    server.image_decoder.max_bytes = 64
+
+    text = call(server, 'stress_monitoring', {'image_data': 'data:image/jpeg;base64,' + 'A' * 80, 'user_id': 'alice'})
+    assert 'Stress Level:' in text
+
+    text = call(server, 'stress_monitoring', {'image_data': 'A' * 400, 'user_id': 'alice'})
+    assert text.startswith('❌ Invalid image: Image too large')
+
+
+def test_stress_session_aggregates_frames_with_bounded_concurrency(server):
+    class FrameAnalyzer:
+        def __init__(self):
+            self.active = 0
+            self.peak = 0
+
+        async def analyze_facial_emotions(self, image_data):
+            self.active += 1
+            self.peak = max(self.peak, self.active)
+            await asyncio.sleep(0.01)
+            self.active -= 1
+            level = bytes(image_data)[0] / 10
+            return {'success': True, 'emotions': {'fear': level, 'joy': 1 - level}}
+
+    server.emotion_analyzer = FrameAnalyzer()
+    frames = [{'image_data': base64.b64encode(bytes([level])).decode()} for level in (2, 2, 8, 8)]
+    frames.append({'image_data': '!!'})
+
+    async def run():
+        await server.memory_saver.start()
+        request = CallToolRequest(method="tools/call", params=CallToolRequestParams(
+            name='stress_monitoring_session',
+            arguments={'frames': frames, 'smoothing': 0.5, 'max_concurrency': 2, 'user_id': 'alice'}))
+        text = (await server.call_tool(request))[0].text
+        return text, await server.memory_saver.query_range('stress_sessions', 'alice')
+
+    text, sessions = asyncio.run(run())
+    assert 'Frames Analyzed: 4/5' in text
+    assert '2 → 2 → 5 → 6' in text
+    assert '#4: Invalid base64' in text
+    assert server.emotion_analyzer.peak == 2
+    assert sessions[0]['stress_level'] == 6
+
+
+
+def test_stress_session_reports_a_bad_offset_as_a_frame_failure(server):
+    class FrameAnalyzer:
+        async def analyze_facial_emotions(self, image_data):
+            return {'success': True, 'emotions': {'fear': 0.2, 'joy': 0.8}}
+
+    server.emotion_analyzer = FrameAnalyzer()
+    image = base64.b64encode(b'frame').decode()
+    text = call(server, 'stress_monitoring_session', {'frames': [
+        {'image_data': image, 'offset_ms': 0},
+        {'image_data': image, 'offset_ms': 'soon'},
+        {'image_data': image, 'offset_ms': 2000},
+    ]})
+
+    assert 'Frames Analyzed: 2/3' in text
+    assert "#1: invalid literal for int()" in text
+
+def test_stress_monitoring_blends_hrv_from_raw_ppg(server):
+    np = pytest.importorskip('numpy')
+
+    class CalmFace:
+        async def analyze_facial_emotions(self, image_data):
+            return {'success': True, 'emotions': {'joy': 0.9, 'fear': 0.1}, 'dominant_emotion': 'joy'}
+
+    # A 60 s pulse at 110 bpm with almost no beat-to-beat variability
+    times = np.arange(6000) / 100
+    phase = (times % (60 / 110)) - 0.2
+    samples = np.exp(-(phase / 0.08) ** 2).round(4).tolist()
+
+    server.emotion_analyzer = CalmFace()
+    frame = base64.b64encode(b'frame').decode()
+    calm = call(server, 'stress_monitoring', {'image_data': frame, 'user_id': 'alice'})
+    text = call(server, 'stress_monitoring', {'image_data': frame, 'user_id': 'alice',
+                                              'ppg_data': {'samples': samples, 'sampling_rate': 100}})
+
+    assert 'Stress Level: 1/10' in calm
+    assert 'Stress Level: 4/10' in text
+    assert 'Heart Rate: 110' in text
+    assert 'PPG data ignored: PPG recording too short' in call(server, 'stress_monitoring', {
+        'image_data': frame, 'ppg_data': {'samples': [0.1, 0.2], 'sampling_rate': 100}})
+
+
+def test_server_metrics_record_tool_latency_spans_and_errors(server):
+    import json
+
+    server.emotion_analyzer = MockEmotionBackend()
+    call(server, 'set_wellness_goal', {'goal_type': 'sleep', 'description': 'Bed by 11', 'user_id': 'alice'})
+    call(server, 'stress_monitoring', {'image_data': '!!', 'user_id': 'alice'})
+    call(server, 'no_such_tool', {})
+
+    snapshot = json.loads(call(server, 'get_server_metrics', {}))
+    durations = snapshot['histograms']['tool_duration_seconds']
+    assert durations['tool=set_wellness_goal']['count'] == 1
+    spans = snapshot['histograms']['span_duration_seconds']
+    assert spans['span=gemini,tool=set_wellness_goal']['count'] == 1
+    assert spans['span=storage,tool=set_wellness_goal']['count'] == 1
+    assert snapshot['counters']['tool_calls'] == {
+        'status=ok,tool=set_wellness_goal': 1,
+        'status=error,tool=stress_monitoring': 1,
+        'status=error,tool=no_such_tool': 1,
+    }
+    assert snapshot['gauges']['queue_depth']['queue=tool_calls'] == 0
+    assert 'cache=gemini' in snapshot['gauges']['cache_hit_ratio']
+
+    text = call(server, 'get_server_metrics', {'format': 'prometheus'})
+    assert 'wellness_tool_calls_total{status="ok",tool="set_wellness_goal"} 1' in text
+
+
+def test_a_cancelled_tool_call_is_recorded_as_cancelled(server):
+    import json
+
+    class SlowModel(StubModel):
+        async def generate_content_async(self, prompt, stream=False):
+            await asyncio.sleep(5)
+            return StubResponse("too late")
+
+    server.gemini_client = GeminiClient(SlowModel())
+    request = CallToolRequest(method="tools/call", params=CallToolRequestParams(
+        name='set_wellness_goal', arguments={'goal_type': 'sleep', 'description': 'Bed by 11', 'user_id': 'alice'}))
+
+    async def run():
+        # The MCP SDK cancels the request's task on notifications/cancelled
+        task = asyncio.ensure_future(server.call_tool(request))
+        await asyncio.sleep(0.05)
+        task.cancel()
+        with pytest.raises(asyncio.CancelledError):
+            await task
+
+    asyncio.run(run())
+    snapshot = json.loads(call(server, 'get_server_metrics', {}))
+    assert snapshot['counters']['tool_calls'] == {'status=cancelled,tool=set_wellness_goal': 1}
+    assert server.tool_runner.active == 0
+
+
+def test_stress_monitoring_works_with_an_empty_emotion_cache(server):
+    from emotion_cache import CachedEmotionAnalyzer
+
+    server.emotion_analyzer = CachedEmotionAnalyzer(MockEmotionBackend())
+    frame = base64.b64encode(b'frame').decode()
+    assert 'Stress Level:' in call(server, 'stress_monitoring', {'image_data': frame, 'user_id': 'alice'})
+
+
+def test_profile_next_n_calls_writes_a_report_per_call(server, tmp_path):
+    server.profiler.report_dir = str(tmp_path / 'profiles')
+
+    text = call(server, 'profile_next_n_calls', {'count': 1, 'tools': ['set_wellness_goal']})
+    assert 'Profiling the next 1 calls (set_wellness_goal)' in text
+    call(server, 'list_at_risk_users', {})
+    call(server, 'set_wellness_goal', {'goal_type': 'sleep', 'description': 'Bed by 11', 'user_id': 'alice'})
+    call(server, 'set_wellness_goal', {'goal_type': 'sleep', 'description': 'Bed by 10', 'user_id': 'alice'})
+
+    reports = sorted((tmp_path / 'profiles').glob('*.txt'))
+    assert [report.name.split('-', 3)[-1] for report in reports] == ['set_wellness_goal.txt']
+    assert '_handle_set_wellness_goal' in reports[0].read_text()
+    assert 'Profiling disarmed (1 reports written)' in call(server, 'profile_next_n_calls', {'count': 0})
+
+
+def test_prompts_stay_within_budget_as_inputs_grow(server):
+    from prompt_builder import estimate_tokens
+
+    class ManyEmotions:
+        async def analyze_facial_emotions(self, image_data):
+            emotions = {f"emotion_{i}": i / 100 for i in range(48)}
+            return {'success': True, 'emotions': emotions, 'dominant_emotion': 'emotion_47'}
+
+    server.emotion_analyzer = ManyEmotions()
+    call(server, 'stress_monitoring', {'image_data': base64.b64encode(b'frame').decode(), 'user_id': 'alice'})
+    call(server, 'mood_check_in', {'mood_score': 4, 'text_description': 'so much on my mind ' * 2000,
+                                   'user_id': 'alice'})
+
+    stress_prompt, mood_prompt = server.gemini_model.prompts
+    assert '"emotion_47":0.47' in stress_prompt
+    assert 'emotion_39' not in stress_prompt
+    assert estimate_tokens(stress_prompt) <= server.prompt_budgets['stress_monitoring']
+    assert estimate_tokens(mood_prompt) <= server.prompt_budgets['mood_check_in']
+    assert 'Mood Score: 4/10' in mood_prompt
+    assert server.metrics.counters['gemini_prompt_tokens']
+
+
+def test_mindfulness_requests_are_served_from_the_prefetched_pool(server):
+    request = {'exercise_type': 'breathing', 'duration_minutes': 10,
+               'current_emotions': {'fear': 0.8}, 'user_id': 'alice'}
+
+    async def run():
+        await server.memory_saver.start()
+        texts = []
+        for _ in range(2):
+            texts.append((await server.call_tool(CallToolRequest(method="tools/call", params=CallToolRequestParams(
+                name='provide_mindfulness', arguments=request))))[0].text)
+        await server.mindfulness_prefetcher.refill()
+        texts.append((await server.call_tool(CallToolRequest(method="tools/call", params=CallToolRequestParams(
+            name='provide_mindfulness', arguments=request))))[0].text)
+        return texts
+
+    texts = asyncio.run(run())
+    assert all('Personalized Exercise:' in text for text in texts)
+    prompts = server.gemini_model.prompts
+    # One live generation, then variants generated ahead of time
+    assert len(prompts) == 1 + server.mindfulness_prefetcher.variants - 1
+    assert any('Focus: body sensations' in prompt for prompt in prompts)
+    assert server.mindfulness_prefetcher.stats['hits'] == 2
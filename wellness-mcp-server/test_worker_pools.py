@@ -0,0 +1,71 @@
+"""Tests for the managed worker pools"""
+
+import asyncio
+import os
+import threading
+import time
+
+from worker_pools import WorkerPools
+
+
+def worker_pid(offset=0):
+    return os.getpid() + offset
+
+
+def test_thread_pool_reports_queue_depth():
+    pools = WorkerPools(io_workers=1, cpu_workers=0)
+    release = threading.Event()
+    futures = [pools.io.submit(release.wait, 5) for _ in range(3)]
+    time.sleep(0.05)
+
+    busy = pools.snapshot()['io']
+    assert (busy['running'], busy['queue_depth'], busy['submitted']) == (1, 2, 3)
+
+    release.set()
+    for future in futures:
+        future.result()
+    idle = pools.snapshot()['io']
+    assert (idle['running'], idle['queue_depth'], idle['finished']) == (0, 0, 3)
+    assert idle['max_queue_depth'] == 2
+    pools.shutdown()
+
+
+def test_cpu_work_runs_in_worker_processes():
+    pools = WorkerPools(io_workers=2, cpu_workers=1)
+
+    async def run():
+        pools.install()
+        pid = await pools.run_cpu(worker_pid, offset=0)
+        await asyncio.to_thread(time.sleep, 0)
+        return pid
+
+    try:
+        pid = asyncio.run(run())
+        snapshot = pools.snapshot()
+    finally:
+        pools.shutdown()
+    assert pid != os.getpid()
+    assert snapshot['cpu']['finished'] == 1
+    # to_thread went through the installed default executor
+    assert snapshot['io']['finished'] == 1
+
+
+def test_blocking_calls_do_not_stall_the_loop():
+    pools = WorkerPools(io_workers=2, cpu_workers=0)
+
+    async def run():
+        ticks = 0
+
+        async def ticker():
+            nonlocal ticks
+            while True:
+                await asyncio.sleep(0.01)
+                ticks += 1
+
+        task = asyncio.ensure_future(ticker())
+        await pools.run_cpu(time.sleep, 0.2)
+        task.cancel()
+        return ticks
+
+    assert asyncio.run(run()) >= 10
+    pools.shutdown()
@@ -0,0 +1,73 @@
+"""Concurrency limits, timeouts and cancellation for MCP tool calls"""
+
+import asyncio
+from typing import Awaitable, Callable, Dict, Optional, TypeVar
+
+T = TypeVar('T')
+
+# Seconds a call may run before it is abandoned; tools not listed use the default
+DEFAULT_TOOL_TIMEOUTS = {
+    'mood_check_in_bulk': 300,
+    'stress_monitoring_session': 120,
+}
+
+
+class ToolCallTimeout(TimeoutError):
+    """A tool call ran longer than its timeout"""
+
+
+class ToolCallRunner:
+    """Runs tool calls as independent tasks
+
+    At most ``max_concurrency`` calls execute at once; the rest wait their
+    turn. Each call runs in its own task and is abandoned after its tool's
+    timeout (``tool_timeouts``, falling back to ``default_timeout``; 0 means
+    no limit). The timeout covers execution only, not time spent waiting
+    for a slot. Client cancellation arrives as cancellation of the caller's
+    task (the MCP SDK cancels the request's scope); a cancelled call gives
+    up its slot or its place in the queue and is counted as cancelled.
+    """
+
+    def __init__(self, max_concurrency: int = 16, default_timeout: float = 60.0,
+                 tool_timeouts: Optional[Dict[str, float]] = None):
+        self.max_concurrency = max(1, max_concurrency)
+        self.default_timeout = default_timeout
+        self.tool_timeouts = dict(tool_timeouts or {})
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self.queued = 0
+        self.active = 0
+
+        self.stats = {'calls': 0, 'completed': 0, 'timeouts': 0, 'cancelled': 0, 'max_active': 0}
+
+    def timeout_for(self, tool_name: str) -> float:
+        return self.tool_timeouts.get(tool_name, self.default_timeout)
+
+    async def run(self, tool_name: str, call: Callable[[], Awaitable[T]]) -> T:
+        """Run ``call()`` under the concurrency limit and the tool's timeout"""
+        self.stats['calls'] += 1
+        self.queued += 1
+        try:
+            await self._semaphore.acquire()
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        finally:
+            self.queued -= 1
+        self.active += 1
+        self.stats['max_active'] = max(self.stats['max_active'], self.active)
+
+        task = asyncio.ensure_future(call())
+        timeout = self.timeout_for(tool_name)
+        try:
+            result = await asyncio.wait_for(task, timeout if timeout > 0 else None)
+        except asyncio.TimeoutError:
+            self.stats['timeouts'] += 1
+            raise ToolCallTimeout(f"{tool_name} timed out after {timeout:g}s") from None
+        except asyncio.CancelledError:
+            self.stats['cancelled'] += 1
+            raise
+        finally:
+            self.active -= 1
+            self._semaphore.release()
+        self.stats['completed'] += 1
+        return result
@@ -2,178 +2,532 @@
 
 import asyncio
 import json
+import logging
 import os
+import sys
+import time
 from datetime import datetime, timedelta
-from typing import Any, Dict, List, Optional
+from typing import Any, Awaitable, Callable, Dict, List, Optional, Tuple
+
+# Origin for the startup timing report (taken before third-party imports)
+_PROCESS_START = time.perf_counter()
 
-import aiofiles
-from google.cloud import bigquery
-from google.generativeai import GenerativeModel
-# from hume import HumeBatchClient
-# from hume.models.config import FaceConfig
 from mcp.server import Server
 from mcp import stdio_server
 from mcp.types import (
     CallToolRequest,
+    CallToolRequestParams,
     ListToolsRequest,
     Tool,
     TextContent,
     ImageContent
 )
 
+from bigquery_provisioning import LazyBigQueryClient, TableProvisioner, bigquery_schema
+from bigquery_writer import BatchedBigQueryWriter
+from emotion_backends import EmotionBackend, create_emotion_backend
+from emotion_cache import CachedEmotionAnalyzer
+from gemini_client import GeminiClient, TokenBucket
+from image_decoding import DEFAULT_MAX_IMAGE_BYTES, ImageDecoder, ImagePayloadError
+from lazy_imports import LazyGenerativeModel, load_bigquery
+from local_store import LocalWellnessStore
+from metrics import MetricsRegistry, current_tool, export_to_file, serve_metrics
+from mindfulness_pool import ContentKey, MindfulnessPrefetcher, content_key
+from mood_history import MoodHistoryStore
+from profiling import CallProfiler
+from prompt_builder import DEFAULT_TOKEN_BUDGETS, compact_json, estimate_tokens, fit_prompt, top_scores
+from response_cache import ResponseCache
+from risk_phrases import RiskPhraseMatcher
+from risk_scanner import RISK_LEVELS, CrisisRiskScanner
+from startup_timing import StartupTimer
+from stress_timeline import combine_stress, frame_stress_score, stress_level, summarize_frames
+from storage_backends import (
+    BigQueryBackend,
+    InMemoryBackend,
+    SQLiteBackend,
+    WellnessStorageBackend
+)
+from tool_calls import DEFAULT_TOOL_TIMEOUTS, ToolCallRunner, ToolCallTimeout
+from wellness_tables import TABLE_SCHEMAS, parse_timestamp, table_name
+from worker_pools import WorkerPools
+
+logger = logging.getLogger(__name__)
+
+GEMINI_MODEL_NAME = 'gemini-2.0-flash-exp'
+
+DEFAULT_LOCAL_DB = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'wellness_local.db')
+
+DEFAULT_PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'profiles')
+
+# Upper bound on entries accepted by a single mood_check_in_bulk call
+MAX_BULK_MOOD_ENTRIES = 1000
+
+# Upper bound on frames accepted by a single stress_monitoring_session call
+MAX_SESSION_FRAMES = 600
+
+MINDFULNESS_PROMPT = """Create a personalized mindfulness exercise:
+
+Exercise Type: {exercise_type}
+Duration: {duration_minutes} minutes
+Current Emotional State: {current_emotions}{focus}
+
+Provide:
+1. Step-by-step instructions for the exercise
+2. Breathing or focus techniques
+3. What to expect during and after
+4. Why this exercise is beneficial for their current state"""
+
+# Focus of each pre-generated mindfulness variant, so pooled exercises differ
+MINDFULNESS_FOCUSES = ('the breath', 'body sensations', 'sounds around you', 'a calming image',
+                       'gentle movement', 'kind self-talk')
+
+# Receives partial Gemini output when a tool is called with "stream": true
+ChunkCallback = Callable[[str], Awaitable[None]]
+
+# Seconds a generated response may be reused for an identical prompt
+DEFAULT_CACHE_TTLS = {
+    'mood_check_in': 3600,
+    'mood_check_in_bulk': 3600,
+    'stress_monitoring': 600,
+    'set_wellness_goal': 86400,
+    'provide_mindfulness': 86400,
+    'crisis_support_check': 300
+}
+
+EMERGENCY_RESOURCES = """
+🚨 EMERGENCY RESOURCES:
+• Call emergency services: 911 or local equivalent
+• National Suicide Prevention Lifeline: 988 (US)
+• Crisis Text Line: Text HOME to 741741
+• Local mental health crisis services"""
+
 
 class WellnessMemorySaver:
-    """Handles data persistence to BigQuery - with fallback to local storage"""
+    """Handles data persistence to BigQuery - with fallback to local storage
+
+    The primary backend is chosen with ``WELLNESS_STORAGE_BACKEND``
+    (``bigquery``, ``sqlite`` or ``memory``). With BigQuery, the SQLite
+    store doubles as the fallback when BigQuery is unreachable and rows
+    saved there are replayed once it is back.
+    """
 
-    def __init__(self, project_id: str, dataset_id: str):
+    def __init__(self, project_id: str, dataset_id: str, local_db_path: Optional[str] = None,
+                 backend_name: Optional[str] = None, metrics: Optional[MetricsRegistry] = None):
         self.project_id = project_id
         self.dataset_id = dataset_id
+        self.backend_name = (backend_name or os.getenv('WELLNESS_STORAGE_BACKEND', 'bigquery')).lower()
         self.bigquery_available = False
-        self.client = None
-        self.local_storage = {}  # Fallback local storage
+        self.client: Optional[LazyBigQueryClient] = None
+        self.bigquery_backend: Optional[BigQueryBackend] = None
+        self.metrics = metrics or MetricsRegistry()
+
+        if self.backend_name not in ('bigquery', 'sqlite', 'memory'):
+            raise ValueError(f"Unknown storage backend: {self.backend_name}")
+
+        # Durable fallback storage; small local writes are group-committed
+        local_db_path = local_db_path or os.getenv('WELLNESS_LOCAL_DB', DEFAULT_LOCAL_DB)
+        self.local_backend: Optional[SQLiteBackend] = None
+        if self.backend_name != 'memory':
+            self.local_backend = SQLiteBackend(
+                LocalWellnessStore(local_db_path),
+                max_batch_size=int(os.getenv('WELLNESS_LOCAL_BATCH_SIZE', '200')),
+                flush_interval=float(os.getenv('WELLNESS_LOCAL_FLUSH_INTERVAL', '0.05'))
+            )
 
-        try:
-            self.client = bigquery.Client(project=project_id)
+        if self.backend_name == 'memory':
+            self.backend: WellnessStorageBackend = InMemoryBackend()
+        elif self.backend_name == 'sqlite':
+            self.backend = self.local_backend
+        else:
+            # The client is only built on first use (off the event loop) and
+            # tables are provisioned in the background by start()
+            self.client = LazyBigQueryClient(lambda: load_bigquery().Client(project=self.project_id))
+            self.table_provisioner = TableProvisioner(
+                self.client, project_id, dataset_id,
+                cache_path=os.getenv('BIGQUERY_TABLE_CACHE', f"{local_db_path}.tables.json")
+            )
+            # Inserts are batched and run off the event loop; failed
+            # batches are kept locally and replayed later
+            writer = BatchedBigQueryWriter(
+                self.client,
+                max_batch_size=int(os.getenv('BIGQUERY_BATCH_SIZE', '500')),
+                flush_interval=float(os.getenv('BIGQUERY_FLUSH_INTERVAL', '1.0')),
+                max_buffered_rows=int(os.getenv('BIGQUERY_MAX_BUFFERED_ROWS', '10000')),
+                on_error=self._spill_to_local,
+                metrics=self.metrics,
+                selected_fields=bigquery_schema
+            )
+            self.bigquery_backend = BigQueryBackend(self.client, self.project_id, self.dataset_id, writer)
+            # Optimistic until start() finds BigQuery unreachable
+            self.backend = self.bigquery_backend
             self.bigquery_available = True
-            # Initialize tables only if BigQuery works
-            self._create_tables()
-        except Exception as e:
-            print(f"BigQuery not available (using local storage): {e}")
-            self.bigquery_available = False
 
-    def _create_tables(self):
-        """Create BigQuery tables for wellness data"""
-        if not self.bigquery_available:
-            return
+    @property
+    def local_store(self) -> Optional[LocalWellnessStore]:
+        return self.local_backend.store if self.local_backend else None
 
-        tables = {
-            'mood_entries': f"""
-                entry_id STRING,
-                user_id STRING,
-                timestamp TIMESTAMP,
-                mood_score INT64,
-                text_description STRING,
-                emotion_data JSON,
-                gemini_analysis STRING,
-                created_at TIMESTAMP
-            """,
-            'stress_sessions': f"""
-                session_id STRING,
-                user_id STRING,
-                timestamp TIMESTAMP,
-                stress_level INT64,
-                ppg_data JSON,
-                hume_facial_analysis JSON,
-                gemini_analysis STRING,
-                created_at TIMESTAMP
-            """,
-            'wellness_goals': f"""
-                goal_id STRING,
-                user_id STRING,
-                timestamp TIMESTAMP,
-                goal_type STRING,
-                goal_description STRING,
-                target_value JSON,
-                progress_percentage FLOAT64,
-                status STRING,
-                created_at TIMESTAMP,
-                updated_at TIMESTAMP
-            """,
-            'mindfulness_sessions': f"""
-                session_id STRING,
-                user_id STRING,
-                timestamp TIMESTAMP,
-                exercise_type STRING,
-                duration_seconds INT64,
-                emotional_impact JSON,
-                created_at TIMESTAMP
-            """
-        }
+    async def start(self, timer: Optional[StartupTimer] = None) -> bool:
+        """Connect to BigQuery and provision tables; returns whether BigQuery is usable"""
+        if self.backend_name != 'bigquery':
+            return False
 
-        for table_name, schema in tables.items():
-            table_id = f"{self.project_id}.{self.dataset_id}.{table_name}"
-            table = bigquery.Table(table_id, schema=schema)
-            try:
-                self.client.create_table(table)
-                print(f"Created table {table_id}")
-            except Exception as e:
-                print(f"Table {table_id} already exists: {e}")
+        timer = timer or StartupTimer()
+        try:
+            with timer.phase('bigquery_client'):
+                await asyncio.to_thread(self.client.get)
+            with timer.phase('table_provisioning'):
+                provisioned = await self.table_provisioner.provision()
+            for table_id in provisioned:
+                logger.info("Provisioned table %s", table_id)
+            self.bigquery_available = True
+            self.backend = self.bigquery_backend
+        except Exception as e:
+            logger.warning("BigQuery not available (using local storage): %s", e)
+            self.bigquery_available = False
+            self.backend = self.local_backend
+        return self.bigquery_available
 
-    def save_mood_entry(self, entry_data: Dict[str, Any]) -> bool:
-        """Save mood entry to BigQuery or local storage"""
+    async def save(self, table: str, records: List[Dict[str, Any]]) -> bool:
+        """Save handler records to ``table`` in one batch"""
         try:
-            if self.bigquery_available:
-                table_id = f"{self.project_id}.{self.dataset_id}.mood_entries"
-
-                rows_to_insert = [{
-                    'entry_id': str(entry_data.get('entry_id', '')),
-                    'user_id': str(entry_data.get('user_id', 'default_user')),
-                    'timestamp': datetime.fromisoformat(entry_data['timestamp']) if entry_data.get('timestamp') else datetime.utcnow(),
-                    'mood_score': int(entry_data.get('mood_score', 5)),
-                    'text_description': str(entry_data.get('text_description', '')),
-                    'emotion_data': json.dumps(entry_data.get('emotion_data', {})),
-                    'gemini_analysis': str(entry_data.get('gemini_analysis', '')),
-                    'created_at': datetime.utcnow()
-                }]
-
-                self.client.insert_rows(table_id, rows_to_insert)
-                return True
-            else:
-                # Save to local storage
-                key = f"mood_{entry_data.get('user_id', 'default_user')}"
-                self.local_storage[key] = entry_data
-                print(f"Saved to local storage (BigQuery unavailable)")
-                return True
+            with self.metrics.span('storage'):
+                await self.backend.save(table, records)
+            return True
         except Exception as e:
-            print(f"Error saving mood entry: {e}")
+            logger.error("Error saving %s: %s", table, e)
             return False
 
-
-class HumeEmotionAnalyzer:
-    """Integrates Hume AI for facial emotion analysis"""
-
-    def __init__(self, api_key: str):
-        self.api_key = api_key
-        # Mock implementation since HumeBatchClient import failed
-
-    async def analyze_facial_emotions(self, image_data: bytes) -> Dict[str, Any]:
-        """Analyze emotions from facial image - currently mock implementation"""
-        # Mock Hume AI response for testing
-        emotions = {
-            'joy': 0.7,
-            'sadness': 0.1,
-            'anger': 0.05,
-            'fear': 0.03,
-            'surprise': 0.12
-        }
-
-        return {
-            'success': True,
-            'emotions': emotions,
-            'dominant_emotion': 'joy',
-            'confidence_score': 0.7,
-            'note': 'This is mock data - Hume AI integration needs API key and proper configuration'
-        }
+    async def save_mood_entry(self, entry_data: Dict[str, Any]) -> bool:
+        """Queue mood entry for BigQuery or save it to local storage"""
+        return await self.save_mood_entries([entry_data])
+
+    async def save_mood_entries(self, entries: List[Dict[str, Any]]) -> bool:
+        """Queue mood entries for BigQuery as one batch, or save them to local storage"""
+        return await self.save('mood_entries', entries)
+
+    async def save_stress_session(self, session_data: Dict[str, Any]) -> bool:
+        return await self.save('stress_sessions', [session_data])
+
+    async def save_wellness_goal(self, goal_data: Dict[str, Any]) -> bool:
+        return await self.save('wellness_goals', [goal_data])
+
+    async def save_mindfulness_session(self, session_data: Dict[str, Any]) -> bool:
+        return await self.save('mindfulness_sessions', [session_data])
+
+    async def query_range(self, table: str, user_id: str, start: Optional[datetime] = None,
+                          end: Optional[datetime] = None, limit: Optional[int] = None) -> List[Dict[str, Any]]:
+        """Rows for ``user_id`` in ``[start, end]`` from the active backend"""
+        with self.metrics.span('storage'):
+            return await self.backend.query_range(table, user_id, start, end, limit)
+
+    async def _spill_to_local(self, table_id: str, rows: List[Dict[str, Any]], error: Exception):
+        """Keep rows from a failed BigQuery batch so they can be replayed"""
+        await self.local_backend.save_rows(table_name(table_id), rows)
+
+    async def replay_to_bigquery(self, batch_size: int = 500) -> int:
+        """Upload locally stored rows to BigQuery; returns the number uploaded"""
+        if self.backend_name != 'bigquery':
+            return 0
+        if not self.bigquery_available and not await self.start():
+            return 0
+
+        # Make sure recently saved local rows are on disk before reading them back
+        await self.local_backend.flush()
+
+        uploaded = 0
+        for table in TABLE_SCHEMAS:
+            table_id = f"{self.project_id}.{self.dataset_id}.{table}"
+            while True:
+                pending = await asyncio.to_thread(self.local_store.pending_uploads, table, batch_size)
+                if not pending:
+                    break
+                rowids = [rowid for rowid, _ in pending]
+                rows = [row for _, row in pending]
+                try:
+                    errors = await asyncio.to_thread(self.client.insert_rows, table_id, rows,
+                                                     selected_fields=bigquery_schema(table))
+                except Exception as e:
+                    errors = [str(e)]
+                if errors:
+                    logger.warning("Replay to %s failed, will retry later: %s", table_id, errors)
+                    return uploaded
+                await asyncio.to_thread(self.local_store.mark_uploaded, table, rowids)
+                uploaded += len(rows)
+        return uploaded
+
+    async def close(self):
+        """Flush buffered BigQuery and local rows"""
+        if self.bigquery_backend:
+            await self.bigquery_backend.close()
+        if self.local_backend:
+            await self.local_backend.close()
+        if self.backend is not self.bigquery_backend and self.backend is not self.local_backend:
+            await self.backend.close()
 
 
 class WellnessMCPServer:
     """Main wellness MCP server"""
 
-    def __init__(self):
+    def __init__(self, startup_timer: Optional[StartupTimer] = None):
+        self.startup_timer = startup_timer or StartupTimer(_PROCESS_START)
+        self.startup_timer.mark('server_init_started')
+
+        # Tool latencies, sub-span timings, error counts and gauges
+        self.metrics = MetricsRegistry()
+
         # API clients
         self.gemini_api_key = os.getenv('GEMINI_API_KEY')
-        self.gemini_model = GenerativeModel('gemini-2.0-flash-exp') if self.gemini_api_key else None
+        # The Gemini SDK is only imported once a key is configured and the model is first used
+        self.gemini_model = LazyGenerativeModel(GEMINI_MODEL_NAME, self.gemini_api_key) if self.gemini_api_key else None
+
+        # Shared client bounding concurrency and rate of outbound Gemini calls
+        requests_per_minute = float(os.getenv('GEMINI_REQUESTS_PER_MINUTE', '0'))
+        self.gemini_client = GeminiClient(
+            self.gemini_model,
+            max_concurrency=int(os.getenv('GEMINI_MAX_CONCURRENCY', '4')),
+            timeout=float(os.getenv('GEMINI_TIMEOUT', '30')),
+            rate_limiter=TokenBucket.per_minute(requests_per_minute) if requests_per_minute > 0 else None
+        ) if self.gemini_model else None
+
+        # Cache of Gemini responses keyed on model and normalized prompt
+        cache_ttls = dict(DEFAULT_CACHE_TTLS)
+        cache_ttls.update(json.loads(os.getenv('GEMINI_CACHE_TTLS', '{}')))
+        self.response_cache = ResponseCache(
+            max_entries=int(os.getenv('GEMINI_CACHE_MAX_ENTRIES', '1024')),
+            tool_ttls=cache_ttls,
+            persist_dir=os.getenv('GEMINI_CACHE_DIR') or None,
+            max_disk_entries=int(os.getenv('GEMINI_CACHE_DIR_MAX_ENTRIES', '10000'))
+        )
 
+        # Estimated-token ceiling per tool prompt; long fields are truncated to fit
+        self.prompt_budgets = dict(DEFAULT_TOKEN_BUDGETS)
+        self.prompt_budgets.update(json.loads(os.getenv('GEMINI_PROMPT_BUDGETS', '{}')))
+
+        # Blocking SDK calls run in threads, CPU-heavy analysis in processes
+        self.worker_pools = WorkerPools(
+            io_workers=int(os.getenv('WELLNESS_IO_THREADS', '8')),
+            cpu_workers=int(os.getenv('WELLNESS_CPU_WORKERS', '2'))
+        )
+
+        # Facial emotion analysis: Hume API, a local CPU model or mock scores
         self.hume_api_key = os.getenv('HUME_API_KEY')
-        self.hume_analyzer = HumeEmotionAnalyzer(self.hume_api_key) if self.hume_api_key else None
+        emotion_backend = os.getenv('EMOTION_BACKEND') or ('hume' if self.hume_api_key else '')
+        self.emotion_analyzer: Optional[EmotionBackend] = create_emotion_backend(
+            emotion_backend,
+            api_key=self.hume_api_key,
+            local_model=os.getenv('EMOTION_LOCAL_MODEL'),
+            workers=int(os.getenv('EMOTION_LOCAL_WORKERS', '2')),
+            max_batch_size=int(os.getenv('EMOTION_BATCH_SIZE', '8')),
+            max_batch_delay=float(os.getenv('EMOTION_BATCH_DELAY_MS', '5')) / 1000,
+            pools=self.worker_pools
+        ) if emotion_backend else None
+        # Repeated or near-identical frames reuse an earlier analysis
+        emotion_cache_entries = int(os.getenv('EMOTION_CACHE_MAX_ENTRIES', '256'))
+        if self.emotion_analyzer and emotion_cache_entries > 0:
+            self.emotion_analyzer = CachedEmotionAnalyzer(
+                self.emotion_analyzer,
+                max_entries=emotion_cache_entries,
+                perceptual=os.getenv('EMOTION_CACHE_PERCEPTUAL', '').lower() in ('1', 'true', 'yes'),
+                max_distance=int(os.getenv('EMOTION_CACHE_MAX_DISTANCE', '4'))
+            )
+        self.image_decoder = ImageDecoder(
+            max_bytes=int(os.getenv('STRESS_MAX_IMAGE_BYTES', str(DEFAULT_MAX_IMAGE_BYTES))),
+            max_dimension=int(os.getenv('STRESS_IMAGE_MAX_DIMENSION', '1024'))
+        )
 
         # BigQuery storage
         self.project_id = os.getenv('BIGQUERY_PROJECT_ID', 'your-project')
         self.dataset_id = os.getenv('BIGQUERY_DATASET_ID', 'wellness_data')
-        self.memory_saver = WellnessMemorySaver(self.project_id, self.dataset_id)
+        # Without a configured project, skip BigQuery (and its SDK import) entirely
+        storage_backend = os.getenv('WELLNESS_STORAGE_BACKEND') or (
+            'bigquery' if os.getenv('BIGQUERY_PROJECT_ID') else 'sqlite')
+        self.memory_saver = WellnessMemorySaver(self.project_id, self.dataset_id, backend_name=storage_backend,
+                                                metrics=self.metrics)
+
+        # Time-indexed mood history used for trend and crisis analysis
+        retention_days = os.getenv('MOOD_HISTORY_RETENTION_DAYS', '90')
+        self.mood_history = MoodHistoryStore(
+            retention_days=int(retention_days) if retention_days else None,
+            max_entries_per_user=int(os.getenv('MOOD_HISTORY_MAX_ENTRIES_PER_USER', '5000')),
+            max_users=int(os.getenv('MOOD_HISTORY_MAX_USERS', '100000'))
+        )
+
+        # High-risk phrases are matched against every mood description at ingest
+        self.risk_matcher = RiskPhraseMatcher()
+
+        # Background re-scoring of users with new mood entries
+        self.risk_scanner = CrisisRiskScanner(
+            self.mood_history,
+            window_days=float(os.getenv('CRISIS_SCAN_WINDOW_DAYS', '7'))
+        )
+        self.risk_scan_interval = float(os.getenv('CRISIS_SCAN_INTERVAL', '60'))
+        # Mood windows this small are summarized inline; shipping them to the
+        # process pool costs more than the computation
+        self.crisis_inline_max_entries = int(os.getenv('CRISIS_INLINE_MAX_ENTRIES', '5000'))
+
+        # Independent tool calls run concurrently, each under its tool's timeout
+        tool_timeouts = dict(DEFAULT_TOOL_TIMEOUTS)
+        tool_timeouts.update(json.loads(os.getenv('TOOL_TIMEOUTS', '{}')))
+        self.tool_runner = ToolCallRunner(
+            max_concurrency=int(os.getenv('TOOL_MAX_CONCURRENCY', '16')),
+            default_timeout=float(os.getenv('TOOL_CALL_TIMEOUT', '60')),
+            tool_timeouts=tool_timeouts
+        )
+
+        self.replay_interval = float(os.getenv('WELLNESS_REPLAY_INTERVAL', '300'))
+        self._background_tasks: List[asyncio.Task] = []
+
+        # Mindfulness exercises for each user's usual requests, generated while idle
+        self.mindfulness_prefetch_interval = float(os.getenv('MINDFULNESS_PREFETCH_INTERVAL', '30'))
+        self.mindfulness_history_days = float(os.getenv('MINDFULNESS_HISTORY_DAYS', '30'))
+        self.mindfulness_prefetcher = MindfulnessPrefetcher(
+            self._generate_mindfulness_variant,
+            self._mindfulness_history,
+            is_idle=lambda: self.tool_runner.active == 0,
+            variants=int(os.getenv('MINDFULNESS_PREFETCH_VARIANTS', '3')),
+            min_uses=int(os.getenv('MINDFULNESS_PREFETCH_MIN_USES', '2'))
+        )
+
+        # Opt-in per-call profiling, armed here or with the profile_next_n_calls tool
+        profile_tools = os.getenv('WELLNESS_PROFILE_TOOLS', '')
+        self.profiler = CallProfiler(
+            os.getenv('WELLNESS_PROFILE_DIR', DEFAULT_PROFILE_DIR),
+            remaining=int(os.getenv('WELLNESS_PROFILE_CALLS', '0')),
+            tools=[tool.strip() for tool in profile_tools.split(',') if tool.strip()],
+            tracemalloc_frames=int(os.getenv('WELLNESS_PROFILE_TRACEMALLOC', '0'))
+        )
 
-        # In-memory cache for fast retrieval
-        self.memory_store: Dict[str, Any] = {}
+        # Optional Prometheus text exports, kept off the stdio transport
+        self.metrics_file = os.getenv('WELLNESS_METRICS_FILE') or None
+        self.metrics_interval = float(os.getenv('WELLNESS_METRICS_INTERVAL', '15'))
+        self.metrics_host = os.getenv('WELLNESS_METRICS_HOST', '127.0.0.1')
+        metrics_port = os.getenv('WELLNESS_METRICS_PORT')
+        self.metrics_port = int(metrics_port) if metrics_port else None
+        self._metrics_server: Optional[asyncio.AbstractServer] = None
+        self._register_gauges()
+
+        self.startup_timer.mark('server_init_finished')
+
+    def _register_gauges(self):
+        """Expose cache hit ratios, queue depths and in-flight work as gauges"""
+        def cache_hit_ratio() -> Dict[str, float]:
+            ratios = {'gemini': self.response_cache.hit_rate(),
+                      'mindfulness_pool': self.mindfulness_prefetcher.hit_rate()}
+            if isinstance(self.emotion_analyzer, CachedEmotionAnalyzer):
+                ratios['emotion'] = self.emotion_analyzer.hit_rate()
+            return ratios
+
+        def queue_depth() -> Dict[str, float]:
+            depths = {'tool_calls': self.tool_runner.queued, 'crisis_scan': self.risk_scanner.pending}
+            for name, pool in self.worker_pools.snapshot().items():
+                depths[f"{name}_pool"] = pool['queue_depth']
+            writer = self.memory_saver.bigquery_backend.writer if self.memory_saver.bigquery_backend else None
+            if writer:
+                depths['bigquery_writer'] = writer.pending_rows
+            return depths
+
+        def in_flight() -> Dict[str, float]:
+            counts = {'tool_calls': self.tool_runner.active}
+            if self.gemini_client:
+                counts['gemini'] = self.gemini_client.in_flight
+            return counts
+
+        self.metrics.register_gauge('cache_hit_ratio', 'cache', cache_hit_ratio)
+        self.metrics.register_gauge('queue_depth', 'queue', queue_depth)
+        self.metrics.register_gauge('in_flight', 'queue', in_flight)
+
+    def start(self):
+        """Start background tasks on the running loop without waiting for them"""
+        # asyncio.to_thread and storage calls share the managed I/O pool
+        self.worker_pools.install()
+        self._background_tasks.append(asyncio.create_task(self._storage_loop()))
+        if isinstance(self.gemini_model, LazyGenerativeModel):
+            self._background_tasks.append(asyncio.create_task(self._preload_gemini()))
+        if self.risk_scan_interval > 0:
+            self._background_tasks.append(asyncio.create_task(self.risk_scanner.run(self.risk_scan_interval)))
+        if self.mindfulness_prefetch_interval > 0:
+            self._background_tasks.append(asyncio.create_task(
+                self.mindfulness_prefetcher.run(self.mindfulness_prefetch_interval)))
+        if self.metrics_file:
+            self._background_tasks.append(asyncio.create_task(
+                export_to_file(self.metrics, self.metrics_file, self.metrics_interval)))
+        if self.metrics_port is not None:
+            self._background_tasks.append(asyncio.create_task(self._serve_metrics()))
+
+    async def _serve_metrics(self):
+        try:
+            self._metrics_server = await serve_metrics(self.metrics, self.metrics_host, self.metrics_port)
+        except OSError as e:
+            logger.error("Could not serve metrics on %s:%s: %s", self.metrics_host, self.metrics_port, e)
+            return
+        logger.info("Serving metrics on %s:%s", self.metrics_host, self.metrics_port)
+
+    async def _preload_gemini(self):
+        """Import the Gemini SDK off the event loop before the first request needs it"""
+        try:
+            with self.startup_timer.phase('gemini_sdk'):
+                await self.gemini_model.preload()
+        except Exception as e:
+            logger.warning("Gemini SDK could not be loaded: %s", e)
+
+    async def _storage_loop(self):
+        """Connect storage in the background, then periodically replay local rows"""
+        with self.startup_timer.phase('storage_ready'):
+            await self.memory_saver.start(self.startup_timer)
+        self.startup_timer.write_report(os.getenv('WELLNESS_STARTUP_REPORT'))
+
+        if self.replay_interval <= 0:
+            return
+        while True:
+            try:
+                uploaded = await self.memory_saver.replay_to_bigquery()
+                if uploaded:
+                    logger.info("Replayed %d locally stored rows to BigQuery", uploaded)
+            except Exception as e:
+                logger.error("Local replay failed: %s", e)
+            await asyncio.sleep(self.replay_interval)
+
+    async def aclose(self):
+        """Release resources and flush pending writes"""
+        for task in self._background_tasks:
+            task.cancel()
+        await asyncio.gather(*self._background_tasks, return_exceptions=True)
+        self._background_tasks.clear()
+        await self.mindfulness_prefetcher.close()
+        if self._metrics_server:
+            self._metrics_server.close()
+            await self._metrics_server.wait_closed()
+            self._metrics_server = None
+        if self.emotion_analyzer is not None:
+            await self.emotion_analyzer.close()
+        await self.memory_saver.close()
+        self.worker_pools.shutdown(wait=False)
+
+    async def _generate_text(self, tool_name: str, prompt: str,
+                             on_chunk: Optional[ChunkCallback] = None) -> str:
+        """Generate text with Gemini, reusing cached responses for identical prompts
+
+        When ``on_chunk`` is given the response is streamed and each partial
+        chunk is passed to it; the assembled text is still returned and cached.
+        """
+        cached = await self.response_cache.get_async(tool_name, GEMINI_MODEL_NAME, prompt)
+        if cached is not None:
+            if on_chunk:
+                await on_chunk(cached)
+            return cached
+
+        self.metrics.increment('gemini_prompt_tokens', estimate_tokens(prompt), tool=tool_name)
+        with self.metrics.span('gemini'):
+            if on_chunk:
+                chunks = []
+                async for chunk in self.gemini_client.stream(prompt):
+                    chunks.append(chunk)
+                    await on_chunk(chunk)
+                text = ''.join(chunks)
+            else:
+                text = await self.gemini_client.generate(prompt)
+        await self.response_cache.put_async(tool_name, GEMINI_MODEL_NAME, prompt, text)
+        return text
 
     async def list_tools(self, request: ListToolsRequest) -> List[Tool]:
         """List available wellness tools"""
@@ -191,6 +545,34 @@ class WellnessMCPServer:
                     "required": ["mood_score"]
                 }
             ),
+            Tool(
+                name="mood_check_in_bulk",
+                description="Record many mood entries in one call, e.g. when syncing an offline mood log",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "entries": {
+                            "type": "array",
+                            "description": "Mood entries to record",
+                            "maxItems": MAX_BULK_MOOD_ENTRIES,
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "mood_score": {"type": "integer", "minimum": 1, "maximum": 10, "description": "Mood score from 1-10"},
+                                    "text_description": {"type": "string", "description": "Optional text description"},
+                                    "timestamp": {"type": "string", "description": "ISO 8601 time the mood was logged (defaults to now)"},
+                                    "analyze": {"type": "boolean", "description": "Run AI analysis for this entry", "default": True}
+                                },
+                                "required": ["mood_score"]
+                            }
+                        },
+                        "user_id": {"type": "string", "description": "User identifier"},
+                        "analyze": {"type": "boolean", "description": "Default for per-entry AI analysis", "default": True},
+                        "max_concurrency": {"type": "integer", "minimum": 1, "description": "Concurrent AI analyses", "default": 4}
+                    },
+                    "required": ["entries"]
+                }
+            ),
             Tool(
                 name="stress_monitoring",
                 description="Analyze real-time stress using facial recognition and PPG data",
@@ -198,12 +580,40 @@ class WellnessMCPServer:
                     "type": "object",
                     "properties": {
                         "image_data": {"type": "string", "description": "Base64 encoded facial image"},
-                        "ppg_data": {"type": "object", "description": "Photoplethysmography biometric data"},
+                        "ppg_data": {"type": "object", "description": "Photoplethysmography biometric data; raw readings go in samples with sampling_rate in Hz"},
                         "user_id": {"type": "string", "description": "User identifier"}
                     },
                     "required": ["image_data"]
                 }
             ),
+            Tool(
+                name="stress_monitoring_session",
+                description="Analyze a capture of many facial frames plus PPG data as one smoothed stress timeline",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "frames": {
+                            "type": "array",
+                            "description": "Frames in capture order",
+                            "maxItems": MAX_SESSION_FRAMES,
+                            "items": {
+                                "type": "object",
+                                "properties": {
+                                    "image_data": {"type": "string", "description": "Base64 encoded facial image"},
+                                    "offset_ms": {"type": "integer", "minimum": 0, "description": "Capture time relative to the session start"}
+                                },
+                                "required": ["image_data"]
+                            }
+                        },
+                        "frame_interval_ms": {"type": "integer", "minimum": 1, "description": "Spacing of frames without offset_ms", "default": 1000},
+                        "ppg_data": {"type": "object", "description": "Photoplethysmography biometric data for the session; raw readings go in samples with sampling_rate in Hz"},
+                        "smoothing": {"type": "number", "minimum": 0, "maximum": 1, "description": "Weight of the newest frame in the moving average", "default": 0.3},
+                        "max_concurrency": {"type": "integer", "minimum": 1, "description": "Frames analyzed at once", "default": 4},
+                        "user_id": {"type": "string", "description": "User identifier"}
+                    },
+                    "required": ["frames"]
+                }
+            ),
             Tool(
                 name="set_wellness_goal",
                 description="Create personalized wellness goals with progress tracking",
@@ -227,6 +637,7 @@ class WellnessMCPServer:
                         "exercise_type": {"type": "string", "description": "Type of exercise (breathing, meditation, etc.)"},
                         "current_emotions": {"type": "object", "description": "Current emotional state"},
                         "duration_minutes": {"type": "integer", "description": "Desired duration"},
+                        "stream": {"type": "boolean", "description": "Send partial output as progress notifications while generating", "default": False},
                         "user_id": {"type": "string", "description": "User identifier"}
                     },
                     "required": ["exercise_type"]
@@ -239,29 +650,110 @@ class WellnessMCPServer:
                     "type": "object",
                     "properties": {
                         "user_id": {"type": "string", "description": "User identifier"},
-                        "timeframe_days": {"type": "integer", "description": "Days to analyze", "default": 7}
+                        "timeframe_days": {"type": "integer", "description": "Days to analyze", "default": 7},
+                        "stream": {"type": "boolean", "description": "Send partial output as progress notifications while generating", "default": False}
                     },
                     "required": ["user_id"]
                 }
+            ),
+            Tool(
+                name="list_at_risk_users",
+                description="List users flagged by the background crisis-risk scanner, highest risk first",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "limit": {"type": "integer", "minimum": 1, "description": "Maximum users to return", "default": 20},
+                        "min_level": {"type": "string", "enum": list(RISK_LEVELS[1:]), "description": "Lowest risk level to include", "default": "MEDIUM"}
+                    }
+                }
+            ),
+            Tool(
+                name="get_server_metrics",
+                description="Report tool latencies, Gemini/emotion/storage timings, cache hit rates, queue depths and error counts",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "format": {"type": "string", "enum": ["json", "prometheus"], "description": "Output format", "default": "json"}
+                    }
+                }
+            ),
+            Tool(
+                name="profile_next_n_calls",
+                description="Profile the next tool calls with cProfile (and optionally tracemalloc), writing a report per call",
+                inputSchema={
+                    "type": "object",
+                    "properties": {
+                        "count": {"type": "integer", "minimum": -1, "description": "Calls to profile; 0 disarms, -1 profiles every call"},
+                        "tools": {"type": "array", "items": {"type": "string"}, "description": "Only profile these tools"},
+                        "tracemalloc_frames": {"type": "integer", "minimum": 0, "description": "Traceback depth of allocation snapshots (0 disables)", "default": 0}
+                    },
+                    "required": ["count"]
+                }
             )
         ]
 
-    async def call_tool(self, request: CallToolRequest) -> List[TextContent]:
-        """Execute wellness tools"""
+    async def call_tool(self, request: CallToolRequest,
+                        on_chunk: Optional[ChunkCallback] = None) -> List[TextContent]:
+        """Execute wellness tools
+
+        ``on_chunk`` receives partial output from tools that support streaming
+        when the caller opts in with ``"stream": true``. Calls run under the
+        tool-call concurrency limit and their tool's timeout; cancelling the
+        caller's task cancels the call. Every call's latency and outcome are
+        recorded in ``self.metrics``.
+        """
         tool_name = request.params.name
         arguments = request.params.arguments or {}
+        if not arguments.get('stream'):
+            on_chunk = None
+
+        def dispatch():
+            return self._dispatch_tool(tool_name, arguments, on_chunk)
+
+        # Unless profiling is armed this costs a single attribute check
+        call = dispatch
+        if self.profiler.remaining and tool_name != 'profile_next_n_calls' and self.profiler.claim(tool_name):
+            def call():
+                return self.profiler.run(tool_name, dispatch())
 
+        started = time.perf_counter()
+        status = 'cancelled'
+        try:
+            result = await self.tool_runner.run(tool_name, call)
+            status = 'error' if _is_error_response(result) else 'ok'
+            return result
+        except ToolCallTimeout as e:
+            status = 'timeout'
+            return [TextContent(type="text", text=f"⏱️ {str(e)}")]
+        finally:
+            self.metrics.observe('tool_duration_seconds', time.perf_counter() - started, tool=tool_name)
+            self.metrics.increment('tool_calls', tool=tool_name, status=status)
+
+    async def _dispatch_tool(self, tool_name: str, arguments: Dict[str, Any],
+                             on_chunk: Optional[ChunkCallback]) -> List[TextContent]:
+        # Runs in the call's own task, so sub-spans are attributed to this tool
+        current_tool.set(tool_name)
         try:
             if tool_name == "mood_check_in":
                 return await self._handle_mood_check_in(arguments)
+            elif tool_name == "mood_check_in_bulk":
+                return await self._handle_mood_check_in_bulk(arguments)
             elif tool_name == "stress_monitoring":
                 return await self._handle_stress_monitoring(arguments)
+            elif tool_name == "stress_monitoring_session":
+                return await self._handle_stress_monitoring_session(arguments)
             elif tool_name == "set_wellness_goal":
                 return await self._handle_set_wellness_goal(arguments)
             elif tool_name == "provide_mindfulness":
-                return await self._handle_provide_mindfulness(arguments)
+                return await self._handle_provide_mindfulness(arguments, on_chunk)
             elif tool_name == "crisis_support_check":
-                return await self._handle_crisis_support_check(arguments)
+                return await self._handle_crisis_support_check(arguments, on_chunk)
+            elif tool_name == "list_at_risk_users":
+                return await self._handle_list_at_risk_users(arguments)
+            elif tool_name == "get_server_metrics":
+                return await self._handle_get_server_metrics(arguments)
+            elif tool_name == "profile_next_n_calls":
+                return await self._handle_profile_next_n_calls(arguments)
             else:
                 raise ValueError(f"Unknown tool: {tool_name}")
 
@@ -275,25 +767,23 @@ class WellnessMCPServer:
         user_id = args.get('user_id', 'default_user')
 
         # Generate entry ID
-        entry_id = f"mood_{user_id}_{datetime.now().isoformat()}"
+        entry_id = f"mood_{user_id}_{datetime.utcnow().isoformat()}"
+
+        # Flag high-risk language before anything else. A flagged entry gets
+        # the emergency resources straight away, whether or not it saves, and
+        # is not held back for the LLM analysis.
+        high_risk_phrases = self.risk_matcher.find(text_description)
+        crisis_notice = ""
+        if high_risk_phrases:
+            crisis_notice = f"""💛 It sounds like you may be going through something really hard. You don't have to face it alone.
+{EMERGENCY_RESOURCES}"""
 
         # Analyze with Gemini if available
         gemini_analysis = ""
-        if self.gemini_model and text_description:
+        if self.gemini_model and text_description and not high_risk_phrases:
             try:
-                prompt = f"""Analyze this mood entry and provide supportive, empathetic insights:
-
-Mood Score: {mood_score}/10
-Description: {text_description}
-
-Please provide:
-1. Emotional analysis
-2. Positive reframing and encouragement
-3. Gentle suggestion for improvement if appropriate
-4. Any immediate concerns to address"""
-
-                response = await self.gemini_model.generate_content_async(prompt)
-                gemini_analysis = response.text
+                prompt = self._mood_analysis_prompt('mood_check_in', mood_score, text_description)
+                gemini_analysis = await self._generate_text('mood_check_in', prompt)
             except Exception as e:
                 gemini_analysis = f"AI analysis unavailable: {str(e)}"
 
@@ -301,48 +791,213 @@ Please provide:
         entry_data = {
             'entry_id': entry_id,
             'user_id': user_id,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.utcnow().isoformat(),
             'mood_score': mood_score,
             'text_description': text_description,
             'gemini_analysis': gemini_analysis
         }
 
-        success = self.memory_saver.save_mood_entry(entry_data)
+        success = await self.memory_saver.save_mood_entry(entry_data)
 
         if success:
             response = f"""✅ Mood entry recorded successfully!
 
 📊 Your Mood: {mood_score}/10
-📝 Description: {text_description}
+📝 Description: {text_description}"""
+            if gemini_analysis:
+                response += f"""
 
 🤖 AI Insights:
-{gemini_analysis}
+{gemini_analysis}"""
+            response += """
 
 Entry saved to wellness database."""
 
-            # Cache in memory
-            self.memory_store[f"mood_{user_id}"] = entry_data
+            # Index in memory for trend analysis
+            self.mood_history.append(user_id, mood_score, text_description, entry_data['timestamp'],
+                                     high_risk=bool(high_risk_phrases))
+            self.risk_scanner.mark_dirty(user_id)
         else:
             response = "❌ Failed to save mood entry. Please try again."
 
+        if crisis_notice:
+            response = f"{crisis_notice}\n\n{response}"
+
+        return [TextContent(type="text", text=response)]
+
+    def _fit_prompt(self, tool_name: str, template: str, **fields: Any) -> str:
+        """Fill a prompt template within ``tool_name``'s token budget"""
+        return fit_prompt(template, self.prompt_budgets.get(tool_name), **fields)
+
+    def _mood_analysis_prompt(self, tool_name: str, mood_score: int, text_description: str) -> str:
+        return self._fit_prompt(tool_name, """Analyze this mood entry and provide supportive, empathetic insights:
+
+Mood Score: {mood_score}/10
+Description: {text_description}
+
+Please provide:
+1. Emotional analysis
+2. Positive reframing and encouragement
+3. Gentle suggestion for improvement if appropriate
+4. Any immediate concerns to address""", mood_score=mood_score, text_description=text_description)
+
+    async def _handle_mood_check_in_bulk(self, args: Dict[str, Any]) -> List[TextContent]:
+        """Validate, analyze and store a batch of mood entries"""
+        entries = args.get('entries') or []
+        user_id = args.get('user_id', 'default_user')
+        analyze_default = args.get('analyze', True)
+        max_concurrency = max(1, int(args.get('max_concurrency', 4)))
+
+        if not isinstance(entries, list) or not entries:
+            return [TextContent(type="text", text="❌ No mood entries provided")]
+        if len(entries) > MAX_BULK_MOOD_ENTRIES:
+            return [TextContent(type="text", text=f"❌ Too many entries: {len(entries)} (maximum {MAX_BULK_MOOD_ENTRIES})")]
+
+        # Validate every entry up front so bad rows never reach storage
+        now = datetime.utcnow().isoformat()
+        valid: List[Dict[str, Any]] = []
+        statuses: List[str] = [''] * len(entries)
+        for index, entry in enumerate(entries):
+            try:
+                if not isinstance(entry, dict):
+                    raise ValueError("entry must be an object")
+                mood_score = entry.get('mood_score')
+                if isinstance(mood_score, bool) or not isinstance(mood_score, int) or not 1 <= mood_score <= 10:
+                    raise ValueError("mood_score must be an integer from 1-10")
+                timestamp = entry.get('timestamp') or now
+                # Offset-aware timestamps are stored as naive UTC like the rest
+                timestamp = parse_timestamp(timestamp).isoformat()
+            except (TypeError, ValueError) as e:
+                statuses[index] = f"invalid ({e})"
+                continue
+
+            text_description = str(entry.get('text_description', ''))
+            valid.append({
+                'index': index,
+                'entry_id': f"mood_{user_id}_{timestamp}_{index}",
+                'user_id': user_id,
+                'timestamp': timestamp,
+                'mood_score': mood_score,
+                'text_description': text_description,
+                'gemini_analysis': '',
+                'analyze': entry.get('analyze', analyze_default),
+                'high_risk': self.risk_matcher.search(text_description)
+            })
+
+        # Run AI analysis concurrently with a bounded fan-out
+        semaphore = asyncio.Semaphore(max_concurrency)
+
+        async def analyze(entry_data: Dict[str, Any]):
+            async with semaphore:
+                try:
+                    prompt = self._mood_analysis_prompt(
+                        'mood_check_in_bulk', entry_data['mood_score'], entry_data['text_description'])
+                    entry_data['gemini_analysis'] = await self._generate_text('mood_check_in_bulk', prompt)
+                except Exception as e:
+                    entry_data['analysis_error'] = str(e)
+
+        if self.gemini_model:
+            await asyncio.gather(*(
+                analyze(entry_data) for entry_data in valid
+                if entry_data['analyze'] and entry_data['text_description']
+            ))
+
+        rows = [
+            {key: value for key, value in entry_data.items() if key not in ('index', 'analyze', 'analysis_error', 'high_risk')}
+            for entry_data in valid
+        ]
+        success = await self.memory_saver.save_mood_entries(rows) if rows else True
+
+        saved = 0
+        # Emergency resources go out for flagged text even if the save failed
+        flagged = sum(1 for entry_data in valid if entry_data['high_risk'])
+        for entry_data in valid:
+            if not success:
+                statuses[entry_data['index']] = "failed to save"
+                continue
+            saved += 1
+            self.mood_history.append(user_id, entry_data['mood_score'], entry_data['text_description'],
+                                     entry_data['timestamp'], high_risk=entry_data['high_risk'])
+            if entry_data.get('analysis_error'):
+                statuses[entry_data['index']] = "saved (analysis unavailable)"
+            elif entry_data['gemini_analysis']:
+                statuses[entry_data['index']] = "saved (analyzed)"
+            else:
+                statuses[entry_data['index']] = "saved"
+
+        if saved:
+            self.risk_scanner.mark_dirty(user_id)
+
+        summary = "\n".join(f"#{index}: {status}" for index, status in enumerate(statuses))
+        icon = "✅" if saved == len(entries) else "⚠️"
+        response = f"""{icon} Bulk mood check-in complete
+
+📊 Saved: {saved}/{len(entries)}
+❗ Invalid: {len(entries) - len(valid)}
+
+{summary}"""
+        if flagged:
+            response += f"""
+
+🚩 {flagged} entries contain high-risk language.
+{EMERGENCY_RESOURCES}"""
+
         return [TextContent(type="text", text=response)]
 
+    async def _analyze_ppg(self, ppg_data: Any) -> Tuple[Optional[Dict[str, Any]], str]:
+        """HRV features of raw PPG samples plus a line for the tool response
+
+        The signal processing runs in the CPU pool. Unusable PPG never fails
+        the request; the stress level then comes from the facial analysis
+        alone.
+        """
+        if not isinstance(ppg_data, dict) or not ppg_data.get('samples'):
+            return None, ""
+        # Imported on first use so NumPy stays out of server startup
+        from ppg_signal import PPGSignalError, analyze_ppg_payload
+
+        try:
+            features = await self.worker_pools.run_cpu(analyze_ppg_payload, ppg_data)
+        except PPGSignalError as e:
+            return None, f"\n⚠️ PPG data ignored: {str(e)}"
+        if not features:
+            return None, ""
+        if features['heart_rate_bpm'] is None:
+            return features, "\n⚠️ PPG signal too noisy for heart-rate analysis"
+        return features, (f"\n❤️ Heart Rate: {features['heart_rate_bpm']} bpm "
+                          f"(HRV RMSSD {features['rmssd_ms']} ms, SDNN {features['sdnn_ms']} ms)")
+
+    @staticmethod
+    def _ppg_prompt_lines(features: Optional[Dict[str, Any]]) -> str:
+        if not features or features['heart_rate_bpm'] is None:
+            return ""
+        return (f"\nHeart Rate: {features['heart_rate_bpm']} bpm"
+                f"\nHRV: RMSSD {features['rmssd_ms']} ms, SDNN {features['sdnn_ms']} ms")
+
+    async def _analyze_face(self, frame: Any) -> Dict[str, Any]:
+        """Emotion analysis of one frame, timed as an ``emotion_analysis`` span"""
+        with self.metrics.span('emotion_analysis'):
+            result = await self.emotion_analyzer.analyze_facial_emotions(frame)
+        if not result.get('success'):
+            self.metrics.increment('span_errors', span='emotion_analysis', tool=current_tool.get() or 'background')
+        return result
+
     async def _handle_stress_monitoring(self, args: Dict[str, Any]) -> List[TextContent]:
         """Analyze stress through facial recognition"""
         image_data = args.get('image_data', '')
         ppg_data = args.get('ppg_data', {})
         user_id = args.get('user_id', 'default_user')
 
-        if not self.hume_analyzer:
-            return [TextContent(type="text", text="❌ Hume AI not configured for facial analysis")]
+        if self.emotion_analyzer is None:
+            return [TextContent(type="text", text="❌ Facial analysis not configured (set HUME_API_KEY or EMOTION_BACKEND)")]
 
         try:
-            # Decode base64 image
-            import base64
-            actual_image_data = base64.b64decode(image_data.split(',')[-1]) if ',' in image_data else base64.b64decode(image_data)
+            # Decode into a pooled buffer and downscale oversized frames
+            with await self.image_decoder.decode_async(image_data) as image:
+                frame = await self.image_decoder.normalize_async(image)
 
-            # Analyze with Hume AI
-            emotion_result = await self.hume_analyzer.analyze_facial_emotions(actual_image_data)
+                # Analyze with the configured emotion backend
+                emotion_result = await self._analyze_face(frame)
 
             if not emotion_result.get('success'):
                 return [TextContent(type="text", text=f"❌ Facial analysis failed: {emotion_result.get('error')}")]
@@ -350,47 +1005,47 @@ Entry saved to wellness database."""
             emotions = emotion_result.get('emotions', {})
             dominant_emotion = emotion_result.get('dominant_emotion', 'neutral')
 
-            # Calculate stress level (simplified logic)
-            stress_indicators = ['anger', 'fear', 'sadness', 'disgust']
-            stress_score = sum(emotions.get(indicator, 0) for indicator in stress_indicators)
-            stress_level = min(int(stress_score * 10), 10)  # Scale to 1-10
+            # Facial stress blended with HRV when raw PPG samples were sent
+            ppg_features, ppg_note = await self._analyze_ppg(ppg_data)
+            physiological = ppg_features.get('stress_score') if ppg_features else None
+            level = stress_level(combine_stress(frame_stress_score(emotions), physiological))
 
             # Gemini analysis
             gemini_recommendations = ""
             if self.gemini_model:
                 try:
-                    prompt = f"""Based on this emotional analysis, provide stress relief recommendations:
+                    prompt = self._fit_prompt('stress_monitoring', """Based on this emotional analysis, provide stress relief recommendations:
 
 Dominant Emotion: {dominant_emotion}
-Stress Level: {stress_level}/10
-Emotion Scores: {json.dumps(emotions, indent=2)}
+Stress Level: {level}/10
+Top Emotion Scores: {emotions}{ppg}
 
-Provide 2-3 immediate, practical recommendations for stress management."""
+Provide 2-3 immediate, practical recommendations for stress management.""",
+                        dominant_emotion=dominant_emotion, level=level,
+                        emotions=compact_json(top_scores(emotions)), ppg=self._ppg_prompt_lines(ppg_features))
 
-                    response = await self.gemini_model.generate_content_async(prompt)
-                    gemini_recommendations = response.text
+                    gemini_recommendations = await self._generate_text('stress_monitoring', prompt)
                 except Exception as e:
                     gemini_recommendations = f"AI recommendations unavailable: {str(e)}"
 
             # Save session
-            session_id = f"stress_{user_id}_{datetime.now().isoformat()}"
+            session_id = f"stress_{user_id}_{datetime.utcnow().isoformat()}"
             session_data = {
                 'session_id': session_id,
                 'user_id': user_id,
-                'timestamp': datetime.now().isoformat(),
-                'stress_level': stress_level,
-                'ppg_data': ppg_data,
+                'timestamp': datetime.utcnow().isoformat(),
+                'stress_level': level,
+                'ppg_data': dict(ppg_data, hrv=ppg_features) if ppg_features else ppg_data,
                 'hume_facial_analysis': emotion_result,
                 'gemini_analysis': gemini_recommendations
             }
 
-            # Save to BigQuery (implement this method)
-            # self.memory_saver.save_stress_session(session_data)
+            await self.memory_saver.save_stress_session(session_data)
 
             response = f"""😐 Stress Analysis Complete
 
-📊 Stress Level: {stress_level}/10
-😊 Dominant Emotion: {dominant_emotion}
+📊 Stress Level: {level}/10
+😊 Dominant Emotion: {dominant_emotion}{ppg_note}
 
 📈 Detailed Emotions:
 {json.dumps(emotions, indent=2)}
@@ -402,9 +1057,111 @@ Session recorded for your wellness tracking."""
 
             return [TextContent(type="text", text=response)]
 
+        except ImagePayloadError as e:
+            return [TextContent(type="text", text=f"❌ Invalid image: {str(e)}")]
         except Exception as e:
             return [TextContent(type="text", text=f"❌ Stress monitoring error: {str(e)}")]
 
+    async def _handle_stress_monitoring_session(self, args: Dict[str, Any]) -> List[TextContent]:
+        """Analyze a multi-frame capture as a single smoothed stress session"""
+        frames = args.get('frames') or []
+        frame_interval_ms = int(args.get('frame_interval_ms', 1000))
+        ppg_data = args.get('ppg_data', {})
+        alpha = float(args.get('smoothing', 0.3))
+        max_concurrency = max(1, int(args.get('max_concurrency', 4)))
+        user_id = args.get('user_id', 'default_user')
+
+        if self.emotion_analyzer is None:
+            return [TextContent(type="text", text="❌ Facial analysis not configured (set HUME_API_KEY or EMOTION_BACKEND)")]
+        if not isinstance(frames, list) or not frames:
+            return [TextContent(type="text", text="❌ No frames provided")]
+        if len(frames) > MAX_SESSION_FRAMES:
+            return [TextContent(type="text", text=f"❌ Too many frames: {len(frames)} (maximum {MAX_SESSION_FRAMES})")]
+
+        # Decode each frame only once it is admitted, so at most
+        # max_concurrency decoded frames are held in memory at a time
+        semaphore = asyncio.Semaphore(max_concurrency)
+        failures: Dict[int, str] = {}
+
+        async def analyze(index: int, frame: Dict[str, Any]) -> Optional[Dict[str, Any]]:
+            async with semaphore:
+                try:
+                    offset_ms = int(frame.get('offset_ms', index * frame_interval_ms))
+                    with await self.image_decoder.decode_async(frame.get('image_data', '')) as image:
+                        normalized = await self.image_decoder.normalize_async(image)
+                        result = await self._analyze_face(normalized)
+                except Exception as e:
+                    failures[index] = str(e)
+                    return None
+            if not result.get('success'):
+                failures[index] = result.get('error', 'analysis failed')
+                return None
+            return {
+                'offset_ms': offset_ms,
+                'emotions': result.get('emotions', {})
+            }
+
+        results = await asyncio.gather(*(analyze(index, frame) for index, frame in enumerate(frames)))
+        analyzed = sorted((result for result in results if result), key=lambda result: result['offset_ms'])
+        if not analyzed:
+            return [TextContent(type="text", text=f"❌ Facial analysis failed for every frame ({failures[min(failures)]})")]
+
+        ppg_features, ppg_note = await self._analyze_ppg(ppg_data)
+        physiological = ppg_features.get('stress_score') if ppg_features else None
+        summary = summarize_frames(analyzed, alpha, physiological)
+
+        gemini_recommendations = ""
+        if self.gemini_model:
+            try:
+                prompt = self._fit_prompt('stress_monitoring', """Based on this emotional analysis of a {frame_count}-frame capture, provide stress relief recommendations:
+
+Dominant Emotion: {dominant_emotion}
+Average Stress Level: {mean_stress_level}/10
+Peak Stress Level: {peak_stress_level}/10
+Final Stress Level: {final_stress_level}/10
+Top Mean Emotion Scores: {emotions}{ppg}
+
+Provide 2-3 immediate, practical recommendations for stress management.""",
+                    frame_count=summary['frame_count'], dominant_emotion=summary['dominant_emotion'],
+                    mean_stress_level=summary['mean_stress_level'], peak_stress_level=summary['peak_stress_level'],
+                    final_stress_level=summary['final_stress_level'],
+                    emotions=compact_json(top_scores(summary['emotions'])), ppg=self._ppg_prompt_lines(ppg_features))
+
+                gemini_recommendations = await self._generate_text('stress_monitoring', prompt)
+            except Exception as e:
+                gemini_recommendations = f"AI recommendations unavailable: {str(e)}"
+
+        session_id = f"stress_{user_id}_{datetime.utcnow().isoformat()}"
+        await self.memory_saver.save_stress_session({
+            'session_id': session_id,
+            'user_id': user_id,
+            'timestamp': datetime.utcnow().isoformat(),
+            'stress_level': summary['final_stress_level'],
+            'ppg_data': dict(ppg_data, hrv=ppg_features) if ppg_features else ppg_data,
+            'hume_facial_analysis': summary,
+            'gemini_analysis': gemini_recommendations
+        })
+
+        timeline = " → ".join(str(stress_level(point['smoothed_stress'])) for point in summary['timeline'])
+        response = f"""😐 Stress Session Analysis Complete
+
+🎞️ Frames Analyzed: {summary['frame_count']}/{len(frames)}
+📊 Stress Level: {summary['final_stress_level']}/10 (average {summary['mean_stress_level']}, peak {summary['peak_stress_level']})
+😊 Dominant Emotion: {summary['dominant_emotion']}{ppg_note}
+
+📈 Stress Timeline:
+{timeline}
+
+🧠 AI Recommendations:
+{gemini_recommendations}
+
+Session ID: {session_id}"""
+        if failures:
+            response += "\n\n⚠️ Skipped frames:\n" + "\n".join(
+                f"#{index}: {error}" for index, error in sorted(failures.items()))
+
+        return [TextContent(type="text", text=response)]
+
     async def _handle_set_wellness_goal(self, args: Dict[str, Any]) -> List[TextContent]:
         """Create wellness goals"""
         goal_type = args.get('goal_type', '')
@@ -418,23 +1175,23 @@ Session recorded for your wellness tracking."""
         gemini_suggestions = ""
         if self.gemini_model:
             try:
-                prompt = f"""Create a SMART wellness goal based on:
+                prompt = self._fit_prompt('set_wellness_goal', """Create a SMART wellness goal based on:
 
 Type: {goal_type}
 User Description: {description}
-Target: {json.dumps(target_value)}
+Target: {target}
 
-Make this goal specific, measurable, achievable, relevant, and time-bound."""
+Make this goal specific, measurable, achievable, relevant, and time-bound.""",
+                    goal_type=goal_type, description=description, target=compact_json(target_value))
 
-                response = await self.gemini_model.generate_content_async(prompt)
-                gemini_suggestions = response.text
+                gemini_suggestions = await self._generate_text('set_wellness_goal', prompt)
             except Exception as e:
                 gemini_suggestions = f"Goal suggestions unavailable: {str(e)}"
 
         goal_data = {
             'goal_id': goal_id,
             'user_id': user_id,
-            'timestamp': datetime.now().isoformat(),
+            'timestamp': datetime.utcnow().isoformat(),
             'goal_type': goal_type,
             'goal_description': description,
             'target_value': target_value,
@@ -443,8 +1200,8 @@ Make this goal specific, measurable, achievable, relevant, and time-bound."""
             'ai_suggestions': gemini_suggestions
         }
 
-        # Save goal and cache
-        self.memory_store[f"goal_{goal_id}"] = goal_data
+        # Save goal
+        await self.memory_saver.save_wellness_goal(goal_data)
 
         response = f"""🎯 Wellness Goal Created!
 
@@ -460,7 +1217,32 @@ Status: Ready for tracking!"""
 
         return [TextContent(type="text", text=response)]
 
-    async def _handle_provide_mindfulness(self, args: Dict[str, Any]) -> List[TextContent]:
+    async def _generate_mindfulness(self, exercise_type: str, duration_minutes: int, current_emotions: Any,
+                                    on_chunk: Optional[ChunkCallback] = None) -> str:
+        prompt = self._fit_prompt('provide_mindfulness', MINDFULNESS_PROMPT,
+                                  exercise_type=exercise_type, duration_minutes=duration_minutes,
+                                  current_emotions=compact_json(current_emotions), focus='')
+        return await self._generate_text('provide_mindfulness', prompt, on_chunk)
+
+    async def _generate_mindfulness_variant(self, key: ContentKey, variant: int) -> str:
+        """One pre-generated exercise for a content key, focused differently per variant"""
+        if not self.gemini_client:
+            raise RuntimeError("Gemini AI not configured")
+        exercise_type, duration_minutes, bucket = key
+        prompt = self._fit_prompt('provide_mindfulness', MINDFULNESS_PROMPT,
+                                  exercise_type=exercise_type, duration_minutes=duration_minutes,
+                                  current_emotions=f"mostly {bucket}",
+                                  focus=f"\nFocus: {MINDFULNESS_FOCUSES[variant % len(MINDFULNESS_FOCUSES)]}")
+        # Bypasses the response cache: each variant should be new content
+        with self.metrics.span('gemini', tool='mindfulness_prefetch'):
+            return await self.gemini_client.generate(prompt)
+
+    async def _mindfulness_history(self, user_id: str) -> List[Dict[str, Any]]:
+        start = datetime.utcnow() - timedelta(days=self.mindfulness_history_days)
+        return await self.memory_saver.query_range('mindfulness_sessions', user_id, start=start)
+
+    async def _handle_provide_mindfulness(self, args: Dict[str, Any],
+                                          on_chunk: Optional[ChunkCallback] = None) -> List[TextContent]:
         """Generate mindfulness exercises"""
         exercise_type = args.get('exercise_type', 'breathing')
         current_emotions = args.get('current_emotions', {})
@@ -471,33 +1253,29 @@ Status: Ready for tracking!"""
             return [TextContent(type="text", text="❌ Gemini AI not configured for mindfulness exercises")]
 
         try:
-            prompt = f"""Create a personalized mindfulness exercise:
-
-Exercise Type: {exercise_type}
-Duration: {duration_minutes} minutes
-Current Emotional State: {json.dumps(current_emotions)}
-
-Provide:
-1. Step-by-step instructions for the exercise
-2. Breathing or focus techniques
-3. What to expect during and after
-4. Why this exercise is beneficial for their current state"""
-
-            response = await self.gemini_model.generate_content_async(prompt)
-            exercise_instructions = response.text
+            # Usual requests are answered from exercises generated ahead of time
+            key = content_key(exercise_type, duration_minutes, current_emotions)
+            exercise_instructions = self.mindfulness_prefetcher.take(user_id, key)
+            if exercise_instructions is not None:
+                if on_chunk:
+                    await on_chunk(exercise_instructions)
+            else:
+                exercise_instructions = await self._generate_mindfulness(
+                    exercise_type, duration_minutes, current_emotions, on_chunk)
+                self.mindfulness_prefetcher.add(key, exercise_instructions)
 
             # Record session
             session_id = f"mindfulness_{user_id}_{datetime.now().timestamp()}"
             session_data = {
                 'session_id': session_id,
                 'user_id': user_id,
-                'timestamp': datetime.now().isoformat(),
+                'timestamp': datetime.utcnow().isoformat(),
                 'exercise_type': exercise_type,
                 'duration_seconds': duration_minutes * 60,
                 'emotional_impact': current_emotions
             }
 
-            self.memory_store[f"session_{session_id}"] = session_data
+            await self.memory_saver.save_mindfulness_session(session_data)
 
             full_response = f"""🧘 Mindfulness Exercise Generated
 
@@ -514,7 +1292,8 @@ Ready to begin your practice!"""
         except Exception as e:
             return [TextContent(type="text", text=f"❌ Mindfulness exercise generation failed: {str(e)}")]
 
-    async def _handle_crisis_support_check(self, args: Dict[str, Any]) -> List[TextContent]:
+    async def _handle_crisis_support_check(self, args: Dict[str, Any],
+                                           on_chunk: Optional[ChunkCallback] = None) -> List[TextContent]:
         """Analyze for crisis indicators"""
         user_id = args.get('user_id', 'default_user')
         timeframe_days = args.get('timeframe_days', 7)
@@ -523,22 +1302,27 @@ Ready to begin your practice!"""
             return [TextContent(type="text", text="❌ Crisis detection requires Gemini AI")]
 
         try:
-            # Get recent mood entries (would query BigQuery in real implementation)
-            recent_moods = []
-            for key, data in self.memory_store.items():
-                if key.startswith('mood_') and data.get('user_id') == user_id:
-                    timestamp = datetime.fromisoformat(data['timestamp'])
-                    if (datetime.now() - timestamp).days <= timeframe_days:
-                        recent_moods.append(data)
-
-            if not recent_moods:
+            # Imported on first use so NumPy stays out of server startup
+            from mood_analytics import assess_mood_risk, compute_mood_features
+
+            now = time.time()
+            timestamps, scores = self.mood_history.window(user_id, now - timeframe_days * 86400, now)
+
+            if not timestamps:
                 return [TextContent(type="text", text="ℹ️  No recent mood entries found for crisis analysis")]
 
+            if len(scores) <= self.crisis_inline_max_entries:
+                features = compute_mood_features(timestamps, scores, now=now)
+            else:
+                features = await self.worker_pools.run_cpu(compute_mood_features, timestamps, scores, now=now)
+            high_risk_entries = self.mood_history.flagged_count(user_id, now - timeframe_days * 86400, now)
+            features['high_risk_entries'] = high_risk_entries
+
             # Analyze patterns with Gemini
-            prompt = f"""Analyze these mood entries for crisis indicators:
+            prompt = self._fit_prompt('crisis_support_check', """Analyze this mood trend summary for crisis indicators:
 
-Recent Mood Entries (last {timeframe_days} days):
-{json.dumps(recent_moods, indent=2)}
+Mood Features (last {timeframe_days} days, scores 1-10):
+{features}
 
 Please assess:
 1. Overall emotional patterns and trends
@@ -547,31 +1331,23 @@ Please assess:
 4. Recommended actions if needed
 5. When to seek professional help
 
-Be supportive and encourage professional help when appropriate."""
+Be supportive and encourage professional help when appropriate.""",
+                timeframe_days=timeframe_days, features=compact_json(features))
 
-            response = await self.gemini_model.generate_content_async(prompt)
-            crisis_analysis = response.text
+            crisis_analysis = await self._generate_text('crisis_support_check', prompt, on_chunk)
 
             # Determine if immediate action needed
-            high_risk_indicators = ['suicide', 'hurt myself', 'end it all', 'give up', 'no point', 'hopeless']
-            low_mood_indicators = [entry for entry in recent_moods if entry.get('mood_score', 5) <= 2]
+            crisis_level = assess_mood_risk(features, high_risk_entries)
 
-            if len(low_mood_indicators) >= 3:
-                crisis_level = "MEDIUM"
-                emergency_resources = """
-🚨 EMERGENCY RESOURCES:
-• Call emergency services: 911 or local equivalent
-• National Suicide Prevention Lifeline: 988 (US)
-• Crisis Text Line: Text HOME to 741741
-• Local mental health crisis services"""
+            if crisis_level != "LOW":
+                emergency_resources = EMERGENCY_RESOURCES
             else:
-                crisis_level = "LOW"
                 emergency_resources = "Continue monitoring and reach out if concerns persist."
 
             full_response = f"""🛟 Crisis Support Assessment
 
 📊 Analysis Period: Last {timeframe_days} days
-📈 Mood Entries Analyzed: {len(recent_moods)}
+📈 Mood Entries Analyzed: {features['entry_count']}
 
 🔍 AI Crisis Assessment:
 {crisis_analysis}
@@ -589,25 +1365,116 @@ Remember: You're not alone - professional help is available 24/7."""
             return [TextContent(type="text", text=f"❌ Crisis analysis error: {str(e)}")]
 
 
+    async def _handle_list_at_risk_users(self, args: Dict[str, Any]) -> List[TextContent]:
+        """Report users ranked by the background crisis-risk scanner"""
+        limit = args.get('limit', 20)
+        min_level = args.get('min_level', 'MEDIUM')
+
+        # Pick up entries recorded since the last scheduled pass
+        await self.risk_scanner.scan()
+        users = self.risk_scanner.at_risk(limit=limit, min_level=min_level)
+
+        if not users:
+            return [TextContent(type="text", text=f"✅ No users currently at {min_level} risk or above")]
+
+        user_lines = "\n".join(
+            f"• {risk.user_id}: {risk.level} (low moods: {risk.low_mood_count}, "
+            f"high-risk entries: {risk.high_risk_entries}, mean: {risk.mean}, trend: {risk.trend_per_day}/day)"
+            for risk in users
+        )
+        response = f"""🚨 At-Risk Users (last {self.risk_scanner.window_days:g} days)
+
+{user_lines}
+
+Reach out to these users and share crisis resources where appropriate."""
+
+        return [TextContent(type="text", text=response)]
+
+    async def _handle_get_server_metrics(self, args: Dict[str, Any]) -> List[TextContent]:
+        """Current metrics as JSON or Prometheus text"""
+        output_format = args.get('format', 'json')
+        if output_format == 'prometheus':
+            return [TextContent(type="text", text=self.metrics.prometheus_text())]
+        if output_format != 'json':
+            return [TextContent(type="text", text=f"❌ Unknown metrics format: {output_format}")]
+        return [TextContent(type="text", text=json.dumps(self.metrics.snapshot(), indent=2))]
+
+    async def _handle_profile_next_n_calls(self, args: Dict[str, Any]) -> List[TextContent]:
+        """Arm or disarm per-call profiling"""
+        count = int(args.get('count', 0))
+        if count < -1:
+            return [TextContent(type="text", text="❌ count must be -1 or greater")]
+        self.profiler.profile_next(count, args.get('tools'), int(args.get('tracemalloc_frames', 0)))
+
+        if count == 0:
+            return [TextContent(type="text", text=f"🔬 Profiling disarmed ({len(self.profiler.reports)} reports written)")]
+        calls = "every call" if count == -1 else f"the next {count} calls"
+        tools = ", ".join(sorted(self.profiler.tools)) if self.profiler.tools else "all tools"
+        memory = f", tracemalloc depth {self.profiler.tracemalloc_frames}" if self.profiler.tracemalloc_frames else ""
+        return [TextContent(type="text", text=f"""🔬 Profiling {calls} ({tools}{memory})
+
+Reports: {self.profiler.report_dir}""")]
+
+
+def _is_error_response(result: List[TextContent]) -> bool:
+    """Whether a handler reported failure in its response text"""
+    text = result[0].text if result else ''
+    return text.startswith('❌') or text.startswith('Error executing')
+
+
+def _progress_reporter(server: Server) -> ChunkCallback:
+    """Forward streamed chunks of the current request to the MCP client"""
+    context = server.request_context
+    progress_token = context.meta.progressToken if context.meta else None
+    streamed_chars = 0
+
+    async def on_chunk(text: str):
+        nonlocal streamed_chars
+        streamed_chars += len(text)
+        if progress_token is not None:
+            await context.session.send_progress_notification(progress_token, streamed_chars, message=text)
+        else:
+            await context.session.send_log_message(level="info", data=text, logger="wellness-mcp-server")
+
+    return on_chunk
+
+
 async def main():
     """Main server entry point"""
+    # stdout carries the MCP stdio transport, so diagnostics go to stderr
+    logging.basicConfig(
+        stream=sys.stderr,
+        level=os.getenv('WELLNESS_LOG_LEVEL', 'INFO').upper(),
+        format='%(asctime)s %(levelname)s %(name)s: %(message)s'
+    )
     server = Server("wellness-mcp-server")
     wellness_server = WellnessMCPServer()
 
     @server.list_tools()
     async def handle_list_tools():
-        return await wellness_server.list_tools()
+        return await wellness_server.list_tools(None)
 
     @server.call_tool()
-    async def handle_call_tool(request):
-        return await wellness_server.call_tool(request)
-
-    async with stdio_server() as (read_stream, write_stream):
-        await server.run(
-            read_stream,
-            write_stream,
-            server.create_initialization_options()
+    async def handle_call_tool(name: str, arguments: Dict[str, Any]):
+        request = CallToolRequest(
+            method="tools/call",
+            params=CallToolRequestParams(name=name, arguments=arguments)
         )
+        # The SDK runs each request in its own task, so a slow tool call does
+        # not hold up others, and cancels it on notifications/cancelled
+        return await wellness_server.call_tool(request, on_chunk=_progress_reporter(server))
+
+    wellness_server.start()
+    try:
+        async with stdio_server() as (read_stream, write_stream):
+            wellness_server.startup_timer.mark('stdio_ready')
+            await server.run(
+                read_stream,
+                write_stream,
+                server.create_initialization_options()
+            )
+    finally:
+        await wellness_server.aclose()
 
 
 if __name__ == "__main__":
@@ -0,0 +1,98 @@
+"""Table definitions shared by the wellness storage backends"""
+
+import json
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+# Column name and BigQuery type for each wellness table
+TABLE_SCHEMAS: Dict[str, List[Tuple[str, str]]] = {
+    'mood_entries': [
+        ('entry_id', 'STRING'),
+        ('user_id', 'STRING'),
+        ('timestamp', 'TIMESTAMP'),
+        ('mood_score', 'INT64'),
+        ('text_description', 'STRING'),
+        ('emotion_data', 'JSON'),
+        ('gemini_analysis', 'STRING'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'stress_sessions': [
+        ('session_id', 'STRING'),
+        ('user_id', 'STRING'),
+        ('timestamp', 'TIMESTAMP'),
+        ('stress_level', 'INT64'),
+        ('ppg_data', 'JSON'),
+        ('hume_facial_analysis', 'JSON'),
+        ('gemini_analysis', 'STRING'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+    'wellness_goals': [
+        ('goal_id', 'STRING'),
+        ('user_id', 'STRING'),
+        ('timestamp', 'TIMESTAMP'),
+        ('goal_type', 'STRING'),
+        ('goal_description', 'STRING'),
+        ('target_value', 'JSON'),
+        ('progress_percentage', 'FLOAT64'),
+        ('status', 'STRING'),
+        ('created_at', 'TIMESTAMP'),
+        ('updated_at', 'TIMESTAMP'),
+    ],
+    'mindfulness_sessions': [
+        ('session_id', 'STRING'),
+        ('user_id', 'STRING'),
+        ('timestamp', 'TIMESTAMP'),
+        ('exercise_type', 'STRING'),
+        ('duration_seconds', 'INT64'),
+        ('emotional_impact', 'JSON'),
+        ('created_at', 'TIMESTAMP'),
+    ],
+}
+
+
+def table_name(table_id: str) -> str:
+    """Strip the ``project.dataset.`` prefix from a BigQuery table id"""
+    return table_id.rsplit('.', 1)[-1]
+
+
+def parse_timestamp(value: Any) -> Optional[datetime]:
+    """Accept a datetime or ISO 8601 string; offset-aware values become naive UTC
+
+    Every stored timestamp is naive UTC (``datetime.utcnow()``), so they
+    sort and compare consistently in every backend.
+    """
+    if value is None or value == '':
+        return None
+    if not isinstance(value, datetime):
+        value = datetime.fromisoformat(str(value))
+    if value.tzinfo is not None:
+        value = value.astimezone(timezone.utc).replace(tzinfo=None)
+    return value
+
+
+def build_row(table: str, data: Dict[str, Any]) -> Dict[str, Any]:
+    """Project ``data`` onto the table's columns with storage-ready types
+
+    TIMESTAMP columns become datetimes (``timestamp``, ``created_at`` and
+    ``updated_at`` default to now), JSON columns become JSON strings, and
+    keys that are not columns are dropped.
+    """
+    now = datetime.utcnow()
+    row: Dict[str, Any] = {}
+    for name, kind in TABLE_SCHEMAS[table]:
+        value = data.get(name)
+        if kind == 'TIMESTAMP':
+            value = parse_timestamp(value) or (now if name in ('timestamp', 'created_at', 'updated_at') else None)
+        elif value is None:
+            if name == 'user_id':
+                value = 'default_user'
+        elif kind == 'JSON':
+            value = value if isinstance(value, str) else json.dumps(value)
+        elif kind == 'INT64':
+            value = int(value)
+        elif kind == 'FLOAT64':
+            value = float(value)
+        else:
+            value = str(value)
+        row[name] = value
+    return row
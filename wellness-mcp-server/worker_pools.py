@@ -0,0 +1,157 @@
+"""Managed thread and process pools for work that must not run on the event loop
+
+Blocking SDK and database calls go to a thread pool; CPU-bound analysis
+goes to a process pool so it neither holds the GIL nor stalls other
+requests. Both pools count submitted, running and finished jobs so queue
+depth can be reported.
+"""
+
+import asyncio
+import multiprocessing
+import threading
+from concurrent.futures import Executor, Future, ProcessPoolExecutor, ThreadPoolExecutor
+from functools import partial
+from typing import Any, Callable, Dict, Optional
+
+
+class _PoolCounters:
+    """Job counts for one pool; updated from worker and loop threads
+
+    When job starts are not observable (``exact`` is False), jobs beyond
+    the first ``workers`` unfinished ones are counted as queued.
+    """
+
+    def __init__(self, workers: int, exact: bool = True):
+        self.workers = workers
+        self.exact = exact
+        self._lock = threading.Lock()
+        self.submitted = 0
+        self.started = 0
+        self.finished = 0
+        self.failed = 0
+        self.max_queue_depth = 0
+
+    def on_submit(self):
+        with self._lock:
+            self.submitted += 1
+            self.max_queue_depth = max(self.max_queue_depth, self._queue_depth())
+
+    def on_start(self):
+        with self._lock:
+            self.started += 1
+
+    def on_done(self, future: Future):
+        with self._lock:
+            self.finished += 1
+            if future.cancelled() and self.exact:
+                # Cancelled while queued; it will never reach on_start
+                self.started += 1
+            if future.cancelled() or future.exception() is not None:
+                self.failed += 1
+
+    def _queue_depth(self) -> int:
+        if self.exact:
+            return self.submitted - self.started
+        return max(0, self.submitted - self.finished - self.workers)
+
+    def snapshot(self) -> Dict[str, int]:
+        with self._lock:
+            queue_depth = self._queue_depth()
+            return {
+                'workers': self.workers,
+                'queue_depth': queue_depth,
+                'running': self.submitted - self.finished - queue_depth,
+                'submitted': self.submitted,
+                'finished': self.finished,
+                'failed': self.failed,
+                'max_queue_depth': self.max_queue_depth,
+            }
+
+
+def _run_started(counters: _PoolCounters, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+    counters.on_start()
+    return fn(*args, **kwargs)
+
+
+class InstrumentedThreadPool(ThreadPoolExecutor):
+    """ThreadPoolExecutor that tracks queue depth
+
+    Installed as the event loop's default executor, so ``asyncio.to_thread``
+    and ``run_in_executor(None, ...)`` throughout the server are counted too.
+    """
+
+    def __init__(self, max_workers: int, thread_name_prefix: str = 'wellness-io'):
+        super().__init__(max_workers=max_workers, thread_name_prefix=thread_name_prefix)
+        self.counters = _PoolCounters(max_workers)
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        self.counters.on_submit()
+        future = super().submit(_run_started, self.counters, fn, *args, **kwargs)
+        future.add_done_callback(self.counters.on_done)
+        return future
+
+
+class InstrumentedProcessPool(ProcessPoolExecutor):
+    """ProcessPoolExecutor that tracks (estimated) queue depth"""
+
+    def __init__(self, max_workers: int):
+        # Spawned workers do not inherit the server's threads or locks
+        super().__init__(max_workers=max_workers, mp_context=multiprocessing.get_context('spawn'))
+        self.counters = _PoolCounters(max_workers, exact=False)
+
+    def submit(self, fn: Callable, /, *args: Any, **kwargs: Any) -> Future:
+        self.counters.on_submit()
+        future = super().submit(fn, *args, **kwargs)
+        future.add_done_callback(self.counters.on_done)
+        return future
+
+
+class WorkerPools:
+    """The server's I/O thread pool and CPU process pool
+
+    Pools are created on first use. With ``cpu_workers`` set to 0, CPU work
+    runs in the I/O thread pool instead of separate processes.
+    """
+
+    def __init__(self, io_workers: int = 8, cpu_workers: int = 2):
+        self.io_workers = max(1, io_workers)
+        self.cpu_workers = max(0, cpu_workers)
+        self._io: Optional[InstrumentedThreadPool] = None
+        self._cpu: Optional[InstrumentedProcessPool] = None
+
+    @property
+    def io(self) -> InstrumentedThreadPool:
+        if self._io is None:
+            self._io = InstrumentedThreadPool(self.io_workers)
+        return self._io
+
+    @property
+    def cpu(self) -> Executor:
+        if not self.cpu_workers:
+            return self.io
+        if self._cpu is None:
+            self._cpu = InstrumentedProcessPool(self.cpu_workers)
+        return self._cpu
+
+    def install(self, loop: Optional[asyncio.AbstractEventLoop] = None):
+        """Make the I/O pool the default executor of ``loop``"""
+        (loop or asyncio.get_running_loop()).set_default_executor(self.io)
+
+    async def run_io(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a blocking call in the I/O thread pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.io, partial(fn, *args, **kwargs))
+
+    async def run_cpu(self, fn: Callable, *args: Any, **kwargs: Any) -> Any:
+        """Run a CPU-bound, picklable module-level function in the process pool"""
+        return await asyncio.get_running_loop().run_in_executor(self.cpu, partial(fn, *args, **kwargs))
+
+    def snapshot(self) -> Dict[str, Dict[str, int]]:
+        """Queue depth and job counts per pool"""
+        pools = {'io': self._io, 'cpu': self._cpu}
+        return {name: pool.counters.snapshot() for name, pool in pools.items() if pool is not None}
+
+    def shutdown(self, wait: bool = True):
+        for pool in (self._cpu, self._io):
+            if pool is not None:
+                pool.shutdown(wait=wait, cancel_futures=True)
+        self._io = self._cpu = None